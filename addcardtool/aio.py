@@ -0,0 +1,266 @@
+import asyncio
+
+import aiohttp
+
+from .client import (
+    DEFAULT_BACKOFF_FACTOR,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_RETRIES,
+    DEFAULT_THROTTLE_RETRIES,
+    DEFAULT_TIMEOUT,
+)
+from .config import DEFAULT_BASE_URL, get_config
+from .models import Board, Card, Label, List
+from .program import (
+    BOARD_DETAILS_QUERY,
+    BOARD_LIST_FIELDS,
+    BOARDS_PATH,
+    CARDS_PATH,
+    MEMBERS_PATH,
+)
+from .ratelimit import get_rate_limiter
+
+# Default number of requests one AsyncTrelloClient has in flight at once
+DEFAULT_MAX_IN_FLIGHT = 50
+
+# Methods that are safe to send again after the connection dropped mid-request, the same
+# ones the synchronous client retries on server errors
+IDEMPOTENT_METHODS = frozenset(("DELETE", "GET", "HEAD", "OPTIONS", "PUT", "TRACE"))
+
+
+"""
+Response of an asynchronous request with its body already read
+
+Attributes:
+    - status_code: HTTP status code
+    - headers: Response headers
+    - data: Parsed JSON body (None when the body is empty or not JSON)
+"""
+
+
+class AsyncResponse:
+    def __init__(self, status_code, headers, data):
+        self.status_code = status_code
+        self.headers = headers
+        self.data = data
+
+
+"""
+Asyncio client for the Trello API that mirrors the functions in program.py. Requests share
+one aiohttp connection pool, are bounded by a semaphore so thousands of coroutines can be
+started at once, and go through the same rate limiter as the synchronous client for the
+key and token.
+
+Parameters:
+    - api_key: Trello API key added to every request
+    - api_token: Trello API token added to every request
+    - base_url: Root URL of the API
+    - pool_size: Number of connections kept alive in the pool
+    - max_in_flight: Number of requests sent concurrently
+    - retries: Number of times a failed connection is retried
+    - backoff_factor: Backoff factor used between connection retries
+    - timeout: Timeout in seconds for each request
+    - rate_limiter: RateLimiter that schedules requests (shared per key and token by default)
+    - throttle_retries: Number of times a request throttled with a 429 is sent again
+"""
+
+
+class AsyncTrelloClient:
+    def __init__(
+        self,
+        api_key=None,
+        api_token=None,
+        base_url=DEFAULT_BASE_URL,
+        pool_size=DEFAULT_POOL_SIZE,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        retries=DEFAULT_RETRIES,
+        backoff_factor=DEFAULT_BACKOFF_FACTOR,
+        timeout=DEFAULT_TIMEOUT,
+        rate_limiter=None,
+        throttle_retries=DEFAULT_THROTTLE_RETRIES,
+    ):
+        self.api_key = api_key
+        self.api_token = api_token
+        self.base_url = base_url if base_url.endswith("/") else f"{base_url}/"
+        self.pool_size = pool_size
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or get_rate_limiter(api_key, api_token)
+        self.throttle_retries = throttle_retries
+        self._session = None
+        self._semaphore = None
+
+    @classmethod
+    def from_profile(cls, name=None, **kwargs):
+        # Client for a credential profile (the default profile if not given)
+        profile = get_config().profile(name)
+        return cls(
+            api_key=profile.api_key,
+            api_token=profile.api_token,
+            base_url=profile.base_url,
+            **kwargs,
+        )
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        config = get_config()
+        return cls(
+            api_key=config.api_key,
+            api_token=config.api_token,
+            base_url=config.base_url,
+            **kwargs,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self):
+        # The session is created lazily because it must belong to the running event loop
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"Accept": "application/json"},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _send(self, method, url, query, **kwargs):
+        # Send one request, retrying failed connections with exponential backoff. A POST
+        # is only retried when the connection could not be made at all: once it was sent,
+        # Trello may have created the card before the connection dropped
+        session = self._get_session()
+        if method.upper() in IDEMPOTENT_METHODS:
+            retried_errors = aiohttp.ClientConnectionError
+        else:
+            retried_errors = aiohttp.ClientConnectorError
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.request(method, url, params=query, **kwargs) as response:
+                    try:
+                        data = await response.json(content_type=None)
+                    except ValueError:
+                        data = None
+                    return AsyncResponse(response.status, response.headers, data)
+            except retried_errors:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff_factor * (2**attempt))
+
+    async def request(self, method, path, params=None, **kwargs):
+        query = {"key": self.api_key, "token": self.api_token}
+        if params:
+            query.update(params)
+        url = f"{self.base_url}{path.lstrip('/')}"
+        self._get_session()
+        async with self._semaphore:
+            for attempt in range(self.throttle_retries + 1):
+                wait = self.rate_limiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                response = await self._send(method, url, query, **kwargs)
+                if self.rate_limiter.observe(response.status_code, response.headers) is None:
+                    return response
+            return response
+
+    async def get_all_user_boards_name(self):
+        # Only the fields a Board needs, and only open boards, as the synchronous client asks
+        query = {"fields": BOARD_LIST_FIELDS, "filter": "open"}
+        response = await self.request("GET", f"{MEMBERS_PATH}/me/boards", params=query)
+        if response.status_code == 200:
+            return [Board.from_json(board) for board in response.data]
+        print("Error: Unable to get boards")
+        print(response.status_code)
+        return None
+
+    async def get_board(self, board_id):
+        response = await self.request(
+            "GET", f"{BOARDS_PATH}/{board_id}", params=BOARD_DETAILS_QUERY
+        )
+        if response.status_code == 200:
+            return Board.from_json(response.data)
+        print("Error: Unable to get board details")
+        print(response.status_code)
+        return None
+
+    async def get_board_lists(self, board_id):
+        response = await self.request(
+            "GET", f"{BOARDS_PATH}/{board_id}/lists", params={"fields": "name"}
+        )
+        if response.status_code == 200:
+            return [List.from_json(item) for item in response.data]
+        print("Error: Unable to get board lists")
+        print(response.status_code)
+        return None
+
+    async def get_board_labels(self, board_id):
+        response = await self.request(
+            "GET", f"{BOARDS_PATH}/{board_id}/labels", params={"fields": "name,color"}
+        )
+        if response.status_code == 200:
+            return [Label.from_json(label) for label in response.data]
+        print("Error: Unable to get board labels")
+        print(response.status_code)
+        return None
+
+    async def _create(self, path, query, error_message):
+        response = await self.request("POST", path, params=query)
+        if response.status_code == 200:
+            return response.data["id"]
+        print(error_message)
+        print(response.status_code)
+        return None
+
+    async def create_new_board(self, board_name, board_description):
+        query = {"name": board_name}
+        if board_description:
+            query["desc"] = board_description
+        return await self._create(BOARDS_PATH, query, "Error: Unable to create new board")
+
+    async def create_new_list(self, board_id, list_name):
+        return await self._create(
+            f"{BOARDS_PATH}/{board_id}/lists",
+            {"name": list_name},
+            "Error: Unable to create new list",
+        )
+
+    async def create_new_label(self, board_id, label_name, label_color):
+        return await self._create(
+            f"{BOARDS_PATH}/{board_id}/labels",
+            {"name": label_name, "color": label_color, "idBoard": board_id},
+            "Error: Unable to create new label",
+        )
+
+    async def create_new_card(self, list_id, card_name, card_description, label_ids):
+        query = {
+            "idList": list_id,
+            "name": card_name,
+            "desc": card_description,
+            "idLabels": ",".join(label_ids),
+        }
+        response = await self.request("POST", CARDS_PATH, data=query)
+        if response.status_code == 200:
+            return Card.from_json(response.data)
+        print("Error: Unable to create new card")
+        print(response.status_code)
+        return None
+
+    async def create_cards(self, cards):
+        # Create many cards concurrently. cards is an iterable of
+        # (list_id, card_name, card_description, label_ids) tuples and the results are
+        # returned in the same order. A card whose request failed has its exception in
+        # place of its result, so one dropped connection does not hide the other cards
+        return await asyncio.gather(
+            *(self.create_new_card(*card) for card in cards), return_exceptions=True
+        )
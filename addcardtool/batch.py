@@ -0,0 +1,140 @@
+import threading
+from urllib.parse import quote, urlencode
+
+from .client import current_profile, get_client
+
+# Trello accepts at most this many routes in one batch request
+MAX_BATCH_URLS = 10
+
+# Seconds a batcher waits for more concurrent requests before sending a partial batch
+DEFAULT_BATCH_WINDOW = 0.005
+
+BATCH_PATH = "batch"
+
+
+"""
+Function to build the route for one request in a batch. Commas in the query are escaped
+so they are not mistaken for the separator between routes.
+
+Parameters:
+    - path: API path of the request
+    - params: Query parameters of the request
+
+Returns:
+    - Route relative to the API version, e.g. /boards/123?fields=name%2Cdesc
+"""
+
+
+def batch_route(path, params=None):
+    route = "/" + path.lstrip("/")
+    if params:
+        route = f"{route}?{urlencode(params, quote_via=quote)}"
+    return route
+
+
+class _PendingGet:
+    def __init__(self, route):
+        self.route = route
+        self.done = threading.Event()
+        self.status_code = None
+        self.data = None
+        self.error = None
+
+
+"""
+Groups GET requests into Trello's /batch endpoint. get_many sends a known set of requests
+in as few round trips as possible; get can be called from many threads at once and the
+requests that arrive within a short window are sent together, with each caller receiving
+only its own result.
+
+Parameters:
+    - client: TrelloClient used to send the batches (the shared client of the profile the
+      batcher was created in by default, since batches are sent from a timer thread)
+    - window: Seconds to wait for more requests before sending a partial batch
+    - max_urls: Maximum number of routes in one batch request
+"""
+
+
+class Batcher:
+    def __init__(self, client=None, window=DEFAULT_BATCH_WINDOW, max_urls=MAX_BATCH_URLS):
+        self.client = client
+        self.profile = None if client is not None else current_profile()
+        self.window = window
+        self.max_urls = max_urls
+        self.lock = threading.Lock()
+        self.pending = []
+        self.timer = None
+        self.round_trips = 0
+
+    def _send(self, batch):
+        # Runs in a timer thread for partial batches, so every item is finished even when
+        # the request fails; otherwise its caller would wait forever
+        try:
+            client = self.client or get_client(self.profile)
+            response = client.get(
+                BATCH_PATH, params={"urls": ",".join(item.route for item in batch)}
+            )
+            with self.lock:
+                self.round_trips += 1
+            if response.status_code == 200:
+                results = response.json()
+            else:
+                results = [{"statusCode": response.status_code}] * len(batch)
+            for item, result in zip(batch, results):
+                # Successful routes come back as {"200": body}, failed ones as an error object
+                if "200" in result:
+                    item.status_code, item.data = 200, result["200"]
+                else:
+                    item.status_code = result.get("statusCode", 500)
+            for item in batch[len(results):]:
+                item.status_code = 500
+        except Exception as error:
+            for item in batch:
+                if item.status_code is None:
+                    item.error = error
+        finally:
+            for item in batch:
+                item.done.set()
+
+    def _flush(self):
+        with self.lock:
+            batch, self.pending = self.pending[: self.max_urls], self.pending[self.max_urls :]
+            self.timer = None
+            if self.pending:
+                self._schedule()
+        if batch:
+            self._send(batch)
+
+    def _schedule(self):
+        # Called with the lock held
+        self.timer = threading.Timer(self.window, self._flush)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def get(self, path, params=None):
+        # Send a GET as part of the next batch and wait for its result. Returns the status
+        # code and the parsed JSON body, and raises the error if the batch could not be sent
+        item = _PendingGet(batch_route(path, params))
+        with self.lock:
+            self.pending.append(item)
+            full = len(self.pending) >= self.max_urls
+            if full and self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            elif not full and self.timer is None:
+                self._schedule()
+        if full:
+            self._flush()
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.status_code, item.data
+
+    def get_many(self, requests):
+        # Send a list of (path, params) GETs in batches. Returns (status_code, data) pairs in
+        # the order of the requests; the status code is None for requests whose batch could
+        # not be sent
+        items = [_PendingGet(batch_route(path, params)) for path, params in requests]
+        for start in range(0, len(items), self.max_urls):
+            self._send(items[start : start + self.max_urls])
+        return [(item.status_code, item.data) for item in items]
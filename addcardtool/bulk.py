@@ -0,0 +1,493 @@
+import contextvars
+import csv
+import io
+import json
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import requests
+
+from .batch import Batcher
+from .config import DEFAULT_WORKERS
+from .journal import reconcile
+from .models import Card, intern
+from .program import add_card_attachment, create_new_card
+from .resolver import DEFAULT_LABEL_COLOR, NameResolver, ResolveError
+
+# Columns every import file must have
+REQUIRED_COLUMNS = ("board", "list", "name")
+
+
+class BulkRowError(Exception):
+    """Raised when a single import row cannot be turned into a card"""
+
+
+"""
+A single card to create, read from an import file
+
+Attributes:
+    - number: Position of the row in the input (starting at 1)
+    - board: Name of the board to add the card to
+    - list: Name of the list to add the card to
+    - name: Name of the card
+    - desc: Description of the card
+    - labels: Names of the labels to attach to the card
+"""
+
+
+@dataclass(slots=True)
+class CardRow:
+    number: int
+    board: str
+    list: str
+    name: str
+    desc: str = ""
+    labels: list = field(default_factory=list)
+
+
+"""
+Outcome of creating the card for one import row
+
+Attributes:
+    - row: The CardRow that was processed
+    - error: Error message if the card was not created, None if it was
+    - card_id: ID of the created card
+    - recovered: True if the card was found on its list by a resume instead of being created
+    - queued: True if the card was saved in the outbox to be sent in the background
+    - duplicate: DuplicateMatch of the existing card if the card was skipped as a duplicate
+    - card: Card returned by Trello when the card was created
+    - elapsed: Seconds spent sending the card (None if it was not sent)
+"""
+
+
+@dataclass(slots=True)
+class CardResult:
+    row: CardRow
+    error: str = None
+    card_id: str = None
+    recovered: bool = False
+    queued: bool = False
+    duplicate: object = None
+    card: Card = None
+    elapsed: float = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+"""
+Function to turn a raw CSV or JSONL record into a CardRow
+
+Parameters:
+    - number: Position of the row in the input
+    - record: Dictionary read from the input
+
+Returns:
+    - CardRow built from the record
+"""
+
+
+def parse_row(number, record):
+    record = {str(key).strip().lower(): value for key, value in record.items() if key}
+    labels = record.get("labels") or []
+    if isinstance(labels, str):
+        labels = labels.split(",")
+    return CardRow(
+        number=number,
+        # Board and list names repeat across rows, so each distinct name is stored once
+        board=intern(str(record.get("board") or "").strip()),
+        list=intern(str(record.get("list") or "").strip()),
+        name=str(record.get("name") or "").strip(),
+        desc=str(record.get("desc") or "").strip(),
+        labels=[intern(str(label).strip()) for label in labels if str(label).strip()],
+    )
+
+
+"""
+Function to stream card rows from a CSV or JSONL source without reading it all into memory
+
+Parameters:
+    - stream: Text stream to read rows from
+    - file_format: Either "csv" or "jsonl"
+
+Returns:
+    - Generator of CardRow objects in input order
+
+Raises:
+    - BulkRowError naming the line of the file that cannot be read
+"""
+
+
+def iter_rows(stream, file_format):
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        try:
+            columns = {str(column).strip().lower() for column in reader.fieldnames or ()}
+            missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+            if missing:
+                raise BulkRowError(f"Line 1: missing columns: {', '.join(missing)}")
+            for number, record in enumerate(reader, start=1):
+                yield parse_row(number, record)
+        except csv.Error as error:
+            raise BulkRowError(f"Line {reader.line_num}: {error}")
+    elif file_format == "jsonl":
+        number = 0
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                raise BulkRowError(f"Line {line_number}: not valid JSON ({error})")
+            if not isinstance(record, dict):
+                raise BulkRowError(f"Line {line_number}: expected a JSON object")
+            yield parse_row(number, record)
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+
+"""
+Function to work out the format of an import source from its name
+
+Parameters:
+    - source: Path of the import file or "-" for stdin
+    - file_format: Format given by the user, if any
+
+Returns:
+    - "csv" or "jsonl"
+"""
+
+
+def detect_format(source, file_format=None):
+    if file_format:
+        return file_format.lower()
+    if source.lower().endswith(".csv"):
+        return "csv"
+    return "jsonl"
+
+
+"""
+Function to open an import source, using stdin when the source is "-"
+
+Parameters:
+    - source: Path of the import file or "-" for stdin
+
+Returns:
+    - Text stream for the source
+"""
+
+
+def open_source(source):
+    if source == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    return open(source, encoding="utf-8", newline="")
+
+
+"""
+Resolves the board, list and label names of import rows to IDs. Each board's lists and
+labels are fetched once and shared by every row and worker thread that targets the board.
+Boards first seen by several workers at the same time are fetched together through the
+batcher.
+
+Parameters:
+    - batcher: Batcher used for board reads (a new one is created if not given)
+    - create_missing: Create lists and labels that are not on the board instead of failing
+    - label_color: Color of labels created by create_missing
+"""
+
+
+class BoardNameResolver(NameResolver):
+    def __init__(self, batcher=None, create_missing=False, label_color=DEFAULT_LABEL_COLOR):
+        super().__init__(batcher or Batcher(), create_missing, label_color)
+
+    def resolve_row(self, row):
+        # Return the board ID, list ID and label IDs for a row
+        try:
+            return self.resolve(row.board, row.list, row.labels)
+        except ResolveError as error:
+            raise BulkRowError(str(error))
+
+
+"""
+Function to create the card for a single row
+
+Parameters:
+    - resolver: BoardNameResolver shared by all rows
+    - row: CardRow to create a card for
+    - journal: CardJournal the card is recorded in before and after it is sent (optional)
+    - duplicates: DuplicateChecker the row is checked against before it is sent (optional)
+
+Returns:
+    - CardResult for the row
+"""
+
+
+def create_row_card(resolver, row, journal=None, duplicates=None):
+    if not row.board or not row.list or not row.name:
+        return CardResult(row, "Row needs a board, list and name")
+    try:
+        board_id, list_id, label_ids = resolver.resolve_row(row)
+    except BulkRowError as error:
+        return CardResult(row, str(error))
+    if duplicates is not None:
+        match = duplicates.check(board_id, list_id, row.name)
+        if match is not None:
+            return CardResult(row, card_id=match.card_id, duplicate=match)
+    key = journal.record_intent(row, list_id, label_ids) if journal else None
+    result = _send_card(row, list_id, label_ids, journal, key)
+    if duplicates is not None:
+        if result.ok:
+            duplicates.record(board_id, result.card)
+        else:
+            duplicates.release(board_id, list_id, row.name)
+    return result
+
+
+def _send_card(row, list_id, label_ids, journal, key):
+    started = time.perf_counter()
+    try:
+        card = create_new_card(list_id, row.name, row.desc, label_ids)
+    except requests.RequestException as error:
+        # A dropped connection fails this row only, not the rest of the import
+        elapsed = time.perf_counter() - started
+        if journal:
+            journal.record_failed(key, str(error))
+        return CardResult(row, f"Unable to create card: {error}", elapsed=elapsed)
+    elapsed = time.perf_counter() - started
+    if card is None:
+        if journal:
+            journal.record_failed(key, "Unable to create card")
+        return CardResult(row, "Unable to create card", elapsed=elapsed)
+    if journal:
+        journal.record_created(key, card.id)
+    return CardResult(row, card_id=card.id, card=card, elapsed=elapsed)
+
+
+"""
+Function to run a function over a stream of items through a bounded pool of worker threads.
+At most twice the worker count of items are read ahead of the workers so large inputs are
+never held in memory. Each item runs in a copy of the caller's context, so the workers act
+as the caller's profile.
+
+Parameters:
+    - items: Iterable of items to process
+    - workers: Number of items processed concurrently
+    - function: Function called with each item
+
+Returns:
+    - Generator of the function results in completion order
+"""
+
+
+def run_bounded(items, workers, function):
+    max_pending = max(1, workers) * 2
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = set()
+        for item in items:
+            pending.add(executor.submit(contextvars.copy_context().run, function, item))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+"""
+Function to create cards for a stream of rows through a bounded pool of worker threads
+
+Parameters:
+    - rows: Iterable of CardRow objects
+    - workers: Number of cards created concurrently
+    - resolver: BoardNameResolver to use (a new one is created if not given)
+    - journal: CardJournal to record every card in (optional)
+    - duplicates: DuplicateChecker that rows matching an existing card are skipped by
+      (optional)
+
+Returns:
+    - Generator of CardResult objects in completion order
+"""
+
+
+def create_cards(rows, workers=DEFAULT_WORKERS, resolver=None, journal=None, duplicates=None):
+    resolver = resolver or BoardNameResolver()
+    return run_bounded(
+        rows, workers, lambda row: create_row_card(resolver, row, journal, duplicates)
+    )
+
+
+"""
+Function to finish a batch recorded in a journal. Cards that reached Trello before the
+batch died are found with one fetch per target list; only the rest are created again.
+
+Parameters:
+    - journal: CardJournal of the interrupted batch
+    - workers: Number of cards created concurrently
+
+Returns:
+    - Generator of CardResult objects, recovered cards first
+"""
+
+
+def resume_cards(journal, workers=DEFAULT_WORKERS):
+    recovered, remaining = reconcile(journal)
+    for entry in recovered:
+        yield CardResult(_entry_row(entry), card_id=entry["card_id"], recovered=True)
+    yield from run_bounded(
+        remaining,
+        workers,
+        lambda entry: _send_card(
+            _entry_row(entry), entry["list_id"], entry["label_ids"], journal, entry["key"]
+        ),
+    )
+
+
+def _entry_row(entry):
+    return CardRow(
+        number=entry["row"],
+        board=entry["board"],
+        list=entry["list"],
+        name=entry["name"],
+        desc=entry["desc"],
+        labels=entry["labels"],
+    )
+
+
+"""
+Function to turn fan-out targets into one row per target for the same card. A target is
+BOARD/LIST or BOARD/LIST/LABEL,LABEL, where each part is a name or an ID; targets given
+twice are only used once.
+
+Parameters:
+    - targets: Target strings
+    - card_name: Name of the card
+    - card_desc: Description of the card
+
+Returns:
+    - List of CardRow objects, numbered in target order
+
+Raises:
+    - BulkRowError if a target does not name a board and a list
+"""
+
+
+def parse_targets(targets, card_name, card_desc=""):
+    rows = []
+    seen = set()
+    for target in targets:
+        parts = [part.strip() for part in target.split("/", 2)]
+        if len(parts) < 2 or not parts[0] or not parts[1]:
+            raise BulkRowError(f"Target must be BOARD/LIST or BOARD/LIST/LABEL,LABEL: {target}")
+        labels = []
+        if len(parts) == 3:
+            labels = [label.strip() for label in parts[2].split(",") if label.strip()]
+        key = (parts[0], parts[1], tuple(labels))
+        if key in seen:
+            continue
+        seen.add(key)
+        rows.append(CardRow(len(rows) + 1, parts[0], parts[1], card_name, card_desc, labels))
+    return rows
+
+
+def _fan_out_row(resolver, row, outbox, duplicates):
+    if outbox is None:
+        return create_row_card(resolver, row, duplicates=duplicates)
+    from .outbox import send_or_queue
+
+    try:
+        board_id, list_id, label_ids = resolver.resolve_row(row)
+    except BulkRowError as error:
+        return CardResult(row, str(error))
+    if duplicates is not None:
+        match = duplicates.check(board_id, list_id, row.name)
+        if match is not None:
+            return CardResult(row, card_id=match.card_id, duplicate=match)
+    started = time.perf_counter()
+    card = send_or_queue(
+        outbox, list_id, row.name, row.desc, label_ids, row.board, row.list, background=False
+    )
+    elapsed = time.perf_counter() - started
+    if card is None:
+        return CardResult(row, queued=True, elapsed=elapsed)
+    if duplicates is not None:
+        duplicates.record(board_id, card)
+    return CardResult(row, card_id=card.id, card=card, elapsed=elapsed)
+
+
+"""
+Function to post the same card to several boards at once. Every target gets its own worker,
+so the boards are resolved together (one /batch read for the boards missing from the cache)
+and all cards are sent in parallel; the run takes about as long as its slowest target.
+
+Parameters:
+    - rows: CardRow objects from parse_targets
+    - resolver: BoardNameResolver to use (a new one is created if not given)
+    - outbox: Outbox to save each card in before it is sent (optional). Cards Trello does not
+      accept in time are left to one background flusher
+    - duplicates: DuplicateChecker that targets already holding the card are skipped by
+      (optional)
+
+Returns:
+    - Generator of CardResult objects in completion order
+"""
+
+
+def fan_out_card(rows, resolver=None, outbox=None, duplicates=None):
+    resolver = resolver or BoardNameResolver()
+    queued = False
+    for result in run_bounded(
+        rows, len(rows), lambda row: _fan_out_row(resolver, row, outbox, duplicates)
+    ):
+        queued = queued or result.queued
+        yield result
+    if queued:
+        from .outbox import start_background_flush
+
+        start_background_flush()
+
+
+"""
+Outcome of uploading one attachment
+
+Attributes:
+    - path: Path of the uploaded file
+    - attachment_id: ID of the attachment, None if the upload failed
+"""
+
+
+@dataclass(slots=True)
+class AttachmentResult:
+    path: str
+    attachment_id: str = None
+
+    @property
+    def ok(self):
+        return self.attachment_id is not None
+
+
+"""
+Function to attach several files to a card at once. Every file is uploaded by its own
+worker and streamed from disk, so memory use does not grow with the size of the files.
+
+Parameters:
+    - card_id: ID of the card to attach the files to
+    - paths: Paths of the files to upload
+    - workers: Number of files uploaded concurrently (one per file by default)
+
+Returns:
+    - Generator of AttachmentResult objects in completion order
+"""
+
+
+def upload_attachments(card_id, paths, workers=None):
+    return run_bounded(
+        paths,
+        workers or len(paths),
+        lambda path: AttachmentResult(path, add_card_attachment(card_id, path)),
+    )
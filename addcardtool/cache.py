@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Seconds a cached entry is used without asking the server again
+DEFAULT_TTL = 3600
+
+
+"""
+Function to get the directory cached metadata is stored in. Follows the XDG base directory
+spec and can be overridden with ADDCARDTOOL_CACHE_DIR.
+
+Returns:
+    - Path of the cache directory
+"""
+
+
+def default_cache_dir():
+    cache_dir = os.getenv("ADDCARDTOOL_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+    xdg_cache = os.getenv("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(xdg_cache, "addcardtool")
+
+
+"""
+Cached response for one metadata key
+
+Attributes:
+    - data: Cached value
+    - etag: ETag returned with the value, used to revalidate it
+    - fetched: Time the value was last confirmed with the server
+"""
+
+
+class CacheEntry:
+    def __init__(self, data, etag=None, fetched=0.0):
+        self.data = data
+        self.etag = etag
+        self.fetched = fetched
+
+    def is_fresh(self, ttl):
+        return time.time() - self.fetched < ttl
+
+
+"""
+On-disk cache of board, list and label metadata. Every token gets its own namespace
+directory (named after a hash of the token) with one JSON file per key, so boards seen by
+one account are never served to another.
+
+Parameters:
+    - directory: Root directory of the cache
+    - namespace: Token the cached data belongs to
+    - ttl: Seconds an entry is used before it is revalidated
+"""
+
+
+class MetadataCache:
+    def __init__(self, directory, namespace, ttl=DEFAULT_TTL):
+        digest = hashlib.sha256(str(namespace).encode()).hexdigest()[:16]
+        self.directory = os.path.join(directory, digest)
+        self.ttl = ttl
+        self.refresh = False
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        # Return the entry for key, or None when it is missing or unreadable
+        try:
+            with open(self._path(key), encoding="utf-8") as cache_file:
+                raw = json.load(cache_file)
+            return CacheEntry(raw["data"], raw.get("etag"), raw.get("fetched", 0.0))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def get_fresh(self, key):
+        # Return the entry for key if it can be used without asking the server
+        if self.refresh:
+            return None
+        entry = self.get(key)
+        if entry is not None and entry.is_fresh(self.ttl):
+            return entry
+        return None
+
+    def put(self, key, data, etag=None):
+        entry = CacheEntry(data, etag, time.time())
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as cache_file:
+                json.dump(
+                    {"data": entry.data, "etag": entry.etag, "fetched": entry.fetched},
+                    cache_file,
+                )
+            os.replace(temp_path, path)
+        except OSError:
+            # The cache is only an optimisation, a read-only home directory is not an error
+            pass
+        return entry
+
+    def touch(self, key, entry):
+        # Mark an entry as confirmed by the server without changing its data
+        return self.put(key, entry.data, entry.etag)
+
+    def invalidate(self, *keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+_refresh = False
+
+
+"""
+Function to get the metadata cache for a token
+
+Parameters:
+    - namespace: Token the cached data belongs to
+
+Returns:
+    - MetadataCache shared by every caller using the token
+"""
+
+
+def get_cache(namespace):
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            ttl = float(os.getenv("ADDCARDTOOL_CACHE_TTL", DEFAULT_TTL))
+            cache = _caches[namespace] = MetadataCache(default_cache_dir(), namespace, ttl)
+            cache.refresh = _refresh
+        return cache
+
+
+"""
+Function to make every cache ignore stored entries for the rest of the run. Entries are
+still written so the next run starts warm.
+"""
+
+
+def refresh_all():
+    global _refresh
+    with _caches_lock:
+        _refresh = True
+        for cache in _caches.values():
+            cache.refresh = True
@@ -0,0 +1,446 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+
+from .batch import Batcher
+from .cache import get_cache
+from .client import get_client
+from .models import Card
+from .program import BOARDS_PATH, get_board_cards
+from .sync import CARD_ACTIONS
+
+INDEX_NAME = "cards.sqlite3"
+
+# Similarity of two normalized card names (0 to 1) from which they count as duplicates
+NEAR_DUPLICATE_RATIO = 0.85
+
+# Candidates the full-text search hands to the similarity check
+NEAR_DUPLICATE_CANDIDATES = 20
+
+# Seconds an indexed board is trusted before its new card actions are read
+INDEX_MAX_AGE = 60.0
+
+# Card actions read per board and refresh before the board is indexed again in full
+INDEX_ACTION_LIMIT = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    id TEXT PRIMARY KEY,
+    board_id TEXT NOT NULL,
+    list_id TEXT,
+    name TEXT NOT NULL,
+    desc TEXT NOT NULL DEFAULT '',
+    norm TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cards_by_name ON cards (board_id, norm);
+CREATE TABLE IF NOT EXISTS boards (
+    board_id TEXT PRIMARY KEY,
+    action_id TEXT,
+    refreshed_at REAL NOT NULL
+);
+"""
+
+# Insert a card or update it in place. An update fires the cards_fts_update trigger, while
+# INSERT OR REPLACE would delete the old row without firing cards_fts_delete and leave an
+# orphaned full-text row behind
+UPSERT_CARD = """
+INSERT INTO cards (id, board_id, list_id, name, desc, norm) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    board_id = excluded.board_id,
+    list_id = excluded.list_id,
+    name = excluded.name,
+    desc = excluded.desc,
+    norm = excluded.norm
+"""
+
+# Full-text index over the cards table, kept in step by triggers. Only created when SQLite
+# was built with FTS5; without it near duplicates are found by scanning the board's names
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+    name, desc, content='cards', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS cards_fts_insert AFTER INSERT ON cards BEGIN
+    INSERT INTO cards_fts (rowid, name, desc) VALUES (new.rowid, new.name, new.desc);
+END;
+CREATE TRIGGER IF NOT EXISTS cards_fts_delete AFTER DELETE ON cards BEGIN
+    INSERT INTO cards_fts (cards_fts, rowid, name, desc)
+    VALUES ('delete', old.rowid, old.name, old.desc);
+END;
+CREATE TRIGGER IF NOT EXISTS cards_fts_update AFTER UPDATE ON cards BEGIN
+    INSERT INTO cards_fts (cards_fts, rowid, name, desc)
+    VALUES ('delete', old.rowid, old.name, old.desc);
+    INSERT INTO cards_fts (rowid, name, desc) VALUES (new.rowid, new.name, new.desc);
+END;
+"""
+
+_WORD = re.compile(r"\w+")
+
+
+"""
+Function to reduce a card name to the form duplicates are compared in: case-folded words
+separated by single spaces, so case, punctuation and spacing do not matter
+
+Parameters:
+    - text: Card name
+
+Returns:
+    - Normalized name
+"""
+
+
+def normalize(text):
+    return " ".join(_WORD.findall(text.casefold()))
+
+
+def card_url(card_id):
+    return f"https://trello.com/c/{card_id}"
+
+
+"""
+Function to get the path of the card index. Every token gets its own index next to its
+metadata cache.
+
+Returns:
+    - Path of the index database
+"""
+
+
+def default_index_path():
+    return os.path.join(get_cache(get_client().api_token).directory, INDEX_NAME)
+
+
+"""
+An indexed card that matches a new card's name
+
+Attributes:
+    - card_id: ID of the existing card
+    - name: Name of the existing card
+    - list_id: ID of the list the existing card is on
+    - ratio: Similarity of the normalized names (1.0 for an exact match)
+"""
+
+
+@dataclass(slots=True)
+class DuplicateMatch:
+    card_id: str
+    name: str
+    list_id: str
+    ratio: float
+
+    @property
+    def exact(self):
+        return self.ratio == 1.0
+
+
+"""
+Local index of the names and descriptions of the open cards on boards, stored in SQLite.
+Exact duplicates are found through an index on the normalized name and near duplicates
+through a full-text search followed by a similarity check, both without a request to
+Trello. Safe to share between threads.
+
+Parameters:
+    - path: Path of the database (the token's default index if not given)
+"""
+
+
+class CardIndex:
+    def __init__(self, path=None):
+        self.path = path or default_index_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+
+    def _query(self, statement, parameters=()):
+        with self.lock:
+            return self.connection.execute(statement, parameters).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+    def board_state(self, board_id):
+        # Newest applied action ID and refresh time of an indexed board, None if not indexed
+        rows = self._query(
+            "SELECT action_id, refreshed_at FROM boards WHERE board_id = ?", (board_id,)
+        )
+        return rows[0] if rows else None
+
+    def board_ids(self):
+        return [row[0] for row in self._query("SELECT board_id FROM boards")]
+
+    def card_count(self, board_id=None):
+        if board_id is None:
+            return self._query("SELECT COUNT(*) FROM cards")[0][0]
+        return self._query("SELECT COUNT(*) FROM cards WHERE board_id = ?", (board_id,))[0][0]
+
+    def replace_board(self, board_id, cards, action_id):
+        # Index a board from scratch in one transaction
+        rows = [
+            (card.id, board_id, card.list_id, card.name, card.desc, normalize(card.name))
+            for card in cards
+        ]
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.connection.execute("DELETE FROM cards WHERE board_id = ?", (board_id,))
+                self.connection.executemany(UPSERT_CARD, rows)
+                self._mark(board_id, action_id)
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def _mark(self, board_id, action_id):
+        # Called with the lock held
+        self.connection.execute(
+            "INSERT OR REPLACE INTO boards (board_id, action_id, refreshed_at) VALUES (?, ?, ?)",
+            (board_id, action_id, time.time()),
+        )
+
+    def mark(self, board_id, action_id):
+        with self.lock:
+            self._mark(board_id, action_id)
+
+    def add(self, board_id, card):
+        # Index a card created by the tool so later checks see it straight away
+        self._query(
+            UPSERT_CARD,
+            (card.id, board_id, card.list_id, card.name, card.desc, normalize(card.name)),
+        )
+
+    def apply_action(self, board_id, action):
+        # Apply a card action from the board's action feed
+        data = action.get("data") or {}
+        change = data.get("card") or {}
+        card_id = change.get("id")
+        if not card_id:
+            return
+        action_type = action["type"]
+        if action_type in ("deleteCard", "moveCardFromBoard") or change.get("closed") is True:
+            self._query("DELETE FROM cards WHERE id = ?", (card_id,))
+            return
+        list_id = change.get("idList") or (data.get("listAfter") or data.get("list") or {}).get("id")
+        rows = self._query("SELECT name, desc, list_id FROM cards WHERE id = ?", (card_id,))
+        if rows:
+            name, desc, current_list = rows[0]
+            card = Card(
+                card_id,
+                change.get("name", name),
+                change.get("desc", desc),
+                list_id or current_list,
+            )
+        elif "name" in change:
+            card = Card(card_id, change["name"], change.get("desc") or "", list_id)
+        else:
+            return
+        self.add(board_id, card)
+
+    def _candidates(self, board_id, norm):
+        # Cards on the board whose names share words with norm, best matches first
+        if self.fts:
+            words = " OR ".join(f'"{word}"' for word in norm.split())
+            return self._query(
+                "SELECT cards.id, cards.name, cards.list_id, cards.norm FROM cards_fts"
+                " JOIN cards ON cards.rowid = cards_fts.rowid"
+                " WHERE cards_fts MATCH ? AND cards.board_id = ? ORDER BY rank LIMIT ?",
+                (f"name : ({words})", board_id, NEAR_DUPLICATE_CANDIDATES),
+            )
+        return self._query(
+            "SELECT id, name, list_id, norm FROM cards WHERE board_id = ?", (board_id,)
+        )
+
+    def find_duplicates(self, board_id, name, list_id=None, near=True):
+        # Return indexed cards on the board (or on the list) whose name matches, best first
+        norm = normalize(name)
+        if not norm:
+            return []
+        scope = " AND list_id = ?" if list_id else ""
+        parameters = (board_id, norm, list_id) if list_id else (board_id, norm)
+        rows = self._query(
+            f"SELECT id, name, list_id FROM cards WHERE board_id = ? AND norm = ?{scope}",
+            parameters,
+        )
+        matches = [DuplicateMatch(card_id, card_name, card_list, 1.0) for card_id, card_name, card_list in rows]
+        if matches or not near:
+            return matches
+        for card_id, card_name, card_list, card_norm in self._candidates(board_id, norm):
+            if list_id and card_list != list_id:
+                continue
+            matcher = SequenceMatcher(None, norm, card_norm)
+            if matcher.quick_ratio() < NEAR_DUPLICATE_RATIO:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= NEAR_DUPLICATE_RATIO:
+                matches.append(DuplicateMatch(card_id, card_name, card_list, ratio))
+        return sorted(matches, key=lambda match: -match.ratio)
+
+    def search(self, query, board_id=None, limit=20):
+        # Full-text search over card names and descriptions
+        if not self.fts:
+            return []
+        words = " ".join(f'"{word}"' for word in normalize(query).split())
+        if not words:
+            return []
+        statement = (
+            "SELECT cards.id, cards.board_id, cards.name FROM cards_fts"
+            " JOIN cards ON cards.rowid = cards_fts.rowid WHERE cards_fts MATCH ?"
+        )
+        parameters = [words]
+        if board_id:
+            statement += " AND cards.board_id = ?"
+            parameters.append(board_id)
+        statement += " ORDER BY rank LIMIT ?"
+        parameters.append(limit)
+        return self._query(statement, parameters)
+
+
+def _newest_action_ids(batcher, board_ids):
+    # The newest action of each board, read before its cards so nothing is skipped
+    results = batcher.get_many(
+        [(f"{BOARDS_PATH}/{board_id}/actions", {"limit": 1, "fields": "date"}) for board_id in board_ids]
+    )
+    return [
+        (data[0]["id"] if data else None) if status_code == 200 else False
+        for status_code, data in results
+    ]
+
+
+"""
+Function to index the open cards of boards from scratch
+
+Parameters:
+    - index: CardIndex to fill
+    - board_ids: IDs of the boards to index
+    - batcher: Batcher for the action reads (a new one is created if not given)
+
+Returns:
+    - Number of boards indexed (boards whose cards could not be read are skipped)
+"""
+
+
+def build_board_indexes(index, board_ids, batcher=None):
+    batcher = batcher or Batcher()
+    built = 0
+    for board_id, action_id in zip(board_ids, _newest_action_ids(batcher, board_ids)):
+        if action_id is False:
+            continue
+        cards = get_board_cards(board_id)
+        if cards is None:
+            continue
+        index.replace_board(board_id, cards, action_id)
+        built += 1
+    return built
+
+
+"""
+Function to bring indexed boards up to date from their card actions, ten boards per /batch
+request. Boards not indexed yet, and boards with more than limit new card actions, are
+indexed from scratch.
+
+Parameters:
+    - index: CardIndex to refresh
+    - board_ids: IDs of the boards to refresh
+    - limit: Most card actions read per board before it is indexed again
+    - batcher: Batcher for the reads (a new one is created if not given)
+
+Returns:
+    - Number of boards refreshed from their actions and number indexed from scratch
+"""
+
+
+def refresh_board_indexes(index, board_ids, limit=INDEX_ACTION_LIMIT, batcher=None):
+    batcher = batcher or Batcher()
+    states = {board_id: index.board_state(board_id) for board_id in board_ids}
+    indexed = [board_id for board_id in board_ids if states[board_id] is not None]
+    requests = []
+    for board_id in indexed:
+        query = {"filter": ",".join(CARD_ACTIONS), "limit": limit, "fields": "type,data"}
+        if states[board_id][0]:
+            query["since"] = states[board_id][0]
+        requests.append((f"{BOARDS_PATH}/{board_id}/actions", query))
+    rebuild = [board_id for board_id in board_ids if states[board_id] is None]
+    refreshed = 0
+    for board_id, (status_code, actions) in zip(indexed, batcher.get_many(requests)):
+        if status_code != 200 or len(actions) >= limit:
+            rebuild.append(board_id)
+            continue
+        # Trello returns the newest action first
+        for action in reversed(actions):
+            index.apply_action(board_id, action)
+        index.mark(board_id, actions[0]["id"] if actions else states[board_id][0])
+        refreshed += 1
+    return refreshed, build_board_indexes(index, rebuild, batcher) if rebuild else 0
+
+
+"""
+Checks new cards against the card index before they are created. A board is indexed the
+first time it is checked and its new card actions are read when it was last refreshed
+more than max_age seconds ago. Names claimed by cards being created in the same run count
+as duplicates too, so a bulk import does not create the same card twice.
+
+Parameters:
+    - index: CardIndex to check against (the token's default index if not given)
+    - max_age: Seconds a board's index is trusted before it is refreshed
+    - near: Also treat near duplicates as duplicates
+    - same_list: Only compare with cards on the target list instead of the whole board
+"""
+
+
+class DuplicateChecker:
+    def __init__(self, index=None, max_age=INDEX_MAX_AGE, near=True, same_list=False):
+        self.index = index or CardIndex()
+        self.max_age = max_age
+        self.near = near
+        self.same_list = same_list
+        self._lock = threading.Lock()
+        self._board_locks = {}
+        self._claimed = {}
+
+    def _ensure_fresh(self, board_id):
+        with self._lock:
+            board_lock = self._board_locks.setdefault(board_id, threading.Lock())
+        with board_lock:
+            state = self.index.board_state(board_id)
+            if state is None or time.time() - state[1] > self.max_age:
+                refresh_board_indexes(self.index, [board_id])
+
+    def check(self, board_id, list_id, name):
+        # Return the best match for a card about to be created, or None (and claim its name)
+        self._ensure_fresh(board_id)
+        matches = self.index.find_duplicates(
+            board_id, name, list_id if self.same_list else None, self.near
+        )
+        if matches:
+            return matches[0]
+        key = self._key(board_id, list_id, name)
+        with self._lock:
+            claimed = self._claimed.get(key)
+            if claimed is None:
+                self._claimed[key] = name
+                return None
+        return DuplicateMatch(None, claimed, list_id, 1.0)
+
+    def _key(self, board_id, list_id, name):
+        return (board_id, list_id if self.same_list else None, normalize(name))
+
+    def release(self, board_id, list_id, name):
+        # Give up the name claimed by check for a card that could not be created, so a
+        # later row with the same name is sent
+        with self._lock:
+            self._claimed.pop(self._key(board_id, list_id, name), None)
+
+    def record(self, board_id, card):
+        # Add a card the run created to the index
+        self.index.add(board_id, card)
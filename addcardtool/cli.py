@@ -1,23 +1,80 @@
+import contextlib
+import os
+import sys
 import typer
-import subprocess
-from PyInquirer import prompt, print_json, Separator
-from rich import print as rprint
-from typing import Optional
+import time
+from typing import List, Optional
 from addcardtool import __app_name__, __version__
-from .program import (
-    create_new_label,
-    get_all_user_boards_name,
-    get_board_labels,
-    get_board_lists,
-    create_new_card,
-    create_new_board,
-    create_new_list,
+from .config import (
+    DEFAULT_LABEL_COLOR,
+    DEFAULT_PROFILE,
+    DEFAULT_WORKERS,
+    SYNC_ACTION_LIMIT,
+    ProfileError,
+    get_config,
+)
+from .output import (
+    CREATED,
+    OUTPUT_FORMATS,
+    QUEUED,
+    SKIPPED,
+    TEXT,
+    card_record,
+    card_result_record,
+    get_output,
+    set_output,
 )
 
 
 app = typer.Typer()
 
 
+# PyInquirer (and prompt-toolkit under it) and rich are imported on first use so that
+# --version, --help and the non-interactive commands start without loading them. The rest
+# of the package is likewise imported inside the commands that use it, so --help does not
+# load the HTTP client, SQLite or the daemon
+def prompt(questions):
+    from PyInquirer import prompt as inquirer_prompt
+
+    return inquirer_prompt(questions)
+
+
+def rprint(*objects, **kwargs):
+    from rich import print as rich_print
+
+    rich_print(*objects, **kwargs)
+
+
+# Board details are prefetched for every board when an account has at most this many,
+# so the list menu is ready whichever board is picked
+SPECULATIVE_BOARD_LIMIT = 5
+
+
+"""
+Function to start fetching the user's boards in the background. Once the boards arrive the
+details of small accounts' boards are prefetched as well.
+
+Parameters:
+    - prefetcher: Prefetcher: Prefetcher running the background reads
+
+Returns:
+    - None
+"""
+
+
+def prefetch_boards(prefetcher):
+    from .program import get_all_user_boards_name, get_board
+
+    def fetch_boards():
+        boards = get_all_user_boards_name()
+        if boards is not None and len(boards) <= SPECULATIVE_BOARD_LIMIT:
+            for board in boards:
+                prefetcher.submit(("board", board.id), get_board, board.id)
+        return boards
+
+    prefetcher.submit("boards", fetch_boards)
+
+
 """
 Version Callback function to show the version of the application
 
@@ -77,7 +134,11 @@ def get_card_name_and_desc():
 
 
 """
-Function to get board selection from user
+Function to get board selection from user. The selected board's lists and labels start
+loading in the background as soon as it is picked.
+
+Parameters:
+    - prefetcher: Prefetcher: Prefetcher that loads boards and board details
 
 Returns:
     - selected_board_id: str: ID of the selected board
@@ -85,18 +146,21 @@ Returns:
 """
 
 
-def get_board_selection():
+def get_board_selection(prefetcher):
     # prompt to query user for board name
-    boards = get_all_user_boards_name()
+    from .picker import SEARCH_THRESHOLD, search_select
+    from .program import create_new_board, get_all_user_boards_name, get_board
+
+    boards = prefetcher.result("boards", get_all_user_boards_name)
     # check if board query was successful
     if boards is None:
         rprint("[red bold]Error: Unable to get boards[/red bold]")
         raise typer.Exit()
     board_choices = []
     for i in range(len(boards)):
-        board_name = boards[i][0]
+        board_name = boards[i].name
         board_desc = (
-            boards[i][2] if not boards[i][2] == "" else "No Description Avaliable"
+            boards[i].desc if not boards[i].desc == "" else "No Description Avaliable"
         )
         board_choices.append(
             {"name": f"Board Name:{board_name}, Description:{board_desc}", "value": i}
@@ -130,9 +194,17 @@ def get_board_selection():
         }
     ]
 
-    # Prompt to get board to add card to
-    board_idx = prompt(question_board_name)
-    board_idx = board_idx["board_name"]
+    # Prompt to get board to add card to. Long menus are searched instead of scrolled
+    if len(board_choices) > SEARCH_THRESHOLD:
+        # Search the bare names and descriptions so exact and prefix matches rank first
+        board_entries = [
+            (board.name, board.desc, i, board_choices[i]["name"]) for i, board in enumerate(boards)
+        ]
+        board_entries.append((add_new_board_choice, "", -1, add_new_board_choice))
+        board_idx = search_select("Select Board Name", board_entries)
+    else:
+        board_idx = prompt(question_board_name)
+        board_idx = board_idx["board_name"]
     is_new_board = True if board_idx == -1 else False
     if is_new_board:
         prompt_new_board_name = prompt(question_new_board_name)
@@ -153,9 +225,10 @@ def get_board_selection():
 
         board_name = new_board_name
     else:
-        selected_board_id = boards[board_idx][1]
-        board_name = boards[board_idx][0]
+        selected_board_id = boards[board_idx].id
+        board_name = boards[board_idx].name
 
+    prefetcher.submit(("board", selected_board_id), get_board, selected_board_id)
     return selected_board_id, is_new_board, board_name
 
 
@@ -163,7 +236,7 @@ def get_board_selection():
 Function to get list selection from user
 
 Parameters:
-    - selected_board_id: str: ID of the selected board
+    - board: Board: Selected board with its lists
     - is_new_board: bool: True if user selected to add a new board, False if user selected an existing board
 
 Returns:
@@ -172,7 +245,10 @@ Returns:
 """
 
 
-def get_list_selection(selected_board_id, is_new_board):
+def get_list_selection(board, is_new_board):
+    from .picker import SEARCH_THRESHOLD, search_select
+    from .program import create_new_list
+
     question_new_list_name = [
         {
             "type": "input",
@@ -180,13 +256,8 @@ def get_list_selection(selected_board_id, is_new_board):
             "message": "Chosen board is New/Has no lists. Enter New List Name for Card:",
         }
     ]
-    lists = get_board_lists(selected_board_id)
-
-
-    # check if list query was successful
-    if lists is None:
-        rprint("[red bold]Error: Unable to get board lists[/red bold]")
-        raise typer.Exit()
+    selected_board_id = board.id
+    lists = board.lists
 
     if is_new_board or len(lists) == 0:
         prompt_new_list_name = prompt(question_new_list_name)
@@ -206,7 +277,7 @@ def get_list_selection(selected_board_id, is_new_board):
         # Get all columns from board
         list_choices = []
         for i in range(len(lists)):
-            list_name = lists[i][0]
+            list_name = lists[i].name
             list_choices.append({"name": f"List Name:{list_name}", "value": i})
 
         question_list_name = [
@@ -219,10 +290,16 @@ def get_list_selection(selected_board_id, is_new_board):
         ]
 
         # Prompt to get list to add card to
-        list_idx = prompt(question_list_name)
-        list_idx = list_idx["list_name"]
-        selected_list_id = lists[list_idx][1]
-        list_name = lists[list_idx][0]
+        if len(list_choices) > SEARCH_THRESHOLD:
+            list_entries = [
+                (lists[i].name, "", i, choice["name"]) for i, choice in enumerate(list_choices)
+            ]
+            list_idx = search_select("Select List Name", list_entries)
+        else:
+            list_idx = prompt(question_list_name)
+            list_idx = list_idx["list_name"]
+        selected_list_id = lists[list_idx].id
+        list_name = lists[list_idx].name
     return selected_list_id, list_name
 
 
@@ -230,7 +307,7 @@ def get_list_selection(selected_board_id, is_new_board):
 Function to get label selection from user
 
 Parameters:
-    - selected_board_id: str: ID of the selected board
+    - board: Board: Selected board with its labels
 
 Returns:
     - selected_labels_ids: list: List of selected label IDs
@@ -238,13 +315,13 @@ Returns:
 """
 
 
-def get_label_selections(selected_board_id):
+def get_label_selections(board):
     # get all labels on board
-    labels = get_board_labels(selected_board_id)
-    # check if label query was successful
-    if labels is None:
-        rprint("[red bold]Error: Unable to get board labels[/red bold]")
-        raise typer.Exit()
+    from .picker import multi_select
+    from .program import create_new_label
+
+    selected_board_id = board.id
+    labels = board.labels
     # Prompt to get label from user
     if len(labels) == 0:
         question_label = [
@@ -271,23 +348,19 @@ def get_label_selections(selected_board_id):
                 ],
             }
         ]
-    label_choices = []
+    label_entries = []
     for i in range(len(labels)):
-        label_name = labels[i][0] if not labels[i][0] == "" else "No Name Provided"
-        label_color = labels[i][1]
-        label_choices.append(
-            {"name": f"Label Name:{label_name}, Label Color:{label_color}", "value": i}
+        label_name = labels[i].name if not labels[i].name == "" else "No Name Provided"
+        label_color = labels[i].color
+        label_entries.append(
+            (
+                labels[i].name,
+                label_color or "",
+                i,
+                f"Label Name:{label_name}, Label Color:{label_color}",
+            )
         )
 
-    question_existing_label_name = [
-        {
-            "type": "list",
-            "name": "label_name",
-            "message": "Select From existing Labels:",
-            "choices": label_choices,
-        }
-    ]
-
     selected_labels_ids = []
     # Prompt to get label from user
     is_new_label = 0
@@ -350,17 +423,42 @@ def get_label_selections(selected_board_id):
                 raise typer.Exit()
             selected_labels_ids.append(new_label_id)
         elif is_new_label == 0:
-            selected_label = prompt(question_existing_label_name)
-            selected_label = selected_label["label_name"]
-            selected_label_id = labels[selected_label][2]
-            selected_labels_ids.append(selected_label_id)
+            # Pick any number of existing labels at once
+            for selected_label in multi_select("Select From existing Labels:", label_entries):
+                selected_label_id = labels[selected_label].id
+                if selected_label_id not in selected_labels_ids:
+                    selected_labels_ids.append(selected_label_id)
         else:
             break
     return selected_labels_ids
 
 
+"""
+Function to print and export the requests recorded while a command ran
+
+Parameters:
+    - tracer: Tracer: Tracer the client recorded the requests in
+    - show: bool: Print the waterfall and per-endpoint latencies
+    - trace_file: str: File to export the spans to (optional)
+    - trace_format: str: Format of the exported file, json or otlp
+
+Returns:
+    - None
+"""
+
+
+def report_trace(tracer, show, trace_file, trace_format):
+    if show:
+        for line in tracer.waterfall() + [""] + tracer.summary():
+            typer.echo(line, err=True)
+    if trace_file:
+        tracer.export(trace_file, trace_format)
+        typer.echo(f"Trace written to {trace_file}", err=True)
+
+
 @app.callback()
 def callback(
+    ctx: typer.Context,
     version: Optional[bool] = typer.Option(
         None,
         "--version",
@@ -368,42 +466,1070 @@ def callback(
         help="Show the applications version then exit application",
         callback=version_callback,
         is_eager=True,
-    )
+    ),
+    trace: bool = typer.Option(
+        False, "--trace", help="Print a waterfall of every Trello request and its latency when done"
+    ),
+    trace_file: Optional[str] = typer.Option(
+        None, "--trace-file", help="Export the recorded requests to this file"
+    ),
+    trace_format: str = typer.Option(
+        "json", "--trace-format", help="Format of --trace-file: json or otlp (OpenTelemetry)"
+    ),
+    profile: Optional[str] = typer.Option(
+        None,
+        "--profile",
+        help="Credential profile to act as (see: addcardtool profiles); ADDCARDTOOL_PROFILE by default",
+    ),
+    output_format: str = typer.Option(
+        TEXT,
+        "--output",
+        "-o",
+        help="Output format: text, json (one document when done) or ndjson (one line per result as it completes)",
+    ),
 ) -> None:
-    pass
+    if output_format not in OUTPUT_FORMATS:
+        rprint(f"[red bold]Error: --output must be one of {', '.join(OUTPUT_FORMATS)}[/red bold]")
+        raise typer.Exit(code=2)
+    set_output(output_format, sys.stdout)
+    if output_format != TEXT:
+        # stdout carries only the results; prose, prompts and errors go to stderr
+        ctx.with_resource(contextlib.redirect_stdout(sys.stderr))
+    if profile:
+        from .client import set_default_profile
+
+        try:
+            set_default_profile(profile)
+        except ProfileError as error:
+            rprint(f"[red bold]Error: {error}[/red bold]")
+            raise typer.Exit(code=2)
+    if trace or trace_file:
+        from .client import get_client
+        from .tracing import Tracer
+
+        tracer = Tracer()
+        get_client().enable_tracing(tracer)
+        ctx.call_on_close(lambda: report_trace(tracer, trace, trace_file, trace_format))
+
+
+"""
+Function to add a card from names given on the command line, without any prompts. Names are
+resolved through the metadata cache, so on a warm cache the card is the only request sent.
+
+Parameters:
+    - board_name: str: Name or ID of the board
+    - list_name: str: Name or ID of the list
+    - label_names: list: Names or IDs of the labels
+    - card_name: str: Name of the card
+    - card_desc: str: Description of the card
+    - create_missing: bool: Create the list and labels if the board does not have them
+    - label_color: str: Color of created labels
+    - use_daemon: bool: Send the card through a running daemon when there is one
+    - queue: bool: Save the card in the outbox when Trello does not answer in time
+    - skip_duplicates: bool: Skip the card if the board already has one with the same name
+    - attachments: list: Paths of files to attach to the card
+
+Returns:
+    - None
+"""
+
+
+def add_card_by_name(
+    board_name,
+    list_name,
+    label_names,
+    card_name,
+    card_desc,
+    create_missing,
+    label_color,
+    use_daemon=False,
+    queue=False,
+    skip_duplicates=False,
+    attachments=(),
+):
+    if not board_name or not list_name or not card_name:
+        rprint("[red bold]Error: --board, --list and --name are all required[/red bold]")
+        raise typer.Exit(code=2)
+    started = time.perf_counter()
+    daemon_error = None
+    if use_daemon:
+        from .client import current_profile
+        from .remote import DaemonClient, DaemonError, DaemonUnavailable
+
+        # Hand the card to a running daemon, which has a warm client and cache
+        try:
+            # The daemon acts as its own profile unless another one was selected
+            profile = current_profile()
+            card = DaemonClient().add_card(
+                board_name,
+                list_name,
+                card_name,
+                card_desc,
+                label_names,
+                create_missing,
+                label_color,
+                profile if profile != DEFAULT_PROFILE else None,
+            )
+        except DaemonUnavailable:
+            card = None
+        except DaemonError as error:
+            if error.status_code is not None and error.status_code < 500:
+                rprint(f"[red bold]Error: {error}[/red bold]")
+                raise typer.Exit(code=1)
+            # Trello failed for the daemon or its answer was lost; carry on without it so
+            # the card can still be queued
+            rprint(f"[yellow]The daemon could not add the card: {error}[/yellow]")
+            daemon_error = error
+            card = None
+        if card is not None:
+            rprint(f"[green bold]Card Added Successfully[/green bold] ({card.id})")
+            report_added_card(card, started)
+            return
+    from .resolver import NameResolver, ResolveError
+
+    resolver = NameResolver(create_missing=create_missing, label_color=label_color)
+    try:
+        board_id, list_id, label_ids = resolver.resolve(board_name, list_name, label_names)
+    except ResolveError as error:
+        rprint(f"[red bold]Error: {error}[/red bold]")
+        raise typer.Exit(code=1)
+    if skip_duplicates and report_duplicate(board_id, list_id, card_name):
+        return
+    if daemon_error is not None and daemon_error.status_code != 502:
+        # Only a 502 says Trello refused the card. After a lost answer or a 500 the daemon
+        # may still have created it, so it must not simply be sent again
+        if not queue:
+            rprint("[red bold]Error: The card may or may not have been added[/red bold]")
+            raise typer.Exit(code=1)
+        from .outbox import Outbox, queue_unanswered
+
+        queue_unanswered(
+            Outbox(), list_id, card_name, card_desc, label_ids, board_name, list_name, str(daemon_error)
+        )
+        report_queued(card_name, board_name, list_name, list_id)
+        return
+    card = deliver_card(list_id, card_name, card_desc, label_ids, board_name, list_name, queue)
+    if card is not None:
+        rprint(f"[green bold]Card Added Successfully[/green bold] ({card.id})")
+        report_added_card(card, started, attach_files(card.id, attachments))
+
+
+"""
+Function to post one card to several boards at once and report the result for each target
+
+Parameters:
+    - targets: list: BOARD/LIST or BOARD/LIST/LABEL,LABEL strings
+    - card_name: str: Name of the card
+    - card_desc: str: Description of the card
+    - create_missing: bool: Create lists and labels the boards do not have
+    - label_color: str: Color of labels made by create_missing
+    - queue: bool: Save the cards in the outbox when Trello does not answer in time
+    - skip_duplicates: bool: Skip targets that already have a card with the same name
+    - attachments: list: Paths of files to attach to every created card
+
+Returns:
+    - None
+"""
+
+
+def fan_out(
+    targets,
+    card_name,
+    card_desc,
+    create_missing,
+    label_color,
+    queue,
+    skip_duplicates=False,
+    attachments=(),
+):
+    from .bulk import BoardNameResolver, BulkRowError, fan_out_card, parse_targets
+    from .client import get_client
+
+    if not card_name:
+        rprint("[red bold]Error: --name is required with --to[/red bold]")
+        raise typer.Exit(code=2)
+    try:
+        rows = parse_targets(targets, card_name, card_desc)
+    except BulkRowError as error:
+        rprint(f"[red bold]Error: {error}[/red bold]")
+        raise typer.Exit(code=2)
+    started = time.perf_counter()
+    get_client().ensure_pool_size(len(rows))
+    resolver = BoardNameResolver(create_missing=create_missing, label_color=label_color)
+    outbox = None
+    if queue:
+        from .outbox import Outbox
+
+        outbox = Outbox()
+    duplicates = None
+    if skip_duplicates:
+        from .cardindex import DuplicateChecker
+
+        duplicates = DuplicateChecker()
+    created = []
+
+    def remember(results):
+        # Keep the created cards to attach the files to once every target is reported
+        for result in results:
+            if result.card is not None:
+                created.append(result.card)
+            yield result
+
+    failed = report_card_results(
+        remember(fan_out_card(rows, resolver, outbox, duplicates)), started, prefix="Target"
+    )
+    for card in created:
+        failed += sum(not result.ok for result in attach_files(card.id, attachments))
+    if failed:
+        raise typer.Exit(code=1)
+
+
+"""
+Function to attach files to a created card, all at once, and report each upload
+
+Parameters:
+    - card_id: str: ID of the card
+    - attachments: list: Paths of the files to attach
+
+Returns:
+    - list: AttachmentResult objects in completion order
+"""
+
+
+def attach_files(card_id, attachments):
+    from .bulk import upload_attachments
+    from .client import get_client
+
+    if not attachments:
+        return []
+    get_client().ensure_pool_size(len(attachments))
+    results = []
+    for result in upload_attachments(card_id, attachments):
+        results.append(result)
+        if result.ok:
+            rprint(f"Attached [cyan]{result.path}[/cyan] ({result.attachment_id})")
+        else:
+            rprint(f"[red bold]Error: Unable to attach {result.path}[/red bold]")
+    return results
+
+
+"""
+Function to write a card added by add-card in the chosen output format. The command fails
+if any of its files could not be attached.
+
+Parameters:
+    - card: Card: The created card
+    - started: float: perf_counter value when the card was started
+    - attached: list: AttachmentResult objects of the card's files
+
+Returns:
+    - None
+"""
+
+
+def report_added_card(card, started, attached=()):
+    record = {"status": CREATED, **card_record(card)}
+    record["elapsed"] = round(time.perf_counter() - started, 4)
+    if attached:
+        record["attachments"] = [
+            {"path": result.path, "attachment_id": result.attachment_id} for result in attached
+        ]
+    get_output().document(record)
+    if any(not result.ok for result in attached):
+        raise typer.Exit(code=1)
+
+
+"""
+Function to look for a card with the same or a similar name on the board before a new one is
+created. The board's cards are read into the local card index the first time and only
+their recent changes after that.
+
+Parameters:
+    - board_id: str: ID of the board the card is for
+    - list_id: str: ID of the list the card is for
+    - card_name: str: Name of the new card
+
+Returns:
+    - True if a matching card was found (and reported), False otherwise
+"""
+
+
+def report_duplicate(board_id, list_id, card_name):
+    from .cardindex import DuplicateChecker, card_url
+
+    match = DuplicateChecker().check(board_id, list_id, card_name)
+    if match is None:
+        return False
+    kind = "A card named" if match.exact else "A similar card"
+    rprint(
+        f"[yellow bold]{kind} [/yellow bold][yellow]{match.name}[/yellow][yellow bold] is already on the board, skipped[/yellow bold] ({card_url(match.card_id)})"
+    )
+    get_output().document(
+        {
+            "status": SKIPPED,
+            "name": card_name,
+            "duplicate_of": match.name,
+            "card_id": match.card_id,
+            "url": card_url(match.card_id),
+            "list_id": match.list_id,
+            "board_id": board_id,
+        }
+    )
+    return True
+
+
+"""
+Function to start sending cards left in the outbox by earlier runs, if any are due
+
+Returns:
+    - None
+"""
+
+
+def flush_outbox_in_background():
+    from .outbox import has_due_entries, start_background_flush
+
+    if has_due_entries():
+        start_background_flush()
+
+
+"""
+Function to create a card. With queue the card is saved in the outbox first and handed to a
+background flusher if Trello does not answer within a few seconds, so nothing the user typed
+is lost and the command returns promptly either way.
+
+Parameters:
+    - list_id: str: ID of the list to add the card to
+    - card_name: str: Name of the card
+    - card_desc: str: Description of the card
+    - label_ids: list: IDs of the labels to attach
+    - board_name: str: Name of the board, shown by outbox list
+    - list_name: str: Name of the list, shown by outbox list
+    - queue: bool: Use the outbox
+
+Returns:
+    - The created Card, None if it was queued
+"""
+
 
+def deliver_card(list_id, card_name, card_desc, label_ids, board_name, list_name, queue):
+    from .program import create_new_card
+
+    if not queue:
+        card = create_new_card(list_id, card_name, card_desc, label_ids)
+        if card is None:
+            rprint("[red bold]Error: Unable to add card to board[/red bold]")
+            raise typer.Exit(code=1)
+        return card
+
+    from .outbox import Outbox, send_or_queue
+
+    card = send_or_queue(Outbox(), list_id, card_name, card_desc, label_ids, board_name, list_name)
+    if card is None:
+        report_queued(card_name, board_name, list_name, list_id)
+    return card
+
+
+"""
+Function to report a card that was saved in the outbox to be sent in the background
+
+Parameters:
+    - card_name: str: Name of the card
+    - board_name: str: Name of the board
+    - list_name: str: Name of the list
+    - list_id: str: ID of the list
+
+Returns:
+    - None
+"""
+
+
+def report_queued(card_name, board_name, list_name, list_id):
+    rprint(
+        "[yellow bold]Trello did not accept the card yet. It is saved in the outbox and will be sent in the background[/yellow bold] (see: addcardtool outbox list)"
+    )
+    get_output().document(
+        {"status": QUEUED, "name": card_name, "board": board_name, "list": list_name, "list_id": list_id}
+    )
 
 
 @app.command("add-card")
-def add_card():
+def add_card(
+    refresh: bool = typer.Option(
+        False, "--refresh", help="Fetch boards, lists and labels from Trello instead of the cache"
+    ),
+    board_name: Optional[str] = typer.Option(
+        None, "--board", help="Board name or ID; skips the prompts when given"
+    ),
+    list_name: Optional[str] = typer.Option(None, "--list", help="List name or ID"),
+    label_names: List[str] = typer.Option(
+        [], "--label", help="Label name or ID (repeat for several labels)"
+    ),
+    card_name: Optional[str] = typer.Option(None, "--name", help="Name of the card"),
+    card_desc: str = typer.Option("", "--desc", help="Description of the card"),
+    create_missing: bool = typer.Option(
+        False, "--create-missing", help="Create the list and labels if the board does not have them"
+    ),
+    label_color: str = typer.Option(
+        DEFAULT_LABEL_COLOR, "--label-color", help="Color of labels made by --create-missing"
+    ),
+    use_daemon: bool = typer.Option(
+        True, "--daemon/--no-daemon", help="Send the card through a running serve daemon if there is one"
+    ),
+    queue: bool = typer.Option(
+        True,
+        "--queue/--no-queue",
+        help="Save the card in the outbox and send it in the background if Trello is slow or unreachable",
+    ),
+    targets: List[str] = typer.Option(
+        [],
+        "--to",
+        help="BOARD/LIST or BOARD/LIST/LABEL,LABEL to post the card to (repeat to post it to several boards at once)",
+    ),
+    skip_duplicates: bool = typer.Option(
+        False,
+        "--skip-duplicates",
+        help="Do not add the card if the board already has a card with the same or a similar name",
+    ),
+    attachments: List[str] = typer.Option(
+        [],
+        "--attach",
+        help="File to attach to the card, streamed from disk (repeat for several files, uploaded at once)",
+    ),
+):
     """
     Add a new card to a specified board and list
     """
+    missing = [path for path in attachments if not os.path.isfile(path)]
+    if missing:
+        rprint(f"[red bold]Error: No such file: {missing[0]}[/red bold]")
+        raise typer.Exit(code=2)
+    if refresh:
+        from .cache import refresh_all
+
+        refresh_all()
+    if queue:
+        flush_outbox_in_background()
+    # The outbox and the daemon only carry the card's fields, so cards with attachments are
+    # sent directly
+    queue = queue and not attachments
+    use_daemon = use_daemon and not attachments
+
+    if targets:
+        if board_name is not None or list_name is not None or label_names:
+            rprint("[red bold]Error: --to cannot be combined with --board, --list or --label[/red bold]")
+            raise typer.Exit(code=2)
+        fan_out(
+            targets,
+            card_name,
+            card_desc,
+            create_missing,
+            label_color,
+            queue,
+            skip_duplicates,
+            attachments,
+        )
+        return
+
+    if board_name is not None or list_name is not None or card_name is not None:
+        add_card_by_name(
+            board_name,
+            list_name,
+            label_names,
+            card_name,
+            card_desc,
+            create_missing,
+            label_color,
+            # The daemon does not check for duplicates
+            use_daemon and not refresh and not skip_duplicates,
+            queue,
+            skip_duplicates,
+            attachments,
+        )
+        return
+
+    from .prefetch import Prefetcher
+    from .program import get_board
+
+    with Prefetcher() as prefetcher:
+        # Load boards in the background while the user types the card details
+        prefetch_boards(prefetcher)
+
+        # Get card name and description from user
+        card_name, card_desc = get_card_name_and_desc()
+
+        # Get board selection from user
+        selected_board_id, is_new_board, board_name = get_board_selection(prefetcher)
 
-    # Get card name and description from user
-    card_name, card_desc = get_card_name_and_desc()
+        # Get the board with its lists and labels, prefetched when the board was picked
+        board = prefetcher.result(("board", selected_board_id), get_board, selected_board_id)
 
-    # Get board selection from user
-    selected_board_id, is_new_board, board_name = get_board_selection()
+    if board is None:
+        rprint("[red bold]Error: Unable to get board lists and labels[/red bold]")
+        raise typer.Exit()
 
     # Get list selection from user
-    selected_list_id, list_name = get_list_selection(selected_board_id, is_new_board)
+    selected_list_id, list_name = get_list_selection(board, is_new_board)
 
     # Get label selection from user
-    selected_labels_ids = get_label_selections(selected_board_id)
+    selected_labels_ids = get_label_selections(board)
+
+    if skip_duplicates and not is_new_board:
+        if report_duplicate(selected_board_id, selected_list_id, card_name):
+            raise typer.Exit()
 
     # Add card to board
     rprint(
         f"Adding Card to Board:[blue] {board_name}[/blue], List: [green]{list_name}[/green] with card name: [yellow]{card_name}[/yellow] and card description: [magenta]{card_desc}[/magenta]\n"
     )
-    card_response = create_new_card(
-        selected_list_id, card_name, card_desc, selected_labels_ids
+    started = time.perf_counter()
+    card = deliver_card(
+        selected_list_id, card_name, card_desc, selected_labels_ids, board_name, list_name, queue
     )
-    if card_response:
+    if card is not None:
         rprint("[green bold]Card Added Successfully[/green bold]\n")
-        raise typer.Exit()
+        report_added_card(card, started, attach_files(card.id, attachments))
+    raise typer.Exit()
+
+
+"""
+Function to print the outcome of every card in a bulk run followed by a summary
+
+Parameters:
+    - results: Iterable of CardResult objects
+    - started: float: perf_counter value when the run started
+    - prefix: str: What each result line is numbered as ("Row" or "Target")
+
+Returns:
+    - failed: int: Number of cards that were not created
+"""
+
+
+def report_card_results(results, started, prefix="Row"):
+    from .client import get_client
+
+    output = get_output()
+    created = 0
+    queued = 0
+    skipped = 0
+    failed = 0
+    for result in results:
+        output.result(card_result_record(result, prefix.lower()))
+        row = result.row
+        if result.duplicate is not None:
+            skipped += 1
+            existing = result.card_id or f"same as an earlier {prefix.lower()}"
+            rprint(
+                f"{prefix} {row.number}: [yellow]skipped[/yellow] [yellow]{row.name}[/yellow], [blue]{row.board}[/blue] already has [yellow]{result.duplicate.name}[/yellow] ({existing})"
+            )
+        elif result.queued:
+            queued += 1
+            rprint(
+                f"{prefix} {row.number}: [yellow]queued[/yellow] [yellow]{row.name}[/yellow] for [blue]{row.board}[/blue] / [green]{row.list}[/green] (see: addcardtool outbox list)"
+            )
+        elif result.ok:
+            created += 1
+            action = "already created" if result.recovered else "created"
+            rprint(
+                f"{prefix} {row.number}: [green]{action}[/green] [yellow]{row.name}[/yellow] in [blue]{row.board}[/blue] / [green]{row.list}[/green] ({result.card_id})"
+            )
+        else:
+            failed += 1
+            rprint(f"{prefix} {row.number}: [red]failed[/red] {row.name}: {result.error}")
+    elapsed = time.perf_counter() - started
+    waiting = f", {queued} queued" if queued else ""
+    waiting += f", {skipped} skipped as duplicates" if skipped else ""
+    rprint(
+        f"[bold]Created {created} of {created + queued + skipped + failed} cards ({failed} failed{waiting}) in {elapsed:.2f}s[/bold]"
+    )
+    stats = get_client().rate_limiter.stats()
+    rprint(
+        f"Rate limiter: {stats['queued']} queued, {stats['delayed_ms']:.0f}ms delayed, {stats['throttled']} throttled (429)"
+    )
+    output.finish(
+        created=created,
+        queued=queued,
+        skipped=skipped,
+        failed=failed,
+        elapsed=round(elapsed, 4),
+        rate_limiter=stats,
+    )
+    return failed
+
+
+@app.command("add-cards")
+def add_cards(
+    source: str = typer.Option(
+        ...,
+        "--from",
+        help="CSV or JSONL file with board, list, name, desc and labels columns ('-' reads stdin)",
+    ),
+    file_format: Optional[str] = typer.Option(
+        None, "--format", help="Input format (csv or jsonl), detected from the file name by default"
+    ),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, "--workers", "-w", help="Number of cards created concurrently"
+    ),
+    refresh: bool = typer.Option(
+        False, "--refresh", help="Fetch boards, lists and labels from Trello instead of the cache"
+    ),
+    journal_path: Optional[str] = typer.Option(
+        None,
+        "--journal",
+        help="Record every card in this journal so an interrupted import can be finished with resume",
+    ),
+    skip_duplicates: bool = typer.Option(
+        False,
+        "--skip-duplicates",
+        help="Skip rows whose board already has a card with the same or a similar name, and rows repeated in the file",
+    ),
+):
+    """
+    Add many cards from a CSV or JSONL file without prompts
+    """
+    from .bulk import BulkRowError, create_cards, detect_format, iter_rows, open_source
+    from .cache import refresh_all
+    from .client import get_client
+    from .journal import CardJournal
+
+    if refresh:
+        refresh_all()
+    started = time.perf_counter()
+    get_client().ensure_pool_size(workers)
+    journal = CardJournal(journal_path) if journal_path else None
+    duplicates = None
+    if skip_duplicates:
+        from .cardindex import DuplicateChecker
+
+        duplicates = DuplicateChecker()
+    with open_source(source) as stream:
+        rows = iter_rows(stream, detect_format(source, file_format))
+        try:
+            failed = report_card_results(
+                create_cards(rows, workers=workers, journal=journal, duplicates=duplicates), started
+            )
+        except BulkRowError as error:
+            raise typer.BadParameter(str(error), param_hint="--from")
+    if failed:
+        raise typer.Exit(code=1)
+
+
+@app.command("apply-template")
+def apply_template_command(
+    template_path: str = typer.Argument(
+        ..., help="YAML or JSON file describing boards with their lists and labels"
+    ),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, "--workers", "-w", help="Number of changes made concurrently"
+    ),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", help="Show the changes that would be made without making them"
+    ),
+):
+    """
+    Create or update boards so their lists and labels match a template
+    """
+    from .client import get_client
+    from .template import TemplateError, apply_template, load_template
+
+    started = time.perf_counter()
+    get_client().ensure_pool_size(workers)
+    output = get_output()
+    made = 0
+    failed = 0
+    try:
+        specs = load_template(template_path)
+        for result in apply_template(specs, workers=workers, dry_run=dry_run):
+            change = result.change
+            output.result(
+                {
+                    "board": change.board,
+                    "action": change.action,
+                    "name": change.name,
+                    "status": "ok" if result.ok else "failed",
+                    "error": result.error,
+                }
+            )
+            target = f"[yellow]{change.name}[/yellow]"
+            if change.action != "create board":
+                target += f" on [blue]{change.board}[/blue]"
+            if not result.ok:
+                failed += 1
+                rprint(f"[red]failed[/red] {change.action} {target}: {result.error}")
+                continue
+            made += 1
+            rprint(f"{'would ' if dry_run else ''}[green]{change.action}[/green] {target}")
+    except TemplateError as error:
+        rprint(f"[red bold]Error: {error}[/red bold]")
+        raise typer.Exit(code=1)
+    elapsed = time.perf_counter() - started
+    if not made and not failed:
+        rprint(f"[bold]{len(specs)} boards already match the template ({elapsed:.2f}s)[/bold]")
     else:
+        verb = "Would make" if dry_run else "Made"
+        rprint(f"[bold]{verb} {made} changes ({failed} failed) in {elapsed:.2f}s[/bold]")
+    output.finish(made=made, failed=failed, dry_run=dry_run, elapsed=round(elapsed, 4))
+    if failed:
+        raise typer.Exit(code=1)
+
+
+@app.command("warm-cache")
+def warm_cache(
+    refresh: bool = typer.Option(
+        False, "--refresh", help="Fetch every board again even if it is already cached"
+    ),
+):
+    """
+    Cache the lists and labels of every board so later commands start instantly
+    """
+    from .batch import MAX_BATCH_URLS, Batcher
+    from .cache import refresh_all
+    from .client import TrelloAPIError
+    from .program import get_boards, iter_user_boards
+
+    if refresh:
+        refresh_all()
+    started = time.perf_counter()
+    batcher = Batcher()
+    board_count = 0
+    cached_count = 0
+    pending = []
+    try:
+        # Board details are fetched a batch at a time while the board list is still streaming
+        for board in iter_user_boards():
+            board_count += 1
+            pending.append(board.id)
+            if len(pending) == MAX_BATCH_URLS:
+                cached_count += len(get_boards(pending, batcher))
+                pending = []
+    except TrelloAPIError as error:
+        rprint(f"[red bold]Error: Unable to get boards ({error.status_code})[/red bold]")
+        raise typer.Exit(code=1)
+    if pending:
+        cached_count += len(get_boards(pending, batcher))
+    elapsed = time.perf_counter() - started
+    rprint(
+        f"[bold]Cached {cached_count} of {board_count} boards in {batcher.round_trips} batch requests ({elapsed:.2f}s)[/bold]"
+    )
+    get_output().document(
+        {
+            "boards": board_count,
+            "cached": cached_count,
+            "batch_requests": batcher.round_trips,
+            "elapsed": round(elapsed, 4),
+        }
+    )
+    if cached_count < board_count:
+        raise typer.Exit(code=1)
+
+
+@app.command("sync")
+def sync(
+    board_names: List[str] = typer.Option(
+        [], "--board", help="Board name or ID to sync (repeat for several, every board by default)"
+    ),
+    limit: int = typer.Option(
+        SYNC_ACTION_LIMIT, "--limit", help="New actions read per board before it is read again in full"
+    ),
+):
+    """
+    Bring cached lists and labels up to date from each board's recent changes
+    """
+    from .batch import Batcher
+    from .client import TrelloAPIError
+    from .resolver import NameResolver, ResolveError
+    from .sync import FAILED, FULL, INCREMENTAL, sync_boards
+
+    started = time.perf_counter()
+    batcher = Batcher()
+    try:
+        board_ids = None
+        if board_names:
+            resolver = NameResolver()
+            board_ids = [resolver.board(name).id for name in board_names]
+        results = sync_boards(board_ids, limit=limit, batcher=batcher)
+    except ResolveError as error:
+        rprint(f"[red bold]Error: {error}[/red bold]")
+        raise typer.Exit(code=1)
+    except TrelloAPIError as error:
+        rprint(f"[red bold]Error: Unable to get boards ({error.status_code})[/red bold]")
+        raise typer.Exit(code=1)
+    output = get_output()
+    for result in results:
+        output.result(
+            {
+                "board_id": result.board_id,
+                "mode": result.mode,
+                "changes": result.changes,
+                "error": result.error,
+            }
+        )
+        if result.mode == FAILED:
+            rprint(f"[red]failed[/red] board {result.board_id} ({result.error})")
+    counts = {
+        mode: sum(result.mode == mode for result in results) for mode in (INCREMENTAL, FULL, FAILED)
+    }
+    changes = sum(result.changes for result in results)
+    elapsed = time.perf_counter() - started
+    rprint(
+        f"[bold]Synced {len(results)} boards: {counts[INCREMENTAL]} from recent changes ({changes} applied), {counts[FULL]} read in full, {counts[FAILED]} failed, {batcher.round_trips} batch requests in {elapsed:.2f}s[/bold]"
+    )
+    output.finish(
+        boards=len(results),
+        changes=changes,
+        batch_requests=batcher.round_trips,
+        elapsed=round(elapsed, 4),
+        **counts,
+    )
+    if counts[FAILED]:
+        raise typer.Exit(code=1)
+
+
+@app.command("profiles")
+def profiles():
+    """
+    List the credential profiles that --profile can select
+    """
+    from .client import current_profile
+
+    config = get_config()
+    active = current_profile()
+    output = get_output()
+    for name in config.profile_names():
+        try:
+            base_url = config.profile(name).base_url
+        except ProfileError as error:
+            output.result({"name": name, "active": name == active, "error": str(error)})
+            rprint(f"  [red]{name}[/red]: {error}")
+            continue
+        output.result({"name": name, "active": name == active, "base_url": base_url})
+        marker = "*" if name == active else " "
+        rprint(f"{marker} [bold]{name}[/bold] ({base_url})")
+    output.finish(active=active)
+
+
+@app.command("serve")
+def serve(
+    socket_path: Optional[str] = typer.Option(
+        None, "--socket", help="Unix socket to listen on (default: $XDG_RUNTIME_DIR/addcardtool.sock)"
+    ),
+    port: Optional[int] = typer.Option(
+        None, "--port", help="Listen on this localhost port instead of a Unix socket"
+    ),
+    warm: bool = typer.Option(
+        True, "--warm/--no-warm", help="Load every board's lists and labels before accepting cards"
+    ),
+):
+    """
+    Keep a warm client and cache running and add cards sent by add-card or other local tools
+    """
+    from .daemon import CardService, close_server, start_server
+    from .remote import default_socket_path
+
+    service = CardService()
+    socket_path = socket_path or default_socket_path()
+    try:
+        server = start_server(service, socket_path=socket_path, port=port)
+    except OSError as error:
+        rprint(f"[red bold]Error: {error}[/red bold]")
+        raise typer.Exit(code=1)
+    if warm:
+        started = time.perf_counter()
+        boards = service.warm()
+        rprint(f"Loaded {boards} boards in {time.perf_counter() - started:.2f}s")
+    address = f"http://127.0.0.1:{port}" if port is not None else socket_path
+    rprint(f"[green bold]Listening on {address}[/green bold] (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_server(server)
+
+
+outbox_app = typer.Typer(help="List, send or drop cards waiting in the outbox")
+app.add_typer(outbox_app, name="outbox")
+
+
+@outbox_app.command("list")
+def outbox_list(
+    show_sent: bool = typer.Option(False, "--sent", help="Also show cards that were sent"),
+):
+    """
+    List cards waiting in the outbox
+    """
+    from .outbox import SENT, Outbox
+
+    entries = [
+        entry for entry in Outbox().entries() if show_sent or entry["state"] != SENT
+    ]
+    output = get_output()
+    if not entries:
+        rprint("The outbox is empty")
+    for entry in entries:
+        output.result(entry)
+        queued = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["queued_at"]))
+        detail = entry["card_id"] if entry["state"] == SENT else entry["last_error"] or ""
+        profile = f" as {entry['profile']}" if entry["profile"] not in (None, DEFAULT_PROFILE) else ""
         rprint(
-            "[red bold]Error: Unable to add card to board run the program again[/red bold]\n"
+            f"#{entry['id']} [bold]{entry['state']}[/bold] {queued} [yellow]{entry['name']}[/yellow] in [blue]{entry['board_name']}[/blue] / [green]{entry['list_name']}[/green]{profile} (attempts: {entry['attempts']}) {detail}"
         )
-        raise typer.Exit()
+    output.finish(entries=len(entries))
+
+
+@outbox_app.command("flush")
+def outbox_flush(
+    workers: int = typer.Option(4, "--workers", "-w", help="Number of cards sent concurrently"),
+    send_all: bool = typer.Option(
+        False, "--all", help="Also send cards that are waiting out a retry delay or gave up"
+    ),
+    wait: bool = typer.Option(
+        False, "--wait", help="Keep running until every card is sent, waiting out retry delays"
+    ),
+    quiet: bool = typer.Option(False, "--quiet", help="Print nothing"),
+):
+    """
+    Send the cards waiting in the outbox
+    """
+    from .outbox import Outbox, drain_outbox, flush_outbox
+
+    outbox = Outbox()
+    if send_all:
+        outbox.retry()
+    if wait:
+        created, remaining = drain_outbox(outbox, workers)
+    else:
+        created, remaining = flush_outbox(outbox, workers)
+    if not quiet:
+        rprint(f"[bold]Sent {created} cards, {remaining} still waiting[/bold]")
+        get_output().document({"sent": created, "remaining": remaining})
+    if remaining:
+        raise typer.Exit(code=1)
+
+
+@outbox_app.command("drop")
+def outbox_drop(
+    entry_ids: Optional[List[int]] = typer.Argument(None, help="Outbox IDs of the cards to drop"),
+    drop_all: bool = typer.Option(False, "--all", help="Drop every card in the outbox"),
+    sent: bool = typer.Option(False, "--sent", help="Drop only cards that were sent"),
+):
+    """
+    Remove cards from the outbox without sending them
+    """
+    from .outbox import Outbox
+
+    if not entry_ids and not drop_all and not sent:
+        rprint("[red bold]Error: give outbox IDs, --sent or --all[/red bold]")
+        raise typer.Exit(code=2)
+    dropped = Outbox().drop(entry_ids or None, sent_only=sent)
+    rprint(f"Dropped {dropped} cards")
+    get_output().document({"dropped": dropped})
+
+
+@app.command("resume")
+def resume(
+    journal_path: str = typer.Argument(..., help="Journal written by add-cards --journal"),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, "--workers", "-w", help="Number of cards created concurrently"
+    ),
+):
+    """
+    Finish an interrupted add-cards import without creating duplicate cards
+    """
+    from .bulk import resume_cards
+    from .client import get_client
+    from .journal import CardJournal
+
+    started = time.perf_counter()
+    get_client().ensure_pool_size(workers)
+    failed = report_card_results(
+        resume_cards(CardJournal(journal_path), workers=workers), started
+    )
+    if failed:
+        raise typer.Exit(code=1)
+
+
+index_app = typer.Typer(help="Build or search the local index of card names used to spot duplicates")
+app.add_typer(index_app, name="index")
+
+
+@index_app.command("build")
+def index_build(
+    board_names: List[str] = typer.Option(
+        [], "--board", help="Board name or ID to index (repeat for several, every board by default)"
+    ),
+    full: bool = typer.Option(
+        False, "--full", help="Read every card again instead of only the recent changes"
+    ),
+):
+    """
+    Read the cards of boards into the local card index, or bring it up to date
+    """
+    from .batch import Batcher
+    from .cardindex import CardIndex, build_board_indexes, refresh_board_indexes
+    from .client import TrelloAPIError
+    from .program import iter_user_boards
+    from .resolver import NameResolver, ResolveError
+
+    started = time.perf_counter()
+    batcher = Batcher()
+    try:
+        if board_names:
+            resolver = NameResolver()
+            board_ids = [resolver.board(name).id for name in board_names]
+        else:
+            board_ids = [board.id for board in iter_user_boards()]
+    except ResolveError as error:
+        rprint(f"[red bold]Error: {error}[/red bold]")
+        raise typer.Exit(code=1)
+    except TrelloAPIError as error:
+        rprint(f"[red bold]Error: Unable to get boards ({error.status_code})[/red bold]")
+        raise typer.Exit(code=1)
+    index = CardIndex()
+    if full:
+        refreshed, rebuilt = 0, build_board_indexes(index, board_ids, batcher)
+    else:
+        refreshed, rebuilt = refresh_board_indexes(index, board_ids, batcher=batcher)
+    failed = len(board_ids) - refreshed - rebuilt
+    elapsed = time.perf_counter() - started
+    rprint(
+        f"[bold]Indexed {len(board_ids)} boards: {refreshed} from recent changes, {rebuilt} read in full, {failed} failed; {index.card_count()} cards in the index in {elapsed:.2f}s[/bold]"
+    )
+    get_output().document(
+        {
+            "boards": len(board_ids),
+            "refreshed": refreshed,
+            "rebuilt": rebuilt,
+            "failed": failed,
+            "cards": index.card_count(),
+            "elapsed": round(elapsed, 4),
+        }
+    )
+    if failed:
+        raise typer.Exit(code=1)
+
+
+@index_app.command("search")
+def index_search(
+    query: str = typer.Argument(..., help="Words to look for in card names and descriptions"),
+    limit: int = typer.Option(20, "--limit", help="Most cards to show"),
+):
+    """
+    Search the names and descriptions of indexed cards without contacting Trello
+    """
+    from .cardindex import CardIndex, card_url
+
+    index = CardIndex()
+    if not index.fts:
+        rprint("[red bold]Error: This SQLite build has no full-text search (FTS5)[/red bold]")
+        raise typer.Exit(code=1)
+    matches = index.search(query, limit=limit)
+    output = get_output()
+    if not matches:
+        rprint("No indexed cards match")
+    for card_id, board_id, name in matches:
+        output.result(
+            {"card_id": card_id, "name": name, "url": card_url(card_id), "board_id": board_id}
+        )
+        rprint(f"[yellow]{name}[/yellow] on board {board_id} ({card_url(card_id)})")
+    output.finish(matches=len(matches))
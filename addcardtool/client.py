@@ -0,0 +1,318 @@
+import contextlib
+import contextvars
+import threading
+import time
+
+from .config import DEFAULT_BASE_URL, DEFAULT_PROFILE, get_config
+from .ratelimit import get_rate_limiter
+from .tracing import Span, complete_span, endpoint_template, reset_connection_timings
+
+# Connection pool defaults. The pool size bounds how many connections to the API
+# host are kept alive at once, so it should be at least the number of worker threads
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_TIMEOUT = 30
+
+# Number of times a request throttled with a 429 is queued and sent again
+DEFAULT_THROTTLE_RETRIES = 5
+
+
+class TrelloAPIError(Exception):
+    """Raised by streaming reads when Trello answers with an error status"""
+
+    def __init__(self, status_code):
+        super().__init__(f"Trello API request failed with status {status_code}")
+        self.status_code = status_code
+
+
+"""
+Client that owns a shared requests Session for every call made to the Trello API.
+The session keeps connections alive between calls so a run of the program only pays for
+one TCP and TLS handshake per pooled connection instead of one per request.
+
+Parameters:
+    - api_key: Trello API key added to every request
+    - api_token: Trello API token added to every request
+    - base_url: Root URL of the API (can point at a local stand-in server for tests)
+    - pool_size: Number of connections kept alive in the pool
+    - retries: Number of times failed connections and server errors are retried
+    - backoff_factor: Backoff factor used between retries
+    - timeout: Timeout in seconds for each request
+    - rate_limiter: RateLimiter that schedules requests (shared per key and token by default)
+    - throttle_retries: Number of times a request throttled with a 429 is sent again
+    - tracer: Tracer that records a span for every request (optional)
+"""
+
+
+class TrelloClient:
+    def __init__(
+        self,
+        api_key=None,
+        api_token=None,
+        base_url=DEFAULT_BASE_URL,
+        pool_size=DEFAULT_POOL_SIZE,
+        retries=DEFAULT_RETRIES,
+        backoff_factor=DEFAULT_BACKOFF_FACTOR,
+        timeout=DEFAULT_TIMEOUT,
+        rate_limiter=None,
+        throttle_retries=DEFAULT_THROTTLE_RETRIES,
+        tracer=None,
+    ):
+        self.api_key = api_key
+        self.api_token = api_token
+        self.base_url = base_url if base_url.endswith("/") else f"{base_url}/"
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or get_rate_limiter(api_key, api_token)
+        self.throttle_retries = throttle_retries
+        self.tracer = tracer
+        self.retry = self._build_retry(retries, backoff_factor)
+        # requests is imported here rather than at module level so commands that never
+        # build a client start without loading it
+        import requests
+
+        self.session = requests.Session()
+        self.session.headers.update(
+            {"Accept": "application/json", "Connection": "keep-alive"}
+        )
+        self._mount(pool_size)
+
+    def _build_retry(self, retries, backoff_factor):
+        # Retry connection errors for every method, POST included, since a failed
+        # connection never reached the server. Transient server errors are only retried for
+        # idempotent methods: a 5xx can arrive after Trello created the card, and sending
+        # the POST again would create it twice. Retry-After is left to the rate limiter so
+        # throttling is handled in one place
+        from urllib3.util.retry import Retry
+
+        return Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        )
+
+    def _mount(self, pool_size):
+        from requests.adapters import HTTPAdapter
+
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=self.retry
+        )
+        if self.tracer is not None:
+            from .tracing import traced_pool_classes
+
+            adapter.poolmanager.pool_classes_by_scheme = traced_pool_classes()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.pool_size = pool_size
+
+    def enable_tracing(self, tracer):
+        # Record a span for every later request. The pool is rebuilt so new connections
+        # report their DNS, connect and TLS times
+        self.tracer = tracer
+        self._mount(self.pool_size)
+
+    def ensure_pool_size(self, pool_size):
+        # Grow the connection pool so that pool_size threads can each hold a connection
+        if pool_size > self.pool_size:
+            self._mount(pool_size)
+
+    def url(self, path):
+        # Build the full URL for a path relative to the API root
+        return f"{self.base_url}{path.lstrip('/')}"
+
+    def request(self, method, path, params=None, **kwargs):
+        # Send a request through the pooled session with the credentials added. Requests
+        # wait for the rate limiter and are queued again when the server answers 429
+        query = {"key": self.api_key, "token": self.api_token}
+        if params:
+            query.update(params)
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(path)
+        if self.tracer is not None:
+            return self._traced_request(method, path, url, query, kwargs)
+        for attempt in range(self.throttle_retries + 1):
+            if attempt:
+                _rewind(kwargs)
+            self.rate_limiter.acquire()
+            response = self.session.request(method, url, params=query, **kwargs)
+            if self.rate_limiter.observe(response.status_code, response.headers) is None:
+                return response
+            response.close()
+        return response
+
+    def _traced_request(self, method, path, url, query, kwargs):
+        # Same as request, recording where the time went in a span
+        span = Span(method, endpoint_template(path), start=time.time())
+        started = sent = time.perf_counter()
+        response = None
+        reset_connection_timings()
+        try:
+            for attempt in range(self.throttle_retries + 1):
+                if attempt:
+                    _rewind(kwargs)
+                queued = time.perf_counter()
+                self.rate_limiter.acquire()
+                sent = time.perf_counter()
+                span.queued += sent - queued
+                response = self.session.request(method, url, params=query, **kwargs)
+                if self.rate_limiter.observe(response.status_code, response.headers) is None:
+                    break
+                span.throttled += 1
+                response.close()
+            return response
+        finally:
+            self.tracer.record(
+                complete_span(span, response, started, sent, kwargs.get("stream", False))
+            )
+
+    def get(self, path, params=None, **kwargs):
+        return self.request("GET", path, params=params, **kwargs)
+
+    def post(self, path, params=None, **kwargs):
+        return self.request("POST", path, params=params, **kwargs)
+
+    def put(self, path, params=None, **kwargs):
+        return self.request("PUT", path, params=params, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def _rewind(kwargs):
+    # A streamed body (such as a file upload) was read by the throttled attempt; send it
+    # again from the start
+    body = kwargs.get("data")
+    if hasattr(body, "seek"):
+        body.seek(0)
+
+
+_clients = {}
+_client_lock = threading.Lock()
+
+# Profile selected for the current thread or task by use_profile, and the process-wide
+# profile selected by set_default_profile (or ADDCARDTOOL_PROFILE)
+_active_profile = contextvars.ContextVar("addcardtool_profile", default=None)
+_default_profile = None
+
+
+"""
+Function to get the name of the profile the program functions currently act as
+
+Returns:
+    - Name of the profile selected by use_profile, set_default_profile or
+      ADDCARDTOOL_PROFILE, in that order, or DEFAULT_PROFILE
+"""
+
+
+def current_profile():
+    return (
+        _active_profile.get()
+        or _default_profile
+        or get_config().get("ADDCARDTOOL_PROFILE")
+        or DEFAULT_PROFILE
+    )
+
+
+"""
+Function to select the profile used when no use_profile block is active, for every thread
+
+Parameters:
+    - name: Name of the profile (None goes back to ADDCARDTOOL_PROFILE or the default)
+
+Returns:
+    - None
+
+Raises:
+    - ProfileError if the profile is not defined
+"""
+
+
+def set_default_profile(name):
+    global _default_profile
+    if name:
+        get_config().profile(name)
+    _default_profile = name
+
+
+"""
+Context manager that makes the program functions act as a profile until the block ends.
+The selection is local to the thread or asyncio task, so several profiles can be used at
+once in one process; worker pools started by the tool carry it into their threads.
+
+Parameters:
+    - name: Name of the profile (None keeps the current one)
+
+Returns:
+    - TrelloClient of the profile
+
+Raises:
+    - ProfileError if the profile is not defined
+"""
+
+
+@contextlib.contextmanager
+def use_profile(name):
+    client = get_client(name)
+    token = _active_profile.set(name or _active_profile.get())
+    try:
+        yield client
+    finally:
+        _active_profile.reset(token)
+
+
+"""
+Function to get the shared client of a profile, used by the program functions. Each
+profile's client is created on first use from its credentials, with its own connection
+pool, and gets the rate limiter and metadata cache of its key and token.
+
+Parameters:
+    - profile: Name of the profile (the current profile by default)
+
+Returns:
+    - Shared TrelloClient instance of the profile
+
+Raises:
+    - ProfileError if the profile is not defined
+"""
+
+
+def get_client(profile=None):
+    name = profile or current_profile()
+    client = _clients.get(name)
+    if client is None:
+        with _client_lock:
+            client = _clients.get(name)
+            if client is None:
+                credentials = get_config().profile(name)
+                client = _clients[name] = TrelloClient(
+                    api_key=credentials.api_key,
+                    api_token=credentials.api_token,
+                    base_url=credentials.base_url,
+                )
+    return client
+
+
+"""
+Function to replace the shared client of a profile, for example with one pointing at a local
+test server
+
+Parameters:
+    - client: TrelloClient to use for all program functions (None resets to the default client)
+    - profile: Name of the profile (the default profile if not given)
+
+Returns:
+    - The previously installed client
+"""
+
+
+def set_client(client, profile=DEFAULT_PROFILE):
+    with _client_lock:
+        previous = _clients.pop(profile, None)
+        if client is not None:
+            _clients[profile] = client
+    return previous
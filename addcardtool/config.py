@@ -0,0 +1,167 @@
+import os
+import threading
+from dataclasses import dataclass
+
+# Default API root used when TRELLO_BASE_URL is not set
+DEFAULT_BASE_URL = "https://api.trello.com/1/"
+
+# Profile used when none is selected. Unless the profiles file defines it, it holds the
+# credentials from the environment and the .env file
+DEFAULT_PROFILE = "default"
+
+# Defaults of command line options. They live here rather than in the modules that use them
+# so --help can show them without importing those modules
+
+# Number of cards created concurrently by bulk imports
+DEFAULT_WORKERS = 8
+
+# Color given to labels created because a card names a label the board does not have
+DEFAULT_LABEL_COLOR = "blue"
+
+# Actions read per board and sync. A board with more new actions than this is read again
+# in full, which is cheaper than paging through its history
+SYNC_ACTION_LIMIT = 100
+
+
+class ProfileError(Exception):
+    """Raised when a credential profile is not defined or lacks its key or token"""
+
+
+"""
+A named set of Trello credentials. Each profile gets its own client, so its own
+connection pool, rate limit bucket and metadata cache.
+
+Attributes:
+    - name: Name of the profile
+    - api_key: Trello API key
+    - api_token: Trello API token
+    - base_url: Root URL of the API
+"""
+
+
+@dataclass(slots=True)
+class Profile:
+    name: str
+    api_key: str
+    api_token: str
+    base_url: str = DEFAULT_BASE_URL
+
+
+"""
+Function to get the path of the profiles file. ADDCARDTOOL_PROFILES overrides the default of
+addcardtool/profiles.ini under $XDG_CONFIG_HOME (or ~/.config).
+
+Returns:
+    - Path of the profiles file
+"""
+
+
+def default_profiles_path():
+    profiles_path = os.getenv("ADDCARDTOOL_PROFILES")
+    if profiles_path:
+        return profiles_path
+    config_home = os.getenv("XDG_CONFIG_HOME") or os.path.join(
+        os.path.expanduser("~"), ".config"
+    )
+    return os.path.join(config_home, "addcardtool", "profiles.ini")
+
+
+"""
+Settings read from the environment and the .env file. Nothing is read until a setting is
+first used, so commands that never talk to Trello (--version, --help) do not pay for
+loading python-dotenv or parsing the .env file.
+"""
+
+
+class Config:
+    def __init__(self):
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._profiles = None
+        self._registered = {}
+
+    def _load(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    import dotenv
+
+                    dotenv.load_dotenv()
+                    self._loaded = True
+
+    def get(self, name, default=None):
+        self._load()
+        return os.getenv(name, default)
+
+    @property
+    def api_key(self):
+        return self.get("TRELLO_API_KEY")
+
+    @property
+    def api_token(self):
+        return self.get("TRELLO_API_TOKEN")
+
+    @property
+    def username(self):
+        return self.get("TRELLO_USERNAME")
+
+    @property
+    def base_url(self):
+        return self.get("TRELLO_BASE_URL", DEFAULT_BASE_URL)
+
+    def _file_profiles(self):
+        # Sections of the profiles file, read once
+        if self._profiles is None:
+            import configparser
+
+            parser = configparser.ConfigParser(interpolation=None)
+            parser.read(default_profiles_path(), encoding="utf-8")
+            with self._lock:
+                self._profiles = {name: dict(parser[name]) for name in parser.sections()}
+        return self._profiles
+
+    def profile_names(self):
+        # Names of every profile that can be selected, the default first
+        names = [DEFAULT_PROFILE] + sorted(set(self._file_profiles()) | set(self._registered))
+        return list(dict.fromkeys(names))
+
+    def register_profile(self, name, api_key, api_token, base_url=None):
+        # Define a profile in code, taking precedence over the profiles file
+        with self._lock:
+            self._registered[name] = Profile(
+                name, api_key, api_token, base_url or self.base_url
+            )
+
+    def profile(self, name=None):
+        # Return the credentials of a profile
+        name = name or DEFAULT_PROFILE
+        if name in self._registered:
+            return self._registered[name]
+        section = self._file_profiles().get(name)
+        if section is None:
+            if name != DEFAULT_PROFILE:
+                raise ProfileError(
+                    f"No profile named {name} (profiles: {', '.join(self.profile_names())})"
+                )
+            # Missing environment credentials are left for Trello to reject, as before
+            return Profile(name, self.api_key, self.api_token, self.base_url)
+        if not section.get("api_key") or not section.get("api_token"):
+            raise ProfileError(f"Profile {name} needs an api_key and an api_token")
+        return Profile(
+            name, section["api_key"], section["api_token"], section.get("base_url") or self.base_url
+        )
+
+
+_config = Config()
+
+
+"""
+Function to get the lazily loaded configuration
+
+Returns:
+    - Shared Config instance
+"""
+
+
+def get_config():
+    return _config
@@ -0,0 +1,265 @@
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from addcardtool import __version__
+from .cache import get_cache
+from .client import current_profile, get_client, use_profile
+from .config import ProfileError
+from .program import BOARDS_CACHE_KEY, board_cache_key, create_new_card, get_boards
+from .remote import DaemonClient, token_path
+from .resolver import NameResolver, ResolveError
+
+
+class DaemonRequestError(Exception):
+    """Raised when a request sent to the daemon is missing fields or is not valid JSON"""
+
+
+"""
+State kept by the daemon between requests: the shared pooled client of each profile, which
+keeps its connections to Trello open, and a name resolver per profile whose board, list
+and label indexes stay in memory. A resolver is rebuilt once it is older than the metadata
+cache TTL so boards changed elsewhere are picked up. Requests name the profile to act as,
+or use the daemon's own.
+
+Parameters:
+    - max_age: Seconds a resolver is used before it is rebuilt (the cache TTL by default)
+"""
+
+
+class CardService:
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.cards_created = 0
+        # Resolver and the time it was built, by profile
+        self._resolvers = {}
+
+    def resolver(self):
+        # Resolver of the current profile
+        profile = current_profile()
+        with self.lock:
+            max_age = self.max_age or get_cache(get_client().api_token).ttl
+            resolver, built = self._resolvers.get(profile, (None, 0.0))
+            if resolver is None or time.monotonic() - built > max_age:
+                resolver = NameResolver()
+                self._resolvers[profile] = (resolver, time.monotonic())
+            return resolver
+
+    def warm(self):
+        # Load every board's lists and labels so the first card is as fast as the rest
+        board_ids = [board.id for board in self.resolver().boards()]
+        return len(get_boards(board_ids))
+
+    def refresh(self):
+        # Forget the indexes of every profile and the cached entries they were built from
+        with self.lock:
+            resolvers, self._resolvers = self._resolvers, {}
+        refreshed = 0
+        for profile in set(resolvers) | {current_profile()}:
+            resolver = resolvers.get(profile, (None, 0.0))[0]
+            keys = [BOARDS_CACHE_KEY]
+            if resolver is not None:
+                keys += [board_cache_key(board_id) for board_id in resolver.board_ids()]
+            get_cache(get_client(profile).api_token).invalidate(*keys)
+            refreshed += len(keys)
+        return {"refreshed": refreshed}
+
+    def add_card(self, payload):
+        # Resolve the names in a card request and create the card as the requested profile
+        missing = [field for field in ("board", "list", "name") if not payload.get(field)]
+        if missing:
+            raise DaemonRequestError(f"Missing fields: {', '.join(missing)}")
+        profile = payload.get("profile")
+        try:
+            get_client(profile)
+        except ProfileError as error:
+            raise DaemonRequestError(str(error))
+        with use_profile(profile):
+            _, list_id, label_ids = self.resolver().resolve(
+                payload["board"],
+                payload["list"],
+                payload.get("labels") or [],
+                create_missing=bool(payload.get("create_missing")),
+                label_color=payload.get("label_color"),
+            )
+            card = create_new_card(
+                list_id, payload["name"], payload.get("desc") or "", label_ids
+            )
+        if card is None:
+            return None
+        with self.lock:
+            self.cards_created += 1
+        return card.to_json()
+
+    def health(self):
+        return {
+            "pid": os.getpid(),
+            "version": __version__,
+            "uptime": round(time.time() - self.started, 1),
+            "cards_created": self.cards_created,
+        }
+
+
+def _make_handler(service, token=None):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Send headers and body in one write; separate small writes stall on delayed ACKs
+        wbufsize = 64 * 1024
+
+        def log_message(self, format, *args):
+            # Unix socket peers have no address to log, and the daemon is quiet by default
+            pass
+
+        def _payload(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if not length:
+                return {}
+            try:
+                payload = json.loads(self.rfile.read(length))
+            except ValueError:
+                raise DaemonRequestError("Request body is not valid JSON")
+            if not isinstance(payload, dict):
+                raise DaemonRequestError("Request body must be a JSON object")
+            return payload
+
+        def _send(self, status, data):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _reject(self):
+            # Returns the status and error for a request that did not come from a local
+            # tool. A web page can make the browser send requests to localhost, but those
+            # carry an Origin header and cannot send a JSON body without asking first
+            if self.headers.get("Origin") is not None:
+                return 403, "Requests from web pages are not accepted"
+            if token is not None:
+                sent = self.headers.get("Authorization") or ""
+                if not hmac.compare_digest(sent.encode(), f"Bearer {token}".encode()):
+                    return 401, "Missing or wrong daemon token"
+            content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+            if self.command == "POST" and content_type != "application/json":
+                return 415, "Request body must be sent as application/json"
+            return None
+
+        def _dispatch(self, routes):
+            rejected = self._reject()
+            if rejected is not None:
+                # The body was not read, so the connection cannot be reused
+                self.close_connection = True
+                self._send(rejected[0], {"error": rejected[1]})
+                return
+            route = routes.get(self.path.split("?")[0])
+            if route is None:
+                self._send(404, {"error": f"Unknown path: {self.path}"})
+                return
+            try:
+                result = route(self._payload())
+            except (DaemonRequestError, ResolveError) as error:
+                self._send(400, {"error": str(error)})
+                return
+            except Exception as error:
+                self._send(500, {"error": f"Daemon error: {error}"})
+                return
+            if result is None:
+                self._send(502, {"error": "Unable to add card to board"})
+            else:
+                self._send(200, result)
+
+        def do_GET(self):
+            self._dispatch({"/health": lambda payload: service.health()})
+
+        def do_POST(self):
+            self._dispatch(
+                {"/cards": service.add_card, "/refresh": lambda payload: service.refresh()}
+            )
+
+    return Handler
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+"""
+Function to start the daemon's server on a Unix socket or a localhost port. A stale socket
+left by a daemon that died is removed; a socket a daemon still answers on is an error. A
+port can be reached by any local user, so a token is made for each run and written to a file
+only the user can read (see remote.token_path); requests without it are refused.
+
+Parameters:
+    - service: CardService that handles the requests
+    - socket_path: Unix socket to listen on (used when no port is given)
+    - port: Port on 127.0.0.1 to listen on instead of a socket
+
+Returns:
+    - Server ready for serve_forever
+"""
+
+
+def start_server(service, socket_path=None, port=None):
+    if port is not None:
+        token = secrets.token_urlsafe(32)
+        server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(service, token))
+        server.daemon_threads = True
+        server.token_path = token_path(server.server_address[1])
+        try:
+            _write_token(server.token_path, token)
+        except OSError:
+            server.server_close()
+            raise
+        return server
+    handler = _make_handler(service)
+    if os.path.exists(socket_path):
+        if DaemonClient(socket_path=socket_path).is_running():
+            raise OSError(f"A daemon is already listening on {socket_path}")
+        os.unlink(socket_path)
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+    # Only the user running the daemon may connect to it
+    previous_umask = os.umask(0o177)
+    try:
+        server = UnixHTTPServer(socket_path, handler)
+    finally:
+        os.umask(previous_umask)
+    return server
+
+
+"""
+Function to close a server started by start_server and remove its socket. serve_forever
+must have returned (or server.shutdown been called) first.
+
+Parameters:
+    - server: Server returned by start_server
+
+Returns:
+    - None
+"""
+
+
+def close_server(server):
+    server.server_close()
+    if server.socket.family == socket.AF_UNIX and os.path.exists(server.server_address):
+        os.unlink(server.server_address)
+    token_file = getattr(server, "token_path", None)
+    if token_file and os.path.exists(token_file):
+        os.unlink(token_file)
+
+
+def _write_token(path, token):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "w", encoding="utf-8") as token_file:
+        # The file may be left from an earlier run with wider permissions
+        os.fchmod(token_file.fileno(), 0o600)
+        token_file.write(token)
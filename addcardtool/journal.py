@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+import uuid
+from collections import defaultdict
+
+from .program import get_list_cards
+
+# Journal record types
+INTENT = "intent"
+CREATED = "created"
+FAILED = "failed"
+
+
+"""
+Append-only JSONL journal of card creations. An intent record with a client-generated
+idempotency key is flushed to disk before a card is sent and a created record with the
+returned card ID is written after, so a batch that dies part way through can be resumed
+without creating duplicates.
+
+Parameters:
+    - path: Path of the journal file (created if it does not exist)
+"""
+
+
+class CardJournal:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def _append(self, record):
+        line = json.dumps(record) + "\n"
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as journal_file:
+                journal_file.write(line)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+    def record_intent(self, row, list_id, label_ids):
+        # Record a card about to be sent and return its idempotency key
+        key = uuid.uuid4().hex
+        self._append(
+            {
+                "type": INTENT,
+                "key": key,
+                "row": row.number,
+                "board": row.board,
+                "list": row.list,
+                "name": row.name,
+                "desc": row.desc,
+                "labels": row.labels,
+                "list_id": list_id,
+                "label_ids": label_ids,
+            }
+        )
+        return key
+
+    def record_created(self, key, card_id):
+        self._append({"type": CREATED, "key": key, "card_id": card_id})
+
+    def record_failed(self, key, error):
+        self._append({"type": FAILED, "key": key, "error": error})
+
+    def entries(self):
+        # Replay the journal and return every intent with the outcome recorded for it
+        intents = {}
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write is ignored
+                    continue
+                if record.get("type") == INTENT:
+                    intents[record["key"]] = dict(record, card_id=None, error=None)
+                elif record.get("key") in intents:
+                    entry = intents[record["key"]]
+                    if record["type"] == CREATED:
+                        entry["card_id"] = record["card_id"]
+                    elif record["type"] == FAILED:
+                        entry["error"] = record["error"]
+        return list(intents.values())
+
+    def unfinished(self):
+        # Intents that have no created record
+        return [entry for entry in self.entries() if entry["card_id"] is None]
+
+
+"""
+Function to find unfinished journal entries whose cards were created before the batch died.
+The cards on each target list are fetched once and matched against entries by name and
+description; every card already claimed by a created record is skipped, so two identical
+rows only match two different cards.
+
+Parameters:
+    - journal: CardJournal to reconcile
+
+Returns:
+    - List of entries whose card was found (a created record is written for each)
+    - List of entries that still need their card created
+"""
+
+
+def reconcile(journal):
+    entries = journal.entries()
+    claimed = {entry["card_id"] for entry in entries if entry["card_id"]}
+    unfinished_by_list = defaultdict(list)
+    for entry in entries:
+        if entry["card_id"] is None:
+            unfinished_by_list[entry["list_id"]].append(entry)
+
+    recovered = []
+    remaining = []
+    for list_id, list_entries in unfinished_by_list.items():
+        cards = get_list_cards(list_id)
+        if cards is None:
+            remaining.extend(list_entries)
+            continue
+        available = defaultdict(list)
+        for card in cards:
+            if card.id not in claimed:
+                available[(card.name, card.desc)].append(card.id)
+        for entry in list_entries:
+            matches = available.get((entry["name"], entry["desc"]))
+            if matches:
+                card_id = matches.pop(0)
+                journal.record_created(entry["key"], card_id)
+                recovered.append(dict(entry, card_id=card_id))
+            else:
+                remaining.append(entry)
+    return recovered, remaining
@@ -0,0 +1,109 @@
+import codecs
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = ",]" + _WHITESPACE
+# A whole string, a bracket, or the opening quote of a string that has not fully arrived
+_STRUCTURE = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{}]|"')
+
+
+def _skip_whitespace(buffer, index):
+    while index < len(buffer) and buffer[index] in _WHITESPACE:
+        index += 1
+    return index
+
+
+def _scan(buffer, index, depth):
+    # Scan an array or object from index for the bracket that closes it, skipping strings.
+    # Returns the end of the element (None if it has not arrived yet), the index to resume
+    # scanning from and the nesting depth there
+    for match in _STRUCTURE.finditer(buffer, index):
+        token = match.group()
+        if token == '"':
+            return None, match.start(), depth
+        if token in "[{":
+            depth += 1
+        elif token in "]}":
+            depth -= 1
+            if depth == 0:
+                return match.end(), match.end(), depth
+    return None, len(buffer), depth
+
+
+"""
+Function to decode the elements of a top-level JSON array as its bytes arrive, so the first
+element is available before the whole body has been downloaded and the full parsed body
+is never held in memory at once.
+
+Parameters:
+    - chunks: Iterable of bytes making up a JSON array
+
+Returns:
+    - Generator of the decoded array elements in order
+"""
+
+
+def iter_array(chunks):
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    finished = False
+    # Where the scan of an array or object element that did not fit in the chunks so far
+    # stopped, and its depth there. Such an element is only decoded again once its closing
+    # bracket has arrived, so a large element is not re-parsed on every chunk
+    scanned = 0
+    depth = 0
+
+    def elements(final):
+        # Decode every complete element in the buffer and keep the unparsed tail
+        nonlocal buffer, started, finished, scanned, depth
+        position = 0
+        decoded = []
+        while not finished:
+            position = _skip_whitespace(buffer, position)
+            if position >= len(buffer):
+                break
+            character = buffer[position]
+            if not started:
+                if character != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                position += 1
+            elif character == "]":
+                finished = True
+            elif character == ",":
+                position += 1
+            else:
+                if depth and not final:
+                    end, scanned, depth = _scan(buffer, scanned, depth)
+                    if end is None:
+                        break
+                try:
+                    element, end = _decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    # The element continues in the next chunk
+                    if character in "[{" and not depth:
+                        _, scanned, depth = _scan(buffer, position, 0)
+                    break
+                if not final and (end >= len(buffer) or buffer[end] not in _DELIMITERS):
+                    # The element may still continue in the next chunk, e.g. a number
+                    # whose remaining digits have not arrived yet
+                    break
+                decoded.append(element)
+                position = end
+                scanned = depth = 0
+        buffer = buffer[position:]
+        scanned = max(scanned - position, 0)
+        return decoded
+
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        yield from elements(final=False)
+    buffer += text_decoder.decode(b"", final=True)
+    yield from elements(final=True)
+    if not finished:
+        raise ValueError("Unterminated JSON array")
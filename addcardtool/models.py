@@ -0,0 +1,143 @@
+import sys
+from dataclasses import dataclass, field
+
+"""
+Typed models for the Trello entities used by the program. The models use __slots__ so a
+cache or bulk run holding many of them pays for the fields only, and strings that repeat
+across many entities (label colors and names, list names, parent IDs) are interned so each
+distinct value is stored once.
+"""
+
+
+def intern(value):
+    # Intern strings; None and other values are returned unchanged
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+"""
+A list (column) on a board
+
+Attributes:
+    - id: ID of the list
+    - name: Name of the list
+    - pos: Position of the list on its board (None unless it was requested)
+"""
+
+
+@dataclass(slots=True)
+class List:
+    id: str
+    name: str
+    pos: float = None
+
+    @classmethod
+    def from_json(cls, data):
+        pos = data.get("pos")
+        return cls(
+            id=data["id"],
+            name=intern(data["name"]),
+            pos=float(pos) if pos is not None else None,
+        )
+
+
+"""
+A label defined on a board
+
+Attributes:
+    - id: ID of the label
+    - name: Name of the label (may be empty)
+    - color: Color of the label (may be None)
+"""
+
+
+@dataclass(slots=True)
+class Label:
+    id: str
+    name: str
+    color: str
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            id=data["id"], name=intern(data.get("name") or ""), color=intern(data.get("color"))
+        )
+
+
+"""
+A board together with its open lists and all of its labels
+
+Attributes:
+    - id: ID of the board
+    - name: Name of the board
+    - desc: Description of the board
+    - lists: Open lists on the board in board order (empty unless they were requested)
+    - labels: Labels defined on the board (empty unless they were requested)
+"""
+
+
+@dataclass(slots=True)
+class Board:
+    id: str
+    name: str
+    desc: str = ""
+    lists: list = field(default_factory=list)
+    labels: list = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            id=data["id"],
+            name=data["name"],
+            desc=data.get("desc") or "",
+            lists=[List.from_json(item) for item in data.get("lists") or []],
+            labels=[Label.from_json(item) for item in data.get("labels") or []],
+        )
+
+
+"""
+A card on a list
+
+Attributes:
+    - id: ID of the card
+    - name: Name of the card
+    - desc: Description of the card
+    - list_id: ID of the list the card is on (None unless it was requested)
+    - label_ids: IDs of the labels attached to the card (empty unless they were requested)
+    - board_id: ID of the board the card is on (None unless it was requested)
+    - short_url: Short link to the card (None unless it was requested)
+"""
+
+
+@dataclass(slots=True)
+class Card:
+    id: str
+    name: str
+    desc: str = ""
+    list_id: str = None
+    label_ids: tuple = ()
+    board_id: str = None
+    short_url: str = None
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            id=data["id"],
+            name=data.get("name") or "",
+            desc=data.get("desc") or "",
+            list_id=intern(data.get("idList")),
+            label_ids=tuple(intern(label_id) for label_id in data.get("idLabels") or ()),
+            board_id=intern(data.get("idBoard")),
+            short_url=data.get("shortUrl"),
+        )
+
+    def to_json(self):
+        # The card in Trello's field names, as written by --output json
+        return {
+            "id": self.id,
+            "name": self.name,
+            "desc": self.desc,
+            "idList": self.list_id,
+            "idBoard": self.board_id,
+            "idLabels": list(self.label_ids),
+            "shortUrl": self.short_url,
+        }
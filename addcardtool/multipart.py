@@ -0,0 +1,124 @@
+import io
+import mimetypes
+import os
+import uuid
+
+# Bytes read from a file per read; the whole file is never held in memory
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _quote(value):
+    # Quote a header parameter the way browsers do for form uploads
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\r", " ").replace("\n", " ")
+
+
+"""
+A multipart/form-data request body that reads its files from disk as it is sent. It is a
+read-only file object with a known length, so requests sends it with a Content-Length
+header in small reads instead of encoding it in memory, and it can be rewound when a
+request has to be sent again.
+
+Parameters:
+    - fields: Dictionary of form fields sent before the files
+    - files: List of (field name, path, file name, content type) tuples; file name and
+      content type may be None to use the path's base name and guessed type
+"""
+
+
+class MultipartStream(io.RawIOBase):
+    def __init__(self, fields=None, files=()):
+        super().__init__()
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        # Each part is either bytes or a (path, size) pair read from disk
+        self._parts = []
+        for name, value in (fields or {}).items():
+            self._parts.append(self._header(name) + b"\r\n" + str(value).encode("utf-8") + b"\r\n")
+        for name, path, file_name, content_type in files:
+            file_name = file_name or os.path.basename(path)
+            content_type = (
+                content_type or mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+            )
+            self._parts.append(
+                self._header(name, file_name)
+                + f"Content-Type: {content_type}\r\n\r\n".encode("utf-8")
+            )
+            self._parts.append((path, os.path.getsize(path)))
+            self._parts.append(b"\r\n")
+        self._parts.append(f"--{self.boundary}--\r\n".encode("ascii"))
+        self._sizes = [part[1] if isinstance(part, tuple) else len(part) for part in self._parts]
+        self._length = sum(self._sizes)
+        self._position = 0
+        self._index = 0
+        self._offset = 0
+        self._file = None
+
+    def _header(self, name, file_name=None):
+        disposition = f'form-data; name="{_quote(name)}"'
+        if file_name is not None:
+            disposition += f'; filename="{_quote(file_name)}"'
+        return f"--{self.boundary}\r\nContent-Disposition: {disposition}\r\n".encode("utf-8")
+
+    def __len__(self):
+        return self._length
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, position, whence=io.SEEK_SET):
+        # Only absolute positions are needed to rewind a body for a retry
+        if whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("MultipartStream only seeks to absolute positions")
+        self._close_file()
+        self._position = min(max(position, 0), self._length)
+        self._index = 0
+        self._offset = self._position
+        while self._index < len(self._sizes) and self._offset >= self._sizes[self._index]:
+            self._offset -= self._sizes[self._index]
+            self._index += 1
+        return self._position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length - self._position
+        chunks = []
+        while size > 0 and self._index < len(self._parts):
+            part = self._parts[self._index]
+            if isinstance(part, tuple):
+                if self._file is None:
+                    self._file = open(part[0], "rb")
+                    self._file.seek(self._offset)
+                chunk = self._file.read(min(size, UPLOAD_CHUNK_SIZE, part[1] - self._offset))
+                if not chunk:
+                    raise OSError(f"{part[0]} changed size while it was being uploaded")
+            else:
+                chunk = part[self._offset : self._offset + size]
+            chunks.append(chunk)
+            size -= len(chunk)
+            self._offset += len(chunk)
+            self._position += len(chunk)
+            if self._offset >= self._sizes[self._index]:
+                self._close_file()
+                self._index += 1
+                self._offset = 0
+        return b"".join(chunks)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        self._close_file()
+        super().close()
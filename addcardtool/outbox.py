@@ -0,0 +1,504 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from .client import current_profile, use_profile
+from .program import create_new_card, get_list_cards
+
+# Outbox entry states. An entry is "unknown" when its request was sent but no answer came
+# back, so the card may or may not exist
+PENDING = "pending"
+SENDING = "sending"
+UNKNOWN = "unknown"
+SENT = "sent"
+FAILED = "failed"
+
+# Seconds the foreground send waits for Trello before the card is left to the outbox
+DEFAULT_SEND_WAIT = 3.0
+
+# Retry backoff: the delay doubles from BACKOFF_BASE up to BACKOFF_MAX seconds, and an
+# entry is given up on after MAX_ATTEMPTS sends
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 15 * 60.0
+MAX_ATTEMPTS = 10
+
+# Seconds before a card whose send was cut off is checked for on its list, so a request
+# still in flight has landed by then
+UNKNOWN_GRACE = 10.0
+
+# Seconds after which an entry claimed by a flusher that died is picked up again
+SENDING_LEASE = 5 * 60.0
+
+# Longest time a background flusher keeps waiting for retries to come due
+BACKGROUND_FLUSH_LIFETIME = 30 * 60.0
+
+DEFAULT_FLUSH_WORKERS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    list_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    desc TEXT NOT NULL,
+    label_ids TEXT NOT NULL,
+    board_name TEXT NOT NULL DEFAULT '',
+    list_name TEXT NOT NULL DEFAULT '',
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    queued_at REAL NOT NULL,
+    claimed_at REAL,
+    next_attempt REAL NOT NULL,
+    last_error TEXT,
+    card_id TEXT,
+    profile TEXT
+)
+"""
+
+
+"""
+Function to get the path of the outbox database. ADDCARDTOOL_OUTBOX overrides the default
+of addcardtool/outbox.sqlite3 under $XDG_DATA_HOME (or ~/.local/share). Queued cards are
+data rather than cache, so they are not kept in the cache directory.
+
+Returns:
+    - Path of the outbox database
+"""
+
+
+def default_outbox_path():
+    outbox_path = os.getenv("ADDCARDTOOL_OUTBOX")
+    if outbox_path:
+        return outbox_path
+    data_home = os.getenv("XDG_DATA_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "share"
+    )
+    return os.path.join(data_home, "addcardtool", "outbox.sqlite3")
+
+
+def backoff_delay(attempts):
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(0, attempts - 1))
+
+
+"""
+Durable SQLite queue of cards waiting to be created. Every card is written here before it
+is sent, so a card is never lost when Trello is slow or unreachable; flush sends whatever
+is due. Entries are claimed with a conditional update, so several flushers (in threads or
+processes) never send the same card twice.
+
+Parameters:
+    - path: Path of the database (the default outbox if not given)
+"""
+
+
+class Outbox:
+    def __init__(self, path=None):
+        self.path = path or default_outbox_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=FULL")
+        self.connection.execute(SCHEMA)
+        columns = {row["name"] for row in self.connection.execute("PRAGMA table_info(outbox)")}
+        if "profile" not in columns:
+            # Outboxes written before profiles were added; their cards use the default
+            self.connection.execute("ALTER TABLE outbox ADD COLUMN profile TEXT")
+
+    def _execute(self, statement, parameters=()):
+        with self.lock:
+            return self.connection.execute(statement, parameters)
+
+    def _query(self, statement, parameters=()):
+        with self.lock:
+            return self.connection.execute(statement, parameters).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+    def add(
+        self,
+        list_id,
+        name,
+        desc,
+        label_ids,
+        board_name="",
+        list_name="",
+        claimed=False,
+        profile=None,
+    ):
+        # Queue a card and return its outbox ID. A claimed entry is being sent by the caller.
+        # The card is sent as profile (the flusher's current profile if None)
+        now = time.time()
+        cursor = self._execute(
+            "INSERT INTO outbox (list_id, name, desc, label_ids, board_name, list_name, state,"
+            " queued_at, claimed_at, next_attempt, profile)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                list_id,
+                name,
+                desc,
+                json.dumps(list(label_ids)),
+                board_name,
+                list_name,
+                SENDING if claimed else PENDING,
+                now,
+                now if claimed else None,
+                now,
+                profile,
+            ),
+        )
+        return cursor.lastrowid
+
+    def entries(self, states=None):
+        # Return outbox entries as dictionaries, oldest first
+        rows = self._query("SELECT * FROM outbox ORDER BY id")
+        entries = [dict(row, label_ids=json.loads(row["label_ids"])) for row in rows]
+        if states is not None:
+            entries = [entry for entry in entries if entry["state"] in states]
+        return entries
+
+    def due(self, now=None, include_waiting=False):
+        # Entries a flusher should pick up now (or all unfinished ones with include_waiting)
+        now = time.time() if now is None else now
+        entries = []
+        for entry in self.entries((PENDING, UNKNOWN, SENDING)):
+            if entry["state"] == SENDING:
+                if now - (entry["claimed_at"] or 0) > SENDING_LEASE:
+                    entries.append(entry)
+            elif include_waiting or entry["next_attempt"] <= now:
+                entries.append(entry)
+        return entries
+
+    def next_due(self):
+        # Time the next unfinished entry comes due, None if nothing is waiting
+        times = [
+            entry["claimed_at"] + SENDING_LEASE
+            if entry["state"] == SENDING
+            else entry["next_attempt"]
+            for entry in self.entries((PENDING, UNKNOWN, SENDING))
+        ]
+        return min(times) if times else None
+
+    def claim(self, entry):
+        # Mark an entry as being sent. Returns False if another flusher claimed it first
+        now = time.time()
+        cursor = self._execute(
+            "UPDATE outbox SET state = ?, claimed_at = ? WHERE id = ? AND state = ?"
+            " AND (claimed_at IS NULL OR claimed_at = ?)",
+            (SENDING, now, entry["id"], entry["state"], entry["claimed_at"]),
+        )
+        return cursor.rowcount == 1
+
+    def mark_sent(self, entry_id, card_id):
+        self._execute(
+            "UPDATE outbox SET state = ?, card_id = ?, claimed_at = NULL, last_error = NULL"
+            " WHERE id = ?",
+            (SENT, card_id, entry_id),
+        )
+
+    def mark_failed(self, entry_id, error, attempts):
+        # Schedule the next attempt with backoff, or give up after MAX_ATTEMPTS
+        state = FAILED if attempts >= MAX_ATTEMPTS else PENDING
+        self._execute(
+            "UPDATE outbox SET state = ?, attempts = ?, claimed_at = NULL, last_error = ?,"
+            " next_attempt = ? WHERE id = ?",
+            (state, attempts, error, time.time() + backoff_delay(attempts), entry_id),
+        )
+
+    def mark_unknown(self, entry_id, error, attempts):
+        # The request may have reached Trello; check the list after a grace period
+        state = FAILED if attempts >= MAX_ATTEMPTS else UNKNOWN
+        delay = max(UNKNOWN_GRACE, backoff_delay(attempts))
+        self._execute(
+            "UPDATE outbox SET state = ?, attempts = ?, claimed_at = NULL, last_error = ?,"
+            " next_attempt = ? WHERE id = ?",
+            (state, attempts, error, time.time() + delay, entry_id),
+        )
+
+    def retry(self, entry_ids=None):
+        # Make waiting and failed entries (all, or the given ones) due now. Failed entries
+        # are checked for on their list before they are sent again
+        query = (
+            "UPDATE outbox SET state = CASE WHEN state = ? THEN ? ELSE state END,"
+            " next_attempt = ? WHERE state IN (?, ?, ?)"
+        )
+        parameters = [FAILED, UNKNOWN, time.time(), FAILED, PENDING, UNKNOWN]
+        if entry_ids:
+            query += f" AND id IN ({', '.join('?' * len(entry_ids))})"
+            parameters += list(entry_ids)
+        return self._execute(query, parameters).rowcount
+
+    def drop(self, entry_ids=None, sent_only=False):
+        # Delete entries by ID, every entry, or only the sent ones. Returns how many
+        query = "DELETE FROM outbox WHERE 1 = 1"
+        parameters = []
+        if sent_only:
+            query += " AND state = ?"
+            parameters.append(SENT)
+        if entry_ids:
+            query += f" AND id IN ({', '.join('?' * len(entry_ids))})"
+            parameters += list(entry_ids)
+        return self._execute(query, parameters).rowcount
+
+
+"""
+Function to create the card for one outbox entry and record the outcome. The entry must
+have been claimed by the caller.
+
+Parameters:
+    - outbox: Outbox the entry belongs to
+    - entry: Outbox entry to send
+    - timeout: Seconds to wait for Trello (the client's timeout by default)
+
+Returns:
+    - Created Card, None if it was not created
+"""
+
+
+def send_entry(outbox, entry, timeout=None):
+    attempts = entry["attempts"] + 1
+    try:
+        with use_profile(entry.get("profile")):
+            card = create_new_card(
+                entry["list_id"], entry["name"], entry["desc"], entry["label_ids"], timeout=timeout
+            )
+    except OSError as error:
+        # Connection failures and timeouts; the request may or may not have been received
+        outbox.mark_unknown(entry["id"], str(error), attempts)
+        return None
+    if card is None:
+        outbox.mark_failed(entry["id"], "Unable to create card", attempts)
+        return None
+    outbox.mark_sent(entry["id"], card.id)
+    return card
+
+
+def _reconcile_unknown(outbox, entries):
+    # Find cards of entries whose send was cut off. Returns the entries still to be sent
+    claimed = {entry["card_id"] for entry in outbox.entries((SENT,)) if entry["card_id"]}
+    by_list = defaultdict(list)
+    for entry in entries:
+        by_list[(entry.get("profile"), entry["list_id"])].append(entry)
+    remaining = []
+    for (profile, list_id), list_entries in by_list.items():
+        try:
+            with use_profile(profile):
+                cards = get_list_cards(list_id)
+        except OSError:
+            cards = None
+        if cards is None:
+            remaining.extend(list_entries)
+            continue
+        available = defaultdict(list)
+        for card in cards:
+            if card.id not in claimed:
+                available[(card.name, card.desc)].append(card.id)
+        for entry in list_entries:
+            matches = available.get((entry["name"], entry["desc"]))
+            if matches:
+                outbox.mark_sent(entry["id"], matches.pop(0))
+            else:
+                remaining.append(entry)
+    return remaining
+
+
+"""
+Function to send every due outbox entry through a pool of worker threads. Entries whose
+earlier send was cut off are first looked for on their list so they are not created twice.
+
+Parameters:
+    - outbox: Outbox to flush
+    - workers: Number of cards sent concurrently
+    - include_waiting: Also send entries still waiting out their backoff
+
+Returns:
+    - Number of cards created and number of entries that are still unfinished
+"""
+
+
+def flush_outbox(outbox, workers=DEFAULT_FLUSH_WORKERS, include_waiting=False):
+    from .bulk import run_bounded
+
+    due = outbox.due(include_waiting=include_waiting)
+    claimed = [entry for entry in due if outbox.claim(entry)]
+    uncertain = [entry for entry in claimed if entry["state"] in (UNKNOWN, SENDING)]
+    remaining = _reconcile_unknown(outbox, uncertain) if uncertain else []
+    to_send = [entry for entry in claimed if entry["state"] == PENDING] + remaining
+    created = len(uncertain) - len(remaining)
+    for card in run_bounded(to_send, workers, lambda entry: send_entry(outbox, entry)):
+        created += card is not None
+    return created, len(outbox.entries((PENDING, UNKNOWN, SENDING)))
+
+
+"""
+Function to keep flushing the outbox until it is empty, sleeping until the next retry comes
+due, for at most BACKGROUND_FLUSH_LIFETIME seconds
+
+Parameters:
+    - outbox: Outbox to drain
+    - workers: Number of cards sent concurrently
+
+Returns:
+    - Number of cards created and number of entries left unfinished
+"""
+
+
+def drain_outbox(outbox, workers=DEFAULT_FLUSH_WORKERS):
+    deadline = time.monotonic() + BACKGROUND_FLUSH_LIFETIME
+    created = 0
+    while True:
+        flushed, remaining = flush_outbox(outbox, workers)
+        created += flushed
+        next_due = outbox.next_due()
+        if not remaining or next_due is None:
+            return created, remaining
+        wait = max(0.5, next_due - time.time())
+        if time.monotonic() + wait > deadline:
+            return created, remaining
+        time.sleep(wait)
+
+
+"""
+Function to start a detached process that drains the outbox, so queued cards are sent
+after the command that queued them has returned
+
+Returns:
+    - None
+"""
+
+
+def start_background_flush():
+    subprocess.Popen(
+        [sys.executable, "-m", "addcardtool", "outbox", "flush", "--wait", "--quiet"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        close_fds=True,
+    )
+
+
+"""
+Function to queue a card and try to create it straight away. The card is on disk before
+anything is sent; if Trello does not answer within wait seconds the card is left to a
+background flusher and the caller returns without waiting any longer.
+
+Parameters:
+    - outbox: Outbox to queue the card in
+    - list_id: ID of the list to create the card in
+    - name: Name of the card
+    - desc: Description of the card
+    - label_ids: IDs of the labels to attach
+    - board_name, list_name: Names shown by outbox list
+    - wait: Seconds to wait for Trello
+    - background: Start a background flusher when the card is queued (callers queueing
+      several cards start one themselves)
+
+Returns:
+    - Created Card, None if the card was queued
+"""
+
+
+def send_or_queue(
+    outbox,
+    list_id,
+    name,
+    desc,
+    label_ids,
+    board_name="",
+    list_name="",
+    wait=DEFAULT_SEND_WAIT,
+    background=True,
+):
+    profile = current_profile()
+    entry_id = outbox.add(
+        list_id, name, desc, label_ids, board_name, list_name, claimed=True, profile=profile
+    )
+    entry = {
+        "id": entry_id,
+        "list_id": list_id,
+        "name": name,
+        "desc": desc,
+        "label_ids": list(label_ids),
+        "attempts": 0,
+        "profile": profile,
+    }
+    result = {}
+    sender = threading.Thread(
+        target=lambda: result.update(card=send_entry(outbox, entry, timeout=wait)),
+        daemon=True,
+    )
+    sender.start()
+    sender.join(wait)
+    if sender.is_alive():
+        # The request is still in flight; leave it to be checked for once it has landed
+        outbox.mark_unknown(entry_id, f"No answer from Trello within {wait:g}s", 1)
+    card = result.get("card")
+    if card is None and background:
+        start_background_flush()
+    return card
+
+
+"""
+Function to queue a card whose request was sent elsewhere but never answered, such as by a
+daemon that timed out. The card may already exist, so it is looked for on its list before
+a background flusher sends it again.
+
+Parameters:
+    - outbox: Outbox to queue the card in
+    - list_id: ID of the list the card was sent to
+    - name: Name of the card
+    - desc: Description of the card
+    - label_ids: IDs of the labels to attach
+    - board_name, list_name: Names shown by outbox list
+    - error: Why the answer was lost, shown by outbox list
+
+Returns:
+    - Outbox ID of the card
+"""
+
+
+def queue_unanswered(outbox, list_id, name, desc, label_ids, board_name="", list_name="", error=""):
+    entry_id = outbox.add(
+        list_id,
+        name,
+        desc,
+        label_ids,
+        board_name,
+        list_name,
+        claimed=True,
+        profile=current_profile(),
+    )
+    outbox.mark_unknown(entry_id, error, 1)
+    start_background_flush()
+    return entry_id
+
+
+"""
+Function to check whether queued cards are waiting to be sent, without creating an outbox
+
+Parameters:
+    - path: Path of the outbox database (the default outbox if not given)
+
+Returns:
+    - True if any entry is due
+"""
+
+
+def has_due_entries(path=None):
+    path = path or default_outbox_path()
+    if not os.path.exists(path):
+        return False
+    outbox = Outbox(path)
+    try:
+        return bool(outbox.due())
+    finally:
+        outbox.close()
@@ -0,0 +1,147 @@
+import json
+import sys
+
+# Output formats chosen with --output. text prints Rich-formatted prose; json prints one
+# document when the command is done; ndjson prints one line per result as it completes
+TEXT = "text"
+JSON = "json"
+NDJSON = "ndjson"
+OUTPUT_FORMATS = (TEXT, JSON, NDJSON)
+
+# Outcomes of a card in a result record
+CREATED = "created"
+RECOVERED = "recovered"
+QUEUED = "queued"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+"""
+Function to describe a created card for --output json and ndjson
+
+Parameters:
+    - card: Card returned by Trello
+
+Returns:
+    - Dictionary with the card's ID, name, short URL, list, board and label IDs
+"""
+
+
+def card_record(card):
+    return {
+        "card_id": card.id,
+        "name": card.name,
+        "url": card.short_url,
+        "list_id": card.list_id,
+        "board_id": card.board_id,
+        "label_ids": list(card.label_ids),
+    }
+
+
+"""
+Function to describe the outcome of one card of a bulk or fan-out run for --output json and
+ndjson
+
+Parameters:
+    - result: CardResult to describe
+    - prefix: What the result is numbered as ("row" or "target")
+
+Returns:
+    - Dictionary with the row number, outcome, names, the card's IDs and URL and the time
+      spent sending it
+"""
+
+
+def card_result_record(result, prefix="row"):
+    row = result.row
+    if result.duplicate is not None:
+        status = SKIPPED
+    elif result.queued:
+        status = QUEUED
+    elif not result.ok:
+        status = FAILED
+    else:
+        status = RECOVERED if result.recovered else CREATED
+    record = {prefix: row.number, "status": status, "board": row.board, "list": row.list}
+    if result.card is not None:
+        record.update(card_record(result.card))
+    else:
+        record.update(name=row.name, card_id=result.card_id)
+    if result.duplicate is not None:
+        record["duplicate_of"] = result.duplicate.name
+    if result.error is not None:
+        record["error"] = result.error
+    if result.elapsed is not None:
+        record["elapsed"] = round(result.elapsed, 4)
+    return record
+
+
+"""
+Writes the structured results of a command to stdout in the chosen output format. In the
+text format nothing is written, since the command prints its results as prose. Commands
+call result for each result as it completes and finish once with their summary.
+
+Parameters:
+    - output_format: TEXT, JSON or NDJSON
+    - stream: Stream the results are written to (stdout by default)
+"""
+
+
+class OutputWriter:
+    def __init__(self, output_format=TEXT, stream=None):
+        self.format = output_format
+        self.stream = stream or sys.stdout
+        self.results = []
+
+    @property
+    def text(self):
+        return self.format == TEXT
+
+    def _write(self, data):
+        self.stream.write(json.dumps(data, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+    def result(self, record):
+        # ndjson writes each result straight away so pipelines can act on it
+        if self.format == NDJSON:
+            self._write(record)
+        elif self.format == JSON:
+            self.results.append(record)
+
+    def finish(self, **summary):
+        # json writes the results and the summary as one document; ndjson ends with a
+        # summary line
+        if self.format == JSON:
+            self._write({"results": self.results, "summary": summary})
+        elif self.format == NDJSON:
+            self._write({"summary": summary})
+
+    def document(self, record):
+        # Write the single result of a command that has no list of results
+        if not self.text:
+            self._write(record)
+
+
+_writer = OutputWriter()
+
+
+"""
+Function to choose the output format for the rest of the run
+
+Parameters:
+    - output_format: TEXT, JSON or NDJSON
+    - stream: Stream the results are written to (stdout by default)
+
+Returns:
+    - The OutputWriter commands write their results to
+"""
+
+
+def set_output(output_format, stream=None):
+    global _writer
+    _writer = OutputWriter(output_format, stream)
+    return _writer
+
+
+def get_output():
+    return _writer
@@ -0,0 +1,112 @@
+from .search import SearchIndex
+
+# Menus with more entries than this are shown as a search prompt instead of a full list
+SEARCH_THRESHOLD = 20
+
+# Number of matches shown under the search prompt
+SEARCH_RESULTS = 15
+
+
+"""
+Function to build the prompt-toolkit completer that filters an index as the user types.
+prompt-toolkit is imported here so it is only loaded when a search prompt is shown.
+
+Parameters:
+    - index: SearchIndex of (name, description, value) entries
+    - labels: Dictionary of value to the text shown for it
+
+Returns:
+    - Completer for prompt-toolkit's prompt
+"""
+
+
+def _index_completer(index, labels):
+    from prompt_toolkit.completion import Completer, Completion
+
+    class IndexCompleter(Completer):
+        def get_completions(self, document, complete_event):
+            text = document.text_before_cursor
+            for value in index.search(text, SEARCH_RESULTS):
+                yield Completion(labels[value], start_position=-len(text))
+
+    return IndexCompleter()
+
+
+"""
+Function to let the user pick one entry from a long menu by typing part of its name or
+description. Matches are listed under the prompt and narrowed on every keystroke.
+
+Parameters:
+    - message: Message shown before the search prompt
+    - entries: List of (name, description, value, label) tuples. The name and description are
+      searched; the label is the text shown for the entry
+    - empty_value: Value returned when the user submits an empty line (None re-prompts)
+
+Returns:
+    - Value of the chosen entry
+"""
+
+
+def search_select(message, entries, empty_value=None):
+    from prompt_toolkit.shortcuts import prompt as toolkit_prompt
+
+    labels = {value: label for _, _, value, label in entries}
+    by_label = {label: value for _, _, value, label in entries}
+    index = SearchIndex((name, desc, value) for name, desc, value, _ in entries)
+    completer = _index_completer(index, labels)
+    while True:
+        answer = toolkit_prompt(
+            f"{message} (type to search, Tab to browse matches): ",
+            completer=completer,
+            complete_while_typing=True,
+        ).strip()
+        if not answer and empty_value is not None:
+            return empty_value
+        if answer in by_label:
+            return by_label[answer]
+        # Accept the best match when the typed text is not a full entry
+        matches = index.search(answer, 1) if answer else []
+        if matches:
+            return matches[0]
+        print("No match found, try again")
+
+
+"""
+Function to let the user pick any number of entries. Short menus use a checkbox list;
+long menus repeat the search prompt until an empty line is entered.
+
+Parameters:
+    - message: Message shown before the menu
+    - entries: List of (name, description, value, label) tuples
+
+Returns:
+    - List of the chosen values in the order they were chosen
+"""
+
+
+def multi_select(message, entries):
+    if len(entries) <= SEARCH_THRESHOLD:
+        from PyInquirer import prompt as inquirer_prompt
+
+        question = [
+            {
+                "type": "checkbox",
+                "name": "selected",
+                "message": f"{message} (space to select, enter to finish)",
+                "choices": [{"name": label, "value": value} for _, _, value, label in entries],
+            }
+        ]
+        return list(inquirer_prompt(question).get("selected", []))
+
+    selected = []
+    remaining = list(entries)
+    done = object()
+    while remaining:
+        value = search_select(
+            f"{message} [{len(selected)} selected, empty line to finish]", remaining, done
+        )
+        if value is done:
+            break
+        selected.append(value)
+        remaining = [entry for entry in remaining if entry[2] != value]
+    return selected
@@ -0,0 +1,49 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PREFETCH_WORKERS = 4
+
+
+"""
+Runs reads in background threads ahead of the prompts that need them. Each call is keyed
+so a value that is already being fetched is never requested twice, and the prompt that
+needs it waits only for whatever is left of the request.
+
+Parameters:
+    - max_workers: Number of reads run concurrently
+"""
+
+
+class Prefetcher:
+    def __init__(self, max_workers=DEFAULT_PREFETCH_WORKERS):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="addcardtool-prefetch"
+        )
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def submit(self, key, function, *args):
+        # Start function(*args) in the background unless key is already being fetched
+        with self.lock:
+            future = self.futures.get(key)
+            if future is None:
+                # Fetch as the caller's profile
+                future = self.futures[key] = self.executor.submit(
+                    contextvars.copy_context().run, function, *args
+                )
+            return future
+
+    def result(self, key, function, *args):
+        # Wait for the value of key, starting the fetch now if it was never prefetched
+        return self.submit(key, function, *args).result()
+
+    def shutdown(self):
+        # Drop fetches that have not started so leaving the command never waits on them
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -1,23 +1,151 @@
-import requests
-import json
-import dotenv
 import os
 
-# Load environment variables
-dotenv.load_dotenv()
+from .batch import Batcher
+from .cache import get_cache
+from .client import TrelloAPIError, get_client
+from .jsonstream import iter_array
+from .models import Board, Card, Label, List, intern
+from .multipart import MultipartStream
 
-# Get environment variables for API calls
-API_KEY = os.getenv("TRELLO_API_KEY")
-API_TOKEN = os.getenv("TRELLO_API_TOKEN")
-USERNAME = os.getenv("TRELLO_USERNAME")
+# API paths relative to the client base URL
+CARDS_PATH = "cards"
+BOARDS_PATH = "boards"
+LISTS_PATH = "lists"
+LABELS_PATH = "labels"
+MEMBERS_PATH = "members"
 
-# API URLS
-BASE_URL = "https://api.trello.com/1/"
-CARDS_URL = f"{BASE_URL}cards"
-BOARDS_URL = f"{BASE_URL}boards"
-LISTS_URL = f"{BASE_URL}lists"
-LABELS_URL = f"{BASE_URL}labels"
-MEMBERS_URL = f"{BASE_URL}members"
+# Cache keys for board metadata
+BOARDS_CACHE_KEY = "boards"
+
+
+def board_cache_key(board_id):
+    return f"board-{board_id}"
+
+
+def board_lists_cache_key(board_id):
+    return f"board-{board_id}-lists"
+
+
+def board_labels_cache_key(board_id):
+    return f"board-{board_id}-labels"
+
+
+"""
+Function to get a metadata resource through the on-disk cache. Fresh entries are returned
+without a request; stale entries with an ETag are revalidated with a conditional request.
+
+Parameters:
+    - cache_key: Key of the resource in the cache
+    - path: API path of the resource
+    - parse: Function turning the JSON response into the value to cache
+    - params: Query parameters of the request
+    - batcher: Batcher to send the request through as part of a /batch call (optional)
+
+Returns:
+    - Cached or fetched value, None if the request failed
+    - Status code of the response (200 when served from the cache)
+"""
+
+
+def _cached_get(cache_key, path, parse, params=None, batcher=None):
+    client = get_client()
+    cache = get_cache(client.api_token)
+    entry = cache.get_fresh(cache_key)
+    if entry is not None:
+        return entry.data, 200
+
+    if batcher is not None:
+        # Batched responses carry no ETag, so they are cached without one
+        status_code, data = batcher.get(path, params)
+        if status_code != 200:
+            return None, status_code
+        data = parse(data)
+        cache.put(cache_key, data)
+        return data, 200
+
+    entry = None if cache.refresh else cache.get(cache_key)
+    headers = {}
+    if entry is not None and entry.etag:
+        headers["If-None-Match"] = entry.etag
+
+    response = client.get(path, params=params, headers=headers)
+
+    if response.status_code == 304 and entry is not None:
+        cache.touch(cache_key, entry)
+        return entry.data, 200
+    if response.status_code == 200:
+        data = parse(response.json())
+        cache.put(cache_key, data, response.headers.get("ETag"))
+        return data, 200
+    return None, response.status_code
+
+
+# Board fields requested when listing boards; everything else in the board payload is
+# left out of the response
+BOARD_LIST_FIELDS = "name,desc,closed"
+
+# Number of boards requested per page when listing boards
+BOARD_PAGE_SIZE = 500
+
+# Bytes read from the response at a time while boards are streamed
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+"""
+Function to stream the open boards available to the user. Only the name, description and
+closed flag of each board are requested, closed boards are filtered out by Trello, results
+are paged and each page is decoded as it arrives, so the first board is available long
+before the last one and the whole payload is never held in memory.
+
+Parameters:
+    - page_size: Number of boards requested per page
+
+Returns:
+    - Generator of Board objects without lists and labels
+
+Raises:
+    - TrelloAPIError if a page cannot be fetched
+"""
+
+
+def iter_user_boards(page_size=BOARD_PAGE_SIZE):
+    client = get_client()
+    cache = get_cache(client.api_token)
+    entry = cache.get_fresh(BOARDS_CACHE_KEY)
+    if entry is not None:
+        for name, board_id, desc in entry.data:
+            yield Board(id=board_id, name=name, desc=desc)
+        return
+
+    user_boards_path = f"{MEMBERS_PATH}/me/boards"
+    query = {"fields": BOARD_LIST_FIELDS, "filter": "open", "limit": page_size}
+    boards = []
+    seen = set()
+    while True:
+        response = client.get(user_boards_path, params=query, stream=True)
+        if response.status_code != 200:
+            response.close()
+            raise TrelloAPIError(response.status_code)
+        page_count = 0
+        new_count = 0
+        with response:
+            for board in iter_array(response.iter_content(STREAM_CHUNK_SIZE)):
+                page_count += 1
+                if board["id"] in seen or board.get("closed"):
+                    continue
+                seen.add(board["id"])
+                new_count += 1
+                item = Board(id=board["id"], name=board["name"], desc=board.get("desc") or "")
+                boards.append(item)
+                last_id = board["id"]
+                yield item
+        # Trello pages from the newest board backwards; a short page or a page with nothing
+        # new means every board has been seen
+        if page_count < page_size or new_count == 0:
+            break
+        query["before"] = last_id
+    # Cached as compact [name, id, desc] rows
+    cache.put(BOARDS_CACHE_KEY, [[board.name, board.id, board.desc] for board in boards])
 
 
 """
@@ -25,82 +153,149 @@ Function to get all boards available to the user. Program uses user membership a
 available to the user.
 
 Returns:
-    - JSON object of all boards available to the user
-    - Error message and status code if unable to get boards 
+    - List of Board objects without lists and labels
+    - None and an error message with the status code if unable to get boards
 """
 
 
 def get_all_user_boards_name():
     # Get all boards available in organization
-    query = {"key": API_KEY, "token": API_TOKEN}
-
-    headers = {"Accept": "application/json"}
-
-    user_boards_url = f"{MEMBERS_URL}/me/boards"
+    try:
+        return list(iter_user_boards())
+    except TrelloAPIError as error:
+        print("Error: Unable to get boards")
+        print(error.status_code)
+        return None
 
-    response = requests.request("GET", user_boards_url, headers=headers, params=query)
 
-    if response.status_code == 200:
-        boards = []
-        for board in response.json():
-            boards.append((board["name"], board["id"], board["desc"]))
-        return boards
-    else:
-        print("Error: Unable to get boards")
-        print(response.status_code)
+# Query that nests a board's open lists and all of its labels in the board response
+BOARD_DETAILS_QUERY = {
+    "fields": "name,desc",
+    "lists": "open",
+    "list_fields": "name,pos",
+    "labels": "all",
+    "label_fields": "name,color",
+}
+
+
+# Turn a board response into the compact form that is cached
+def parse_board_details(data):
+    return {
+        "id": data["id"],
+        "name": data["name"],
+        "desc": data.get("desc", ""),
+        "lists": [
+            {"id": list["id"], "name": list["name"], "pos": list.get("pos")}
+            for list in data.get("lists", [])
+        ],
+        "labels": [
+            {"id": label["id"], "name": label["name"], "color": label["color"]}
+            for label in data.get("labels", [])
+        ],
+    }
 
 
 """
-Function to get all board details for a specified board ID
+Function to get a board with its open lists and all of its labels. Trello's nested resource
+parameters return everything in one response, so this replaces separate calls to
+get_board_lists and get_board_labels.
 
 Parameters:
     - board_id: ID of the board to get details for
+    - batcher: Batcher to send the request through (optional)
 
 Returns:
-    - JSON object of board details
-    - Error message and status code if unable to get board details
+    - Board with its lists and labels
+    - None if unable to get board details
 """
 
 
-def get_board(board_id):
-    # Get board details
-    query = {"key": API_KEY, "token": API_TOKEN}
-
-    headers = {"Accept": "application/json"}
+def get_board(board_id, batcher=None):
+    # Get board details with lists and labels nested in the response
+    board_path = f"{BOARDS_PATH}/{board_id}"
 
-    board_url = f"{BOARDS_URL}/{board_id}"
-    board_lists_url = f"{board_url}/lists"
+    board, status_code = _cached_get(
+        board_cache_key(board_id), board_path, parse_board_details, BOARD_DETAILS_QUERY, batcher
+    )
 
-    response_board = requests.request("GET", board_url, headers=headers, params=query)
+    if board is not None:
+        return Board.from_json(board)
+    else:
+        print("Error: Unable to get board details")
+        print(status_code)
+        return None
 
 
 """
-Function to get all lists that are in a specified board ID
+Function to get many boards with their lists and labels. Boards missing from the cache are
+fetched through Trello's /batch endpoint, several boards per round trip.
 
 Parameters:
-    - board_id: ID of the board to get lists for
+    - board_ids: IDs of the boards to get
+    - batcher: Batcher to send the requests through (a new one is used if not given)
 
 Returns:
-    - JSON object of all lists in the board
-    - Error message and status code if unable to get board lists
+    - Dictionary of board ID to Board (boards that could not be fetched are left out)
 """
 
 
-def get_board_lists(board_id):
-    # Get all lists in board
-    url = f"{BOARDS_URL}/{board_id}/lists"
+def get_boards(board_ids, batcher=None):
+    batcher = batcher or Batcher()
+    cache = get_cache(get_client().api_token)
+    boards = {}
+    missing = []
+    for board_id in board_ids:
+        entry = cache.get_fresh(board_cache_key(board_id))
+        if entry is not None:
+            boards[board_id] = Board.from_json(entry.data)
+        else:
+            missing.append(board_id)
+
+    results = batcher.get_many(
+        [(f"{BOARDS_PATH}/{board_id}", BOARD_DETAILS_QUERY) for board_id in missing]
+    )
+    for board_id, (status_code, data) in zip(missing, results):
+        if status_code == 200:
+            board = parse_board_details(data)
+            cache.put(board_cache_key(board_id), board)
+            boards[board_id] = Board.from_json(board)
+        else:
+            print(f"Error: Unable to get board details for board {board_id}")
+            print(status_code)
+    return boards
+
+
+"""
+Function to get all lists that are in a specified board ID
 
-    headers = {"Accept": "application/json"}
+Parameters:
+    - board_id: ID of the board to get lists for
+    - batcher: Batcher to send the request through (optional)
 
-    query = {"key": API_KEY, "token": API_TOKEN}
+Returns:
+    - List of List objects in board order
+    - None if unable to get board lists
+"""
 
-    response = requests.request("GET", url, headers=headers, params=query)
 
-    if response.status_code == 200:
-        lists = []
-        for list in response.json():
-            lists.append((list["name"], list["id"]))
-        return lists
+def get_board_lists(board_id, batcher=None):
+    # Get all lists in board
+    path = f"{BOARDS_PATH}/{board_id}/lists"
+
+    lists, status_code = _cached_get(
+        board_lists_cache_key(board_id),
+        path,
+        lambda data: [[list["name"], list["id"]] for list in data],
+        {"fields": "name"},
+        batcher,
+    )
+
+    if lists is not None:
+        return [List(id=list_id, name=intern(name)) for name, list_id in lists]
+    else:
+        print("Error: Unable to get board lists")
+        print(status_code)
+        return None
 
 
 """
@@ -108,31 +303,34 @@ Function to get all labels that are in a specified board ID
 
 Parameters:
     - board_id: ID of the board to get labels for
+    - batcher: Batcher to send the request through (optional)
 
 Returns:
-    - Labels in the board in the form of a list of tuples with label name, label color and label id
+    - List of Label objects
     - None if unable to get board labels
 """
 
 
-def get_board_labels(board_id):
+def get_board_labels(board_id, batcher=None):
     # Get all labels in board
-    url = f"{BOARDS_URL}/{board_id}/labels"
-
-    headers = {"Accept": "application/json"}
-
-    query = {"key": API_KEY, "token": API_TOKEN}
-
-    response = requests.request("GET", url, headers=headers, params=query)
-
-    if response.status_code == 200:
-        labels = []
-        for label in response.json():
-            labels.append((label["name"], label["color"], label["id"]))
-        return labels
+    path = f"{BOARDS_PATH}/{board_id}/labels"
+
+    labels, status_code = _cached_get(
+        board_labels_cache_key(board_id),
+        path,
+        lambda data: [[label["name"], label["color"], label["id"]] for label in data],
+        {"fields": "name,color"},
+        batcher,
+    )
+
+    if labels is not None:
+        return [
+            Label(id=label_id, name=intern(name or ""), color=intern(color))
+            for name, color, label_id in labels
+        ]
     else:
         print("Error: Unable to get board labels")
-        print(response.status_code)
+        print(status_code)
         return None
 
 
@@ -142,6 +340,7 @@ Function to create a new board
 Parameters:
     - board_name: Name of the board to create
     - board_description: Description of the board to create (optional)
+    - defaults: Let Trello add its default lists and labels to the board
 
 Returns:
     - ID of the created board if successful
@@ -149,25 +348,20 @@ Returns:
 """
 
 
-def create_new_board(board_name, board_description):
+def create_new_board(board_name, board_description, defaults=True):
     # Create new board
-    url = BOARDS_URL
-
-    headers = {"Accept": "application/json"}
     if board_description:
-        query = {
-            "key": API_KEY,
-            "token": API_TOKEN,
-            "name": board_name,
-            "desc": board_description,
-        }
+        query = {"name": board_name, "desc": board_description}
     else:
-        query = {"key": API_KEY, "token": API_TOKEN, "name": board_name}
+        query = {"name": board_name}
+    if not defaults:
+        query.update(defaultLists="false", defaultLabels="false")
 
-    response = requests.request("POST", url, headers=headers, params=query)
+    response = get_client().post(BOARDS_PATH, params=query)
 
     if response.status_code == 200:
         board_id = response.json()["id"]
+        get_cache(get_client().api_token).invalidate(BOARDS_CACHE_KEY)
         return board_id
     else:
         print("Error: Unable to create new board")
@@ -180,6 +374,8 @@ Function to create a new list in a specified board
 
 Parameters:
     - board_id: ID of the board to create list in
+    - list_name: Name of the list to create
+    - pos: Position of the list on the board (at the end if not given)
 
 Returns:   
     - ID of the created list if successful
@@ -187,18 +383,21 @@ Returns:
 """
 
 
-def create_new_list(board_id, list_name):
+def create_new_list(board_id, list_name, pos=None):
     # Create new list in board
-    url = f"{BOARDS_URL}/{board_id}/lists"
-
-    headers = {"Accept": "application/json"}
+    path = f"{BOARDS_PATH}/{board_id}/lists"
 
-    query = {"key": API_KEY, "token": API_TOKEN, "name": list_name}
+    query = {"name": list_name}
+    if pos is not None:
+        query["pos"] = pos
 
-    response = requests.request("POST", url, headers=headers, params=query)
+    response = get_client().post(path, params=query)
 
     if response.status_code == 200:
         list_id = response.json()["id"]
+        get_cache(get_client().api_token).invalidate(
+            board_lists_cache_key(board_id), board_cache_key(board_id)
+        )
         return list_id
     else:
         print("Error: Unable to create new list")
@@ -221,22 +420,21 @@ Returns:
 
 def create_new_label(board_id, label_name, label_color):
     # Create new label in board
-    url = f"{BOARDS_URL}/{board_id}/labels"
-
-    headers = {"Accept": "application/json"}
+    path = f"{BOARDS_PATH}/{board_id}/labels"
 
     query = {
-        "key": API_KEY,
-        "token": API_TOKEN,
         "name": label_name,
         "color": label_color,
         "idBoard": board_id,
     }
 
-    response = requests.request("POST", url, headers=headers, params=query)
+    response = get_client().post(path, params=query)
 
     if response.status_code == 200:
         label_id = response.json()["id"]
+        get_cache(get_client().api_token).invalidate(
+            board_labels_cache_key(board_id), board_cache_key(board_id)
+        )
         return label_id
     else:
         print("Error: Unable to create new label")
@@ -245,42 +443,212 @@ def create_new_label(board_id, label_name, label_color):
 
 
 """
-Function to create a new card in a specified board
+Function to move a list to a new position on its board
+
+Parameters:
+    - board_id: ID of the board the list is on
+    - list_id: ID of the list to move
+    - pos: New position of the list
+
+Returns:
+    - ID of the moved list if successful
+    - None if unable to move list
+"""
+
+
+def update_list_position(board_id, list_id, pos):
+    # Move list on board
+    path = f"{LISTS_PATH}/{list_id}"
+
+    response = get_client().put(path, params={"pos": pos})
+
+    if response.status_code == 200:
+        get_cache(get_client().api_token).invalidate(
+            board_lists_cache_key(board_id), board_cache_key(board_id)
+        )
+        return list_id
+    else:
+        print("Error: Unable to move list")
+        print(response.status_code)
+        return None
+
+
+"""
+Function to change the color of a label
+
+Parameters:
+    - board_id: ID of the board the label is on
+    - label_id: ID of the label to change
+    - label_color: New color of the label
+
+Returns:
+    - ID of the changed label if successful
+    - None if unable to change label
+"""
+
+
+def update_label_color(board_id, label_id, label_color):
+    # Change label color
+    path = f"{LABELS_PATH}/{label_id}"
+
+    response = get_client().put(path, params={"color": label_color})
+
+    if response.status_code == 200:
+        get_cache(get_client().api_token).invalidate(
+            board_labels_cache_key(board_id), board_cache_key(board_id)
+        )
+        return label_id
+    else:
+        print("Error: Unable to change label color")
+        print(response.status_code)
+        return None
+
+
+"""
+Function to create a new card in a specified board. The card's fields are sent as a form
+body rather than in the URL, so long descriptions are not cut off by URL length limits.
 
 Parameters:
     - list_id: ID of the list to create card in
     - card_name: Name of the card to create
     - card_description: Description of the card to create
     - label_ids: List of label IDs to attach to the card
+    - timeout: Seconds to wait for Trello before giving up (the client's timeout by default)
 
 Returns:
-    - Status code if successful
+    - Card object parsed from Trello's response (with its board ID and short URL) if
+      successful
     - None if unable to create card
 """
 
 
-def create_new_card(list_id, card_name, card_description, label_ids):
+def create_new_card(list_id, card_name, card_description, label_ids, timeout=None):
     # Create new card in board
 
-    headers = {"Accept": "application/json"}
-
     # parse label ids to string
     label_ids_string = ",".join(label_ids)
 
     query = {
-        "key": API_KEY,
-        "token": API_TOKEN,
         "idList": list_id,
         "name": card_name,
         "desc": card_description,
         "idLabels": label_ids_string,
     }
 
-    response = requests.request("POST", CARDS_URL, headers=headers, params=query)
+    options = {"timeout": timeout} if timeout is not None else {}
+    response = get_client().post(CARDS_PATH, data=query, **options)
 
     if response.status_code == 200:
-        return response.status_code
+        return Card.from_json(response.json())
     else:
         print("Error: Unable to create new card")
         print(response.status_code)
         return None
+
+
+"""
+Function to attach a file to a card. The file is streamed from disk in small chunks as a
+multipart upload, so large files are sent in constant memory.
+
+Parameters:
+    - card_id: ID of the card to attach the file to
+    - path: Path of the file to upload
+    - name: Name of the attachment (the file's base name by default)
+
+Returns:
+    - ID of the attachment if successful
+    - None if unable to upload the file
+"""
+
+
+def add_card_attachment(card_id, path, name=None):
+    # Upload file to card
+    name = name or os.path.basename(path)
+
+    body = MultipartStream({"name": name}, [("file", path, name, None)])
+
+    with body:
+        response = get_client().post(
+            f"{CARDS_PATH}/{card_id}/attachments",
+            data=body,
+            headers={"Content-Type": body.content_type},
+        )
+
+    if response.status_code == 200:
+        return response.json()["id"]
+    else:
+        print("Error: Unable to add attachment to card")
+        print(response.status_code)
+        return None
+
+
+"""
+Function to get the cards on a list with only the fields needed to recognise them. The
+response is decoded card by card as it arrives, so a long list is never held as parsed JSON.
+
+Parameters:
+    - list_id: ID of the list to get cards for
+
+Returns:
+    - List of Card objects with their name and description
+    - None if unable to get the cards
+"""
+
+
+def get_list_cards(list_id):
+    # Get all open cards on list
+    path = f"{LISTS_PATH}/{list_id}/cards"
+
+    query = {"fields": "name,desc"}
+
+    response = get_client().get(path, params=query, stream=True)
+
+    if response.status_code == 200:
+        with response:
+            return [
+                Card.from_json(card)
+                for card in iter_array(response.iter_content(STREAM_CHUNK_SIZE))
+            ]
+    else:
+        response.close()
+        print("Error: Unable to get list cards")
+        print(response.status_code)
+        return None
+
+
+# Card fields kept in the local card index
+BOARD_CARD_FIELDS = "name,desc,idList"
+
+
+"""
+Function to get the open cards of a board with only the fields the card index keeps. The
+response is decoded card by card as it arrives.
+
+Parameters:
+    - board_id: ID of the board to get cards for
+
+Returns:
+    - List of Card objects with their name, description and list ID
+    - None if unable to get the cards
+"""
+
+
+def get_board_cards(board_id):
+    # Get all open cards on board
+    path = f"{BOARDS_PATH}/{board_id}/cards"
+
+    query = {"fields": BOARD_CARD_FIELDS, "filter": "open"}
+
+    response = get_client().get(path, params=query, stream=True)
+
+    if response.status_code == 200:
+        with response:
+            return [
+                Card.from_json(card)
+                for card in iter_array(response.iter_content(STREAM_CHUNK_SIZE))
+            ]
+    else:
+        response.close()
+        print("Error: Unable to get board cards")
+        print(response.status_code)
+        return None
@@ -0,0 +1,180 @@
+import threading
+import time
+
+# Trello allows 300 requests per 10 seconds for each API key and 100 requests per
+# 10 seconds for each token
+KEY_LIMIT = 300
+TOKEN_LIMIT = 100
+LIMIT_INTERVAL = 10.0
+
+# Response headers Trello sends with the remaining quota for the current window
+TOKEN_REMAINING_HEADER = "x-rate-limit-api-token-remaining"
+TOKEN_INTERVAL_HEADER = "x-rate-limit-api-token-interval-ms"
+KEY_REMAINING_HEADER = "x-rate-limit-api-key-remaining"
+KEY_INTERVAL_HEADER = "x-rate-limit-api-key-interval-ms"
+
+
+"""
+Token bucket that refills continuously at capacity / interval tokens per second.
+Reservations may drive the bucket below zero, which queues callers in the order they
+reserved: each caller is told how long to wait for its slot.
+
+Parameters:
+    - capacity: Number of requests allowed per interval
+    - interval: Length of the interval in seconds
+"""
+
+
+class TokenBucket:
+    def __init__(self, capacity, interval=LIMIT_INTERVAL):
+        self.capacity = capacity
+        self.rate = capacity / interval
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        # Take one token and return how many seconds the caller must wait before sending
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def observe_remaining(self, remaining):
+        # Never assume more quota than the server says is left in the window
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, float(remaining))
+
+
+"""
+Scheduler shared by every request sent with one API key and token. It spaces requests so
+both the per-key and per-token quotas hold, pauses everyone when the server asks for it
+and keeps counters that can be used to tune concurrency.
+
+Parameters:
+    - key_bucket: TokenBucket for the API key
+    - token_bucket: TokenBucket for the API token
+"""
+
+
+class RateLimiter:
+    def __init__(self, key_bucket, token_bucket):
+        self.key_bucket = key_bucket
+        self.token_bucket = token_bucket
+        self.lock = threading.Lock()
+        self.paused_until = 0.0
+        self.requests = 0
+        self.queued = 0
+        self.delayed_ms = 0.0
+        self.throttled = 0
+
+    def reserve(self):
+        # Return the number of seconds to wait before the next request may be sent
+        wait = max(self.key_bucket.reserve(), self.token_bucket.reserve())
+        with self.lock:
+            wait = max(wait, self.paused_until - time.monotonic())
+            self.requests += 1
+            if wait > 0:
+                self.queued += 1
+                self.delayed_ms += wait * 1000
+        return max(wait, 0.0)
+
+    def acquire(self):
+        # Block the calling thread until a request may be sent
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # Hold back every caller for the given number of seconds
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def observe(self, status_code, headers):
+        # Update the buckets from a response. Returns the number of seconds to back off
+        # when the server throttled the request, None otherwise
+        for remaining_header, bucket in (
+            (TOKEN_REMAINING_HEADER, self.token_bucket),
+            (KEY_REMAINING_HEADER, self.key_bucket),
+        ):
+            remaining = headers.get(remaining_header)
+            if remaining is not None and remaining.isdigit():
+                bucket.observe_remaining(int(remaining))
+        if status_code != 429:
+            return None
+        with self.lock:
+            self.throttled += 1
+        delay = retry_after_seconds(headers)
+        self.pause(delay)
+        return delay
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "queued": self.queued,
+                "delayed_ms": round(self.delayed_ms, 1),
+                "throttled": self.throttled,
+            }
+
+
+"""
+Function to work out how long to back off after a 429 response
+
+Parameters:
+    - headers: Headers of the throttled response
+
+Returns:
+    - Number of seconds to wait before retrying
+"""
+
+
+def retry_after_seconds(headers):
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+    for interval_header in (TOKEN_INTERVAL_HEADER, KEY_INTERVAL_HEADER):
+        interval = headers.get(interval_header)
+        if interval and interval.isdigit():
+            return int(interval) / 1000
+    return 1.0
+
+
+_key_buckets = {}
+_token_buckets = {}
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+"""
+Function to get the rate limiter for an API key and token. Limiters that share a key share
+its bucket, so every client in the process stays within the per-key quota together.
+
+Parameters:
+    - api_key: Trello API key
+    - api_token: Trello API token
+
+Returns:
+    - RateLimiter shared by every client using the key and token
+"""
+
+
+def get_rate_limiter(api_key, api_token):
+    with _registry_lock:
+        limiter = _limiters.get((api_key, api_token))
+        if limiter is None:
+            key_bucket = _key_buckets.setdefault(api_key, TokenBucket(KEY_LIMIT))
+            token_bucket = _token_buckets.setdefault(api_token, TokenBucket(TOKEN_LIMIT))
+            limiter = _limiters[(api_key, api_token)] = RateLimiter(key_bucket, token_bucket)
+        return limiter
@@ -0,0 +1,177 @@
+import http.client
+import json
+import os
+import socket
+
+from .cache import default_cache_dir
+from .models import Card
+
+SOCKET_NAME = "addcardtool.sock"
+
+# Seconds the thin client waits for the daemon to answer. A warm daemon adds a card with a
+# single Trello request, so a longer wait means Trello is struggling and the card is better
+# left to the outbox
+DEFAULT_REMOTE_TIMEOUT = 5
+
+
+class DaemonError(Exception):
+    """Raised when the daemon rejects a request or its answer is lost"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class DaemonUnavailable(DaemonError):
+    """Raised when no daemon accepts the connection, so the request was never sent"""
+
+
+"""
+Function to get the path of the daemon's Unix socket. ADDCARDTOOL_SOCKET overrides the
+default of addcardtool.sock in $XDG_RUNTIME_DIR, or in the cache directory when that is
+not set.
+
+Returns:
+    - Path of the socket
+"""
+
+
+def default_socket_path():
+    socket_path = os.getenv("ADDCARDTOOL_SOCKET")
+    if socket_path:
+        return socket_path
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    return os.path.join(runtime_dir or default_cache_dir(), SOCKET_NAME)
+
+
+"""
+Function to get the path of the file holding the token of a daemon listening on a port. The
+file sits next to the default socket and only the user running the daemon can read it.
+
+Parameters:
+    - port: Port the daemon listens on
+
+Returns:
+    - Path of the token file
+"""
+
+
+def token_path(port):
+    return os.path.join(os.path.dirname(default_socket_path()), f"addcardtool-{port}.token")
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=DEFAULT_REMOTE_TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+"""
+Thin client for a running addcardtool daemon. It only uses the standard library, so
+forwarding a card costs one local round trip and none of the imports, configuration loading
+or TLS handshakes of a direct run.
+
+Parameters:
+    - socket_path: Unix socket the daemon listens on (the default socket if neither is given)
+    - port: Localhost port the daemon listens on instead of a socket (ADDCARDTOOL_DAEMON_PORT
+      by default)
+    - timeout: Seconds to wait for the daemon to answer
+"""
+
+
+class DaemonClient:
+    def __init__(self, socket_path=None, port=None, timeout=DEFAULT_REMOTE_TIMEOUT):
+        self.port = port or int(os.getenv("ADDCARDTOOL_DAEMON_PORT") or 0) or None
+        self.socket_path = None if self.port else socket_path or default_socket_path()
+        self.timeout = timeout
+
+    def _connection(self):
+        if self.port:
+            return http.client.HTTPConnection("127.0.0.1", self.port, timeout=self.timeout)
+        return UnixHTTPConnection(self.socket_path, self.timeout)
+
+    def _headers(self, body):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        if self.port:
+            # Any local user can connect to a port, so the daemon asks for the token it
+            # wrote for its own user
+            try:
+                with open(token_path(self.port), encoding="utf-8") as token_file:
+                    headers["Authorization"] = f"Bearer {token_file.read().strip()}"
+            except OSError as error:
+                raise DaemonUnavailable(f"No daemon token for port {self.port}: {error}")
+        return headers
+
+    def is_running(self):
+        # True if a daemon answers on the socket or port
+        if self.socket_path and not os.path.exists(self.socket_path):
+            return False
+        try:
+            self.request("GET", "/health")
+        except (DaemonError, OSError):
+            return False
+        return True
+
+    def request(self, method, path, payload=None):
+        # Send a request to the daemon and return the decoded JSON answer
+        if method == "POST" and payload is None:
+            # The daemon only accepts POSTs with a JSON body
+            payload = {}
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = self._headers(body)
+        connection = self._connection()
+        try:
+            connection.connect()
+        except OSError as error:
+            connection.close()
+            raise DaemonUnavailable(f"No daemon is running: {error}")
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = json.loads(response.read() or b"{}")
+        except (OSError, http.client.HTTPException, ValueError) as error:
+            raise DaemonError(f"Unable to reach the daemon: {error}")
+        finally:
+            connection.close()
+        if response.status != 200:
+            message = data.get("error", f"Daemon answered {response.status}")
+            raise DaemonError(message, response.status)
+        return data
+
+    def health(self):
+        return self.request("GET", "/health")
+
+    def add_card(
+        self,
+        board_name,
+        list_name,
+        card_name,
+        card_desc="",
+        label_names=(),
+        create_missing=False,
+        label_color=None,
+        profile=None,
+    ):
+        # Ask the daemon to create a card (as profile, or the daemon's own) and return it
+        payload = {
+            "board": board_name,
+            "list": list_name,
+            "name": card_name,
+            "desc": card_desc,
+            "labels": list(label_names),
+            "create_missing": create_missing,
+        }
+        if label_color:
+            payload["label_color"] = label_color
+        if profile:
+            payload["profile"] = profile
+        return Card.from_json(self.request("POST", "/cards", payload))
+
+    def refresh(self):
+        # Make the daemon drop its indexes and metadata cache entries
+        return self.request("POST", "/refresh")
@@ -0,0 +1,166 @@
+import threading
+from collections import defaultdict
+from functools import partial
+
+from .config import DEFAULT_LABEL_COLOR
+from .models import Label, List
+from .program import create_new_label, create_new_list, get_all_user_boards_name, get_board
+
+
+class ResolveError(Exception):
+    """Raised when a board, list or label name cannot be turned into exactly one ID"""
+
+
+"""
+Hash index over named Trello objects. Lookups try the ID, then the exact name, then the
+case-folded name, each in constant time.
+
+Parameters:
+    - kind: Name of the kind of object indexed, used in error messages
+    - items: Iterable of objects with id and name attributes
+"""
+
+
+class NameIndex:
+    def __init__(self, kind, items=()):
+        self.kind = kind
+        self.by_id = {}
+        self.by_name = defaultdict(list)
+        self.by_folded = defaultdict(list)
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def add(self, item):
+        # Objects without a name, like color-only labels, can only be found by ID
+        self.by_id[item.id] = item
+        if item.name:
+            self.by_name[item.name].append(item)
+            self.by_folded[item.name.casefold()].append(item)
+
+    def find(self, key):
+        # Return every object the key could refer to, most specific match first
+        if key in self.by_id:
+            return [self.by_id[key]]
+        if key in self.by_name:
+            return self.by_name[key]
+        return self.by_folded.get(key.casefold(), [])
+
+    def resolve(self, key, scope=""):
+        # Return the single object the key refers to
+        matches = self.find(key)
+        where = f" on board {scope}" if scope else ""
+        if not matches:
+            raise ResolveError(f"{self.kind} not found{where}: {key}")
+        if len(matches) > 1:
+            ids = ", ".join(item.id for item in matches)
+            raise ResolveError(
+                f"{self.kind} name is ambiguous{where}: {key} matches {ids} (use the ID instead)"
+            )
+        return matches[0]
+
+
+"""
+Resolves board, list and label names to IDs for non-interactive card creation. The board
+index is built once from the user's boards and each board's list and label indexes once
+from its details, both of which are served from the metadata cache when it is warm. It is
+safe to share between threads; a board first needed by several threads is fetched once.
+
+Parameters:
+    - batcher: Batcher to send board reads through, for resolvers shared by many threads
+      (optional)
+    - create_missing: Create lists and labels that are not on the board instead of failing
+    - label_color: Color of labels created by create_missing
+"""
+
+
+class NameResolver:
+    def __init__(self, batcher=None, create_missing=False, label_color=DEFAULT_LABEL_COLOR):
+        self.batcher = batcher
+        self.create_missing = create_missing
+        self.label_color = label_color
+        self._lock = threading.Lock()
+        self._boards = None
+        self._board_locks = {}
+        self._board_indexes = {}
+
+    def _board_index(self):
+        with self._lock:
+            if self._boards is None:
+                boards = get_all_user_boards_name()
+                if boards is None:
+                    raise ResolveError("Unable to get boards")
+                self._boards = NameIndex("Board", boards)
+            return self._boards
+
+    def boards(self):
+        # Return every board (without lists and labels)
+        return list(self._board_index().by_id.values())
+
+    def board(self, board_name):
+        # Return the board (without lists and labels) a name or ID refers to
+        return self._board_index().resolve(board_name)
+
+    def _indexes(self, board):
+        # Called with the board's lock held
+        if board.id not in self._board_indexes:
+            details = get_board(board.id, self.batcher)
+            if details is None:
+                raise ResolveError(f"Unable to get lists and labels for board: {board.name}")
+            self._board_indexes[board.id] = (
+                NameIndex("List", details.lists),
+                NameIndex("Label", details.labels),
+            )
+        return self._board_indexes[board.id]
+
+    def _resolve_or_create(self, index, board, name, create):
+        # create is None when missing objects may not be created
+        try:
+            return index.resolve(name, board.name).id
+        except ResolveError:
+            if create is None or index.find(name):
+                raise
+        item = create(board.id, name)
+        if item is None:
+            raise ResolveError(
+                f"Unable to create {index.kind.lower()} on board {board.name}: {name}"
+            )
+        index.add(item)
+        return item.id
+
+    def _create_list(self, board_id, name):
+        list_id = create_new_list(board_id, name)
+        return List(id=list_id, name=name) if list_id else None
+
+    def _create_label(self, board_id, name, color):
+        label_id = create_new_label(board_id, name, color)
+        return Label(id=label_id, name=name, color=color) if label_id else None
+
+    def board_ids(self):
+        # IDs of the boards whose lists and labels have been loaded
+        with self._lock:
+            return list(self._board_indexes)
+
+    def resolve(self, board_name, list_name, label_names=(), create_missing=None, label_color=None):
+        # Return the board ID, list ID and label IDs for the given names. create_missing and
+        # label_color override the resolver's settings for this call
+        if create_missing is None:
+            create_missing = self.create_missing
+        create_list = self._create_list if create_missing else None
+        create_label = None
+        if create_missing:
+            create_label = partial(self._create_label, color=label_color or self.label_color)
+        board = self.board(board_name)
+        with self._lock:
+            board_lock = self._board_locks.setdefault(board.id, threading.Lock())
+        with board_lock:
+            lists, labels = self._indexes(board)
+            list_id = self._resolve_or_create(lists, board, list_name, create_list)
+            label_ids = []
+            for label_name in label_names:
+                label_id = self._resolve_or_create(labels, board, label_name, create_label)
+                if label_id not in label_ids:
+                    label_ids.append(label_id)
+        return board.id, list_id, label_ids
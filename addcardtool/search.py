@@ -0,0 +1,117 @@
+from collections import Counter, defaultdict
+from itertools import chain
+
+# Weight of a trigram found in an entry's name relative to one found in its description
+NAME_WEIGHT = 3
+DESC_WEIGHT = 1
+
+
+def _normalize(text):
+    return " ".join((text or "").casefold().split())
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+"""
+In-memory index over names and descriptions used to filter long menus as the user types.
+A trigram inverted index finds candidates without scanning every entry, and results are
+ranked so exact and prefix matches on the name come first.
+
+Parameters:
+    - entries: Iterable of (name, description, value) tuples
+"""
+
+
+class SearchIndex:
+    def __init__(self, entries):
+        self.names = []
+        self.descs = []
+        self.values = []
+        self.postings = defaultdict(list)
+        for name, desc, value in entries:
+            self.add(name, desc, value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, name, desc, value):
+        position = len(self.values)
+        normalized_name = _normalize(name)
+        normalized_desc = _normalize(desc)
+        self.names.append(normalized_name)
+        self.descs.append(normalized_desc)
+        self.values.append(value)
+        # Each posting is repeated by its weight so scoring is a plain count
+        for trigram in _trigrams(normalized_name):
+            self.postings[trigram].extend((position,) * NAME_WEIGHT)
+        for trigram in _trigrams(normalized_desc):
+            self.postings[trigram].extend((position,) * DESC_WEIGHT)
+        return position
+
+    def _rank(self, position, query, score):
+        name = self.names[position]
+        if name == query:
+            return (0, -score, position)
+        if name.startswith(query):
+            return (1, -score, position)
+        if f" {query}" in f" {name}":
+            return (2, -score, position)
+        if query in name:
+            return (3, -score, position)
+        return (4, -score, position)
+
+    def _search_short(self, query, limit):
+        # Too short for trigrams; a substring scan over names is cheap at this length.
+        # Prefix matches are collected first so most keystrokes never rank the rest
+        names = self.names
+        ranked = [position for position, name in enumerate(names) if name.startswith(query)]
+        if len(ranked) < limit:
+            ranked += [
+                position
+                for position, name in enumerate(names)
+                if query in name and not name.startswith(query)
+            ]
+        ranked = ranked[:limit]
+        ranked.sort(key=lambda position: self._rank(position, query, 0))
+        return ranked
+
+    def _search_trigrams(self, query, limit):
+        trigrams = _trigrams(query)
+        # Counting with Counter keeps the per-posting work in C
+        scores = Counter(
+            chain.from_iterable(self.postings.get(trigram, ()) for trigram in trigrams)
+        )
+        # Keep entries that share at least half of the query's trigrams, so small typos
+        # still match while unrelated entries are dropped, and rank only the best scoring
+        threshold = len(trigrams) * NAME_WEIGHT / 2
+        best = {
+            position
+            for position, score in scores.most_common(limit * 4)
+            if score >= threshold
+        }
+        # Exact and prefix matches on the name rank first but can score below entries that
+        # also match in their description, so they are picked from every candidate. Such
+        # a name holds every query trigram except perhaps the one ending the query
+        prefix_score = (len(trigrams) - 1) * NAME_WEIGHT
+        names = self.names
+        best.update(
+            position
+            for position, score in scores.items()
+            if score >= prefix_score and names[position].startswith(query)
+        )
+        best = sorted(best, key=lambda position: self._rank(position, query, scores[position]))
+        return best[:limit]
+
+    def search(self, query, limit=20):
+        # Return up to limit values ranked by how well they match query
+        query = _normalize(query)
+        if not query:
+            return self.values[:limit]
+        if len(query) < 3:
+            positions = self._search_short(query, limit)
+        else:
+            positions = self._search_trigrams(query, limit)
+        return [self.values[position] for position in positions]
@@ -0,0 +1,245 @@
+from dataclasses import dataclass
+
+from .batch import Batcher
+from .cache import get_cache
+from .client import get_client
+from .config import SYNC_ACTION_LIMIT
+from .program import (
+    BOARD_DETAILS_QUERY,
+    BOARDS_PATH,
+    board_cache_key,
+    iter_user_boards,
+    parse_board_details,
+)
+
+# Action types that change a board's own fields, its lists or its labels
+BOARD_ACTIONS = ("updateBoard",)
+LIST_ACTIONS = ("createList", "updateList", "moveListToBoard", "moveListFromBoard")
+LABEL_ACTIONS = ("createLabel", "updateLabel", "deleteLabel")
+
+# Card action types passed on to a card handler; the board store does not hold cards
+CARD_ACTIONS = (
+    "createCard",
+    "updateCard",
+    "deleteCard",
+    "moveCardToBoard",
+    "moveCardFromBoard",
+)
+
+SYNC_ACTION_FILTER = ",".join(BOARD_ACTIONS + LIST_ACTIONS + LABEL_ACTIONS + CARD_ACTIONS)
+
+# Sync outcomes for a board
+INCREMENTAL = "incremental"
+FULL = "full"
+FAILED = "failed"
+
+
+def board_sync_key(board_id):
+    return f"board-{board_id}-sync"
+
+
+"""
+Outcome of syncing one board
+
+Attributes:
+    - board_id: ID of the board
+    - mode: INCREMENTAL if only new actions were applied, FULL if the board was read again,
+      FAILED if it could not be synced
+    - changes: Number of actions applied to the stored board
+    - error: Status code of the failed request, None otherwise
+"""
+
+
+@dataclass(slots=True)
+class SyncResult:
+    board_id: str
+    mode: str
+    changes: int = 0
+    error: int = None
+
+
+def _sort_lists(board):
+    board["lists"].sort(key=lambda item: item["pos"])
+
+
+def _apply_list_action(board, action_type, data):
+    # Returns True if the stored lists changed
+    change = data.get("list") or {}
+    lists = board["lists"]
+    current = next((item for item in lists if item["id"] == change.get("id")), None)
+    if action_type == "moveListFromBoard" or change.get("closed") is True:
+        if current is None:
+            return False
+        lists.remove(current)
+        return True
+    if current is None:
+        if action_type == "updateList" and "closed" not in change:
+            # A change to an archived list, which the store does not hold
+            return False
+        if not change.get("name") or change.get("pos") is None:
+            raise KeyError("list")
+        lists.append({"id": change["id"], "name": change["name"], "pos": float(change["pos"])})
+        _sort_lists(board)
+        return True
+    if "name" in change:
+        current["name"] = change["name"]
+    if change.get("pos") is not None:
+        current["pos"] = float(change["pos"])
+        _sort_lists(board)
+    return True
+
+
+def _apply_label_action(board, action_type, data):
+    change = data.get("label") or {}
+    labels = board["labels"]
+    current = next((label for label in labels if label["id"] == change.get("id")), None)
+    if action_type == "deleteLabel":
+        if current is None:
+            return False
+        labels.remove(current)
+        return True
+    if current is None:
+        labels.append(
+            {"id": change["id"], "name": change.get("name") or "", "color": change.get("color")}
+        )
+        return True
+    for field in ("name", "color"):
+        if field in change:
+            current[field] = change[field]
+    return True
+
+
+"""
+Function to apply one action from a board's action feed to the stored board
+
+Parameters:
+    - board: Stored board (as cached by get_board), changed in place
+    - action: Action as returned by /boards/{id}/actions
+
+Returns:
+    - True if the stored board changed
+
+Raises:
+    - KeyError if the action lacks what is needed to apply it (the board is read in full)
+"""
+
+
+def apply_action(board, action):
+    action_type = action["type"]
+    data = action.get("data") or {}
+    if action_type in LIST_ACTIONS:
+        return _apply_list_action(board, action_type, data)
+    if action_type in LABEL_ACTIONS:
+        return _apply_label_action(board, action_type, data)
+    if action_type in BOARD_ACTIONS:
+        changed = False
+        for field in ("name", "desc"):
+            if field in (data.get("board") or {}) and field in (data.get("old") or {}):
+                board[field] = data["board"][field]
+                changed = True
+        return changed
+    return False
+
+
+def _can_sync(board, state):
+    # Boards stored before list positions were cached cannot be kept in order incrementally
+    return (
+        board is not None
+        and state is not None
+        and all(item.get("pos") is not None for item in board["lists"])
+    )
+
+
+"""
+Function to bring the stored lists and labels of boards up to date. Each board keeps a
+high-water mark (the newest action applied to it); only the actions after it are read, ten
+boards per /batch request, and applied to the stored board. Boards never synced, boards
+with more than limit new actions and boards missing from the cache are read again in full.
+
+Parameters:
+    - board_ids: IDs of the boards to sync (every open board of the user if not given)
+    - limit: Most actions read per board before falling back to a full read
+    - card_handler: Function called with the board ID and each card action, oldest first
+      (optional)
+    - batcher: Batcher to send the reads through (a new one is created if not given)
+
+Returns:
+    - List of SyncResult objects in board order
+"""
+
+
+def sync_boards(board_ids=None, limit=SYNC_ACTION_LIMIT, card_handler=None, batcher=None):
+    batcher = batcher or Batcher()
+    cache = get_cache(get_client().api_token)
+    if board_ids is None:
+        board_ids = [board.id for board in iter_user_boards()]
+
+    stored = {}
+    for board_id in board_ids:
+        board = None if cache.refresh else cache.get(board_cache_key(board_id))
+        state = None if cache.refresh else cache.get(board_sync_key(board_id))
+        if _can_sync(board and board.data, state and state.data):
+            stored[board_id] = (board.data, state.data)
+
+    results = {}
+    incremental = list(stored)
+    requests = []
+    for board_id in incremental:
+        query = {"filter": SYNC_ACTION_FILTER, "limit": limit, "fields": "type,date,data"}
+        if stored[board_id][1]["action_id"]:
+            query["since"] = stored[board_id][1]["action_id"]
+        requests.append((f"{BOARDS_PATH}/{board_id}/actions", query))
+    feeds = batcher.get_many(requests)
+    for board_id, (status_code, actions) in zip(incremental, feeds):
+        if status_code != 200 or len(actions) >= limit:
+            continue
+        board = stored[board_id][0]
+        changes = 0
+        card_actions = []
+        try:
+            # Trello returns the newest action first
+            for action in reversed(actions):
+                if action["type"] in CARD_ACTIONS:
+                    card_actions.append(action)
+                elif apply_action(board, action):
+                    changes += 1
+        except KeyError:
+            continue
+        if card_handler is not None:
+            for action in card_actions:
+                card_handler(board_id, action)
+        if actions:
+            cache.put(board_sync_key(board_id), _mark(actions[0]))
+        # Re-storing the board marks it as fresh for get_board as well
+        cache.put(board_cache_key(board_id), board)
+        results[board_id] = SyncResult(board_id, INCREMENTAL, changes)
+
+    refetch = [board_id for board_id in board_ids if board_id not in results]
+    for board_id, result in zip(refetch, _read_full(batcher, cache, refetch)):
+        results[board_id] = result
+    return [results[board_id] for board_id in board_ids]
+
+
+def _mark(action):
+    return {"action_id": action["id"] if action else None, "date": action and action.get("date")}
+
+
+def _read_full(batcher, cache, board_ids):
+    # Read boards in full together with their newest action, which becomes the mark. The
+    # action is requested first so nothing that lands between the two reads is skipped
+    requests = []
+    for board_id in board_ids:
+        requests.append((f"{BOARDS_PATH}/{board_id}/actions", {"limit": 1, "fields": "date"}))
+        requests.append((f"{BOARDS_PATH}/{board_id}", BOARD_DETAILS_QUERY))
+    responses = batcher.get_many(requests)
+    results = []
+    for number, board_id in enumerate(board_ids):
+        (feed_status, actions), (board_status, data) = responses[2 * number : 2 * number + 2]
+        if board_status != 200 or feed_status != 200:
+            error = board_status if board_status != 200 else feed_status
+            results.append(SyncResult(board_id, FAILED, error=error))
+            continue
+        cache.put(board_cache_key(board_id), parse_board_details(data))
+        cache.put(board_sync_key(board_id), _mark(actions[0] if actions else None))
+        results.append(SyncResult(board_id, FULL))
+    return results
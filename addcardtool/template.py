@@ -0,0 +1,401 @@
+import json
+from dataclasses import dataclass, field
+from functools import partial
+
+from .batch import Batcher
+from .bulk import DEFAULT_WORKERS, run_bounded
+from .cache import get_cache
+from .client import TrelloAPIError, get_client
+from .models import Board
+from .program import (
+    BOARDS_CACHE_KEY,
+    BOARDS_PATH,
+    create_new_board,
+    create_new_label,
+    create_new_list,
+    iter_user_boards,
+    update_label_color,
+    update_list_position,
+)
+from .resolver import DEFAULT_LABEL_COLOR, NameIndex
+
+# Distance Trello leaves between the positions of neighbouring lists
+LIST_POSITION_STEP = 65536
+
+# Board query for reconciling: open lists with their positions and every label
+TEMPLATE_BOARD_QUERY = {
+    "fields": "name",
+    "lists": "open",
+    "list_fields": "name,pos",
+    "labels": "all",
+    "label_fields": "name,color",
+}
+
+# Kinds of change a template can make
+CREATE_BOARD = "create board"
+CREATE_LIST = "create list"
+MOVE_LIST = "move list"
+CREATE_LABEL = "create label"
+RECOLOR_LABEL = "recolor label"
+
+
+class TemplateError(Exception):
+    """Raised when a template file cannot be read or does not describe boards"""
+
+
+"""
+A label a template wants on a board
+
+Attributes:
+    - name: Name of the label
+    - color: Color of the label (None keeps the color of an existing label)
+"""
+
+
+@dataclass
+class LabelSpec:
+    name: str
+    color: str = None
+
+
+"""
+A board as described by a template
+
+Attributes:
+    - name: Name (or ID) of the board
+    - desc: Description used when the board is created
+    - lists: Names of the lists the board should have, in board order
+    - labels: LabelSpec objects for the labels the board should have
+"""
+
+
+@dataclass
+class BoardSpec:
+    name: str
+    desc: str = ""
+    lists: list = field(default_factory=list)
+    labels: list = field(default_factory=list)
+
+
+"""
+One mutation needed to make a board match its template
+
+Attributes:
+    - board: Name of the board the change is made on
+    - action: Kind of change (CREATE_BOARD, CREATE_LIST, MOVE_LIST, CREATE_LABEL or
+      RECOLOR_LABEL)
+    - name: Name of the board, list or label changed
+    - send: Function making the change, returning None if it failed (None for a dry run)
+"""
+
+
+@dataclass
+class Change:
+    board: str
+    action: str
+    name: str
+    send: object = field(default=None, repr=False, compare=False)
+
+
+"""
+Outcome of applying one change
+
+Attributes:
+    - change: The Change that was applied
+    - error: Error message if the change was not made, None if it was
+"""
+
+
+@dataclass
+class ChangeResult:
+    change: Change
+    error: str = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _name(item, kind, where):
+    # Lists and labels may be given as a bare name or as a mapping with a name
+    if isinstance(item, dict):
+        item = item.get("name")
+    if not isinstance(item, str) or not item.strip():
+        raise TemplateError(f"{kind} without a name in {where}")
+    return item.strip()
+
+
+def _parse_board(data, number):
+    if not isinstance(data, dict):
+        raise TemplateError(f"Board {number} is not a mapping")
+    name = _name(data, "Board", f"board {number}")
+    lists = [_name(item, "List", name) for item in data.get("lists") or []]
+    labels = []
+    for item in data.get("labels") or []:
+        color = item.get("color") if isinstance(item, dict) else None
+        labels.append(LabelSpec(_name(item, "Label", name), color))
+    for kind, names in (("list", lists), ("label", [label.name for label in labels])):
+        duplicates = sorted({item for item in names if names.count(item) > 1})
+        if duplicates:
+            raise TemplateError(f"Board {name} names the {kind} {duplicates[0]} twice")
+    return BoardSpec(name, str(data.get("desc") or ""), lists, labels)
+
+
+"""
+Function to turn the parsed contents of a template into board specs. A template is a
+mapping with a boards list, a list of boards, or a single board. Each board has a name, an
+optional desc, lists (names in board order) and labels (names, or mappings with a name and
+a color).
+
+Parameters:
+    - data: Parsed YAML or JSON template
+
+Returns:
+    - List of BoardSpec objects
+"""
+
+
+def parse_template(data):
+    if isinstance(data, dict) and "boards" in data:
+        data = data["boards"]
+    elif isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or not data:
+        raise TemplateError("Template does not describe any boards")
+    specs = [_parse_board(board, number) for number, board in enumerate(data, start=1)]
+    names = [spec.name for spec in specs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise TemplateError(f"Template describes the board {duplicates[0]} twice")
+    return specs
+
+
+"""
+Function to read a template file. JSON files are read with the standard library; anything
+else is read as YAML, which needs PyYAML.
+
+Parameters:
+    - path: Path of the template file
+
+Returns:
+    - List of BoardSpec objects
+"""
+
+
+def load_template(path):
+    try:
+        with open(path, encoding="utf-8") as file:
+            if path.lower().endswith(".json"):
+                data = json.load(file)
+            else:
+                try:
+                    import yaml
+                except ImportError:
+                    raise TemplateError(
+                        "Reading YAML templates needs PyYAML (pip install pyyaml); "
+                        "JSON templates work without it"
+                    )
+                data = yaml.safe_load(file)
+    except OSError as error:
+        raise TemplateError(f"Unable to read template: {error}")
+    except ValueError as error:
+        # json.JSONDecodeError and yaml.YAMLError (through MarkedYAMLError) both land here
+        raise TemplateError(f"Unable to parse template {path}: {error}")
+    return parse_template(data)
+
+
+def _increasing_run(positions):
+    # Indexes of a longest run of strictly increasing positions (None entries are skipped).
+    # Lists at these indexes are already in template order and can stay where they are
+    indexes = [i for i, pos in enumerate(positions) if pos is not None]
+    best = {}
+    for n, i in enumerate(indexes):
+        previous = [j for j in indexes[:n] if positions[j] < positions[i]]
+        parent = max(previous, key=lambda j: len(best[j]), default=None)
+        best[i] = (best[parent] if parent is not None else []) + [i]
+    return set(max(best.values(), key=len, default=[]))
+
+
+"""
+Function to work out which lists have to be created or moved for a board's lists to appear
+in template order. Lists already in the right relative order are left alone; the others
+are placed between their neighbours. Lists on the board the template does not name are not
+touched.
+
+Parameters:
+    - wanted: Names of the lists in template order
+    - existing: Dictionary of list name to (list ID, position) for the board's open lists
+
+Returns:
+    - List of (name, list ID or None if the list has to be created, new position) tuples
+"""
+
+
+def plan_list_positions(wanted, existing):
+    current = [existing[name][1] if name in existing else None for name in wanted]
+    kept = _increasing_run(current)
+    placed = []
+    left = 0.0
+    run = []
+    for i, name in enumerate(wanted + [None]):
+        if name is not None and i not in kept:
+            run.append(name)
+            continue
+        right = current[i] if name is not None else None
+        for k, run_name in enumerate(run, start=1):
+            if right is None:
+                pos = left + LIST_POSITION_STEP * k
+            else:
+                pos = left + (right - left) * k / (len(run) + 1)
+            list_id = existing[run_name][0] if run_name in existing else None
+            placed.append((run_name, list_id, pos))
+        run = []
+        left = right if right is not None else left
+    return placed
+
+
+"""
+Function to list the changes that make a board match its spec
+
+Parameters:
+    - spec: BoardSpec of the board
+    - board_id: ID of the board (None for a board that is still to be created)
+    - state: Board with its open lists (with positions) and labels, None for a new board
+
+Returns:
+    - List of Change objects (without send functions when board_id is None)
+"""
+
+
+def plan_board(spec, board_id, state=None):
+    existing = {}
+    by_name = {}
+    if state is not None:
+        for item in state.lists:
+            existing.setdefault(item.name, (item.id, item.pos or 0.0))
+        for label in state.labels:
+            by_name.setdefault(label.name, label)
+
+    def bound(function, *args):
+        return partial(function, board_id, *args) if board_id else None
+
+    changes = []
+    for name, list_id, pos in plan_list_positions(spec.lists, existing):
+        if list_id is None:
+            changes.append(Change(spec.name, CREATE_LIST, name, bound(create_new_list, name, pos)))
+        else:
+            changes.append(
+                Change(spec.name, MOVE_LIST, name, bound(update_list_position, list_id, pos))
+            )
+    for label in spec.labels:
+        current = by_name.get(label.name)
+        if current is None:
+            color = label.color or DEFAULT_LABEL_COLOR
+            send = bound(create_new_label, label.name, color)
+            changes.append(Change(spec.name, CREATE_LABEL, label.name, send))
+        elif label.color and label.color != current.color:
+            changes.append(
+                Change(
+                    spec.name,
+                    RECOLOR_LABEL,
+                    label.name,
+                    bound(update_label_color, current.id, label.color),
+                )
+            )
+    return changes
+
+
+def _fetch_states(board_ids):
+    # Fetch the lists and labels of every board, ten boards per /batch round trip
+    results = Batcher().get_many(
+        [(f"{BOARDS_PATH}/{board_id}", TEMPLATE_BOARD_QUERY) for board_id in board_ids]
+    )
+    states = {}
+    for board_id, (status_code, data) in zip(board_ids, results):
+        states[board_id] = Board.from_json(data) if status_code == 200 else status_code
+    return states
+
+
+def _create_board(spec, created):
+    board_id = create_new_board(spec.name, spec.desc, defaults=False)
+    if board_id is not None:
+        created[spec.name] = board_id
+    return board_id
+
+
+def _apply(change):
+    try:
+        if change.send() is None:
+            return ChangeResult(change, f"Unable to {change.action}")
+    except OSError as error:
+        return ChangeResult(change, f"Unable to {change.action}: {error}")
+    return ChangeResult(change)
+
+
+"""
+Function to make Trello match a template. The user's boards are listed once and the lists
+and labels of every existing board are read through /batch; only the changes needed are
+then made, concurrently, through the shared client's rate limiter. A board that does not
+exist is created without Trello's default lists and labels before its own changes are made.
+
+Parameters:
+    - specs: BoardSpec objects to apply
+    - workers: Number of changes made concurrently
+    - dry_run: Only report the changes that would be made
+
+Returns:
+    - Generator of ChangeResult objects, board creations first
+"""
+
+
+def apply_template(specs, workers=DEFAULT_WORKERS, dry_run=False):
+    # Read the board list fresh so a board made since the cache was filled is not duplicated
+    get_cache(get_client().api_token).invalidate(BOARDS_CACHE_KEY)
+    try:
+        index = NameIndex("Board", iter_user_boards())
+    except TrelloAPIError as error:
+        raise TemplateError(f"Unable to get boards ({error.status_code})")
+
+    existing = {}
+    missing = []
+    for spec in specs:
+        matches = index.find(spec.name)
+        if len(matches) > 1:
+            ids = ", ".join(board.id for board in matches)
+            error = f"Board name is ambiguous: {spec.name} matches {ids} (use the ID instead)"
+            yield ChangeResult(Change(spec.name, CREATE_BOARD, spec.name), error)
+        elif matches:
+            existing[spec.name] = matches[0].id
+        else:
+            missing.append(spec)
+
+    # New boards have to exist before anything can be added to them
+    created = {}
+    creations = []
+    for spec in missing:
+        send = None
+        if not dry_run:
+            send = partial(_create_board, spec, created)
+        creations.append(Change(spec.name, CREATE_BOARD, spec.name, send))
+    if dry_run:
+        yield from (ChangeResult(change) for change in creations)
+    else:
+        yield from run_bounded(creations, workers, _apply)
+
+    states = _fetch_states(list(existing.values()))
+    changes = []
+    for spec in specs:
+        if spec.name in existing:
+            state = states[existing[spec.name]]
+            if not isinstance(state, Board):
+                change = Change(spec.name, "read board", spec.name)
+                yield ChangeResult(change, f"Unable to get lists and labels ({state})")
+                continue
+            changes += plan_board(spec, None if dry_run else state.id, state)
+        elif dry_run or spec.name in created:
+            changes += plan_board(spec, created.get(spec.name))
+
+    if dry_run:
+        yield from (ChangeResult(change) for change in changes)
+    else:
+        yield from run_bounded(changes, workers, _apply)
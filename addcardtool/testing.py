@@ -0,0 +1,390 @@
+import email.parser
+import email.policy
+import hashlib
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def parse_body(content_type, body):
+    # Form fields of a urlencoded or multipart body. Uploaded files are returned as
+    # (file name, content type, bytes) tuples under their field name
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return {key: values[-1] for key, values in parse_qs(body.decode()).items()}
+    if content_type.startswith("multipart/form-data"):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            data = part.get_payload(decode=True)
+            if part.get_filename() is None:
+                fields[name] = data.decode()
+            else:
+                fields[name] = (part.get_filename(), part.get_content_type(), data)
+        return fields
+    return {}
+
+
+def project(item, fields=None):
+    # Keep only the requested fields of an object, like Trello's fields parameter
+    if not fields:
+        return dict(item)
+    keep = {"id"} | set(fields.split(","))
+    return {key: value for key, value in item.items() if key in keep}
+
+
+"""
+In-process stand-in for the parts of the Trello API used by addcardtool. State lives in
+plain dictionaries so tests can seed boards, lists and labels and inspect created cards.
+It is shared by the tests and the benchmarks.
+
+Parameters:
+    - latency: Seconds every request is held before it is answered
+    - payload_size: Bytes of filler added to every object, standing in for the many fields
+      Trello returns that the tool does not use (dropped when fields are projected)
+    - throttle_every: Answer every Nth request with a 429 (0 never does)
+"""
+
+
+class MockTrello:
+    def __init__(self, latency=0.0, payload_size=0, throttle_every=0):
+        self.latency = latency
+        self.payload_size = payload_size
+        self.throttle_every = throttle_every
+        self.served = 0
+        self.boards = {}
+        self.lists = {}
+        self.labels = {}
+        self.cards = {}
+        self.attachments = {}
+        self.actions = []
+        self.requests = []
+        self.urls = []
+        self.connections = 0
+        self.throttle = 0
+        self.retry_after = "0"
+        # Answer the next N requests with a 502 after handling them, like a proxy that lost
+        # Trello's response
+        self.fail = 0
+        # Answer the next N requests with a 503 without handling them, like Trello being down
+        self.unavailable = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    def new_id(self, prefix):
+        with self._lock:
+            return f"{prefix}{next(self._ids):022d}"
+
+    def add_board(self, name, desc=""):
+        board_id = self.new_id("b")
+        self.boards[board_id] = self.padded(
+            {"id": board_id, "name": name, "desc": desc, "closed": False}
+        )
+        return board_id
+
+    def add_list(self, board_id, name, pos=None):
+        list_id = self.new_id("l")
+        if pos is None:
+            # At the end of the board, spaced the way Trello spaces lists
+            positions = [l["pos"] for l in self.lists.values() if l["idBoard"] == board_id]
+            pos = max(positions, default=0) + 65536
+        self.lists[list_id] = self.padded(
+            {"id": list_id, "name": name, "idBoard": board_id, "closed": False, "pos": pos}
+        )
+        self.record_action("createList", board_id, list={"id": list_id, "name": name, "pos": pos})
+        return list_id
+
+    def update_list(self, list_id, **changes):
+        item = self.lists[list_id]
+        old = {key: item[key] for key in changes}
+        item.update(changes)
+        data = {"id": list_id, "name": item["name"], **changes}
+        self.record_action("updateList", item["idBoard"], list=data, old=old)
+        return item
+
+    def board_lists(self, board_id):
+        # Open lists of a board in position order
+        lists = [l for l in self.lists.values() if l["idBoard"] == board_id and not l["closed"]]
+        return sorted(lists, key=lambda l: l["pos"])
+
+    def add_label(self, board_id, name, color):
+        label_id = self.new_id("a")
+        self.labels[label_id] = self.padded(
+            {"id": label_id, "name": name, "color": color, "idBoard": board_id}
+        )
+        self.record_action(
+            "createLabel", board_id, label={"id": label_id, "name": name, "color": color}
+        )
+        return label_id
+
+    def update_label(self, label_id, **changes):
+        label = self.labels[label_id]
+        label.update(changes)
+        self.record_action("updateLabel", label["idBoard"], label={"id": label_id, **changes})
+        return label
+
+    def delete_label(self, label_id):
+        label = self.labels.pop(label_id)
+        self.record_action("deleteLabel", label["idBoard"], label={"id": label_id})
+
+    def update_card(self, card_id, **changes):
+        card = self.cards[card_id]
+        card.update(changes)
+        self.record_action(
+            "updateCard", card["idBoard"], card={"id": card_id, "name": card["name"], **changes}
+        )
+        return card
+
+    def record_action(self, action_type, board_id, **data):
+        # Append to the board's action feed the way Trello logs every change
+        action_id = self.new_id("x")
+        self.actions.append(
+            {
+                "id": action_id,
+                "idBoard": board_id,
+                "type": action_type,
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+                "data": data,
+            }
+        )
+
+    def board_actions(self, board_id, query):
+        # Newest actions first, filtered by type and limited like Trello's actions route
+        actions = [a for a in reversed(self.actions) if a["idBoard"] == board_id]
+        if query.get("filter"):
+            types = set(query["filter"].split(","))
+            actions = [a for a in actions if a["type"] in types]
+        if query.get("since"):
+            actions = [a for a in actions if a["id"] > query["since"]]
+        actions = actions[: int(query.get("limit", 50))]
+        return [project(a, query.get("fields")) for a in actions]
+
+    def padded(self, item):
+        if self.payload_size:
+            item["prefs"] = "x" * self.payload_size
+        return item
+
+    def board_with_nested(self, board_id, query):
+        board = project(self.boards[board_id], query.get("fields"))
+        if query.get("lists") == "open":
+            board["lists"] = [
+                project(l, query.get("list_fields")) for l in self.board_lists(board_id)
+            ]
+        if query.get("labels") == "all":
+            board["labels"] = [
+                project(l, query.get("label_fields"))
+                for l in self.labels.values()
+                if l["idBoard"] == board_id
+            ]
+        return board
+
+    def member_boards(self, query):
+        # Newest boards first, paged backwards with before=<id> like Trello's list routes
+        boards = sorted(self.boards.values(), key=lambda board: board["id"], reverse=True)
+        if query.get("filter") == "open":
+            boards = [board for board in boards if not board["closed"]]
+        if "before" in query:
+            boards = [board for board in boards if board["id"] < query["before"]]
+        if "limit" in query:
+            boards = boards[: int(query["limit"])]
+        return [project(board, query.get("fields")) for board in boards]
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/1/"
+
+    def start(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(self))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def handle(self, method, path, query):
+        parts = [part for part in path.split("/") if part][1:]
+        if method == "GET" and parts == ["batch"]:
+            results = []
+            for route in query["urls"].split(","):
+                route_url = urlparse(route)
+                route_query = {k: v[-1] for k, v in parse_qs(route_url.query).items()}
+                status, payload = self.handle("GET", f"/1{route_url.path}", route_query)
+                results.append({"200": payload} if status == 200 else {"statusCode": status})
+            return 200, results
+        if method == "GET" and parts == ["members", "me", "boards"]:
+            return 200, self.member_boards(query)
+        if parts[:1] == ["boards"] and len(parts) == 1 and method == "POST":
+            board_id = self.add_board(query["name"], query.get("desc", ""))
+            return 200, self.boards[board_id]
+        if parts[:1] == ["boards"] and len(parts) >= 2:
+            board_id = parts[1]
+            if board_id not in self.boards:
+                return 404, {"message": "board not found"}
+            if len(parts) == 2:
+                return 200, self.board_with_nested(board_id, query)
+            if parts[2] == "cards" and method == "GET":
+                cards = [
+                    c
+                    for c in self.cards.values()
+                    if c["idBoard"] == board_id and not c.get("closed")
+                ]
+                return 200, [project(c, query.get("fields")) for c in cards]
+            if parts[2] == "actions" and method == "GET":
+                return 200, self.board_actions(board_id, query)
+            if parts[2] == "lists" and method == "GET":
+                return 200, [project(l, query.get("fields")) for l in self.board_lists(board_id)]
+            if parts[2] == "lists" and method == "POST":
+                pos = float(query["pos"]) if "pos" in query else None
+                return 200, self.lists[self.add_list(board_id, query["name"], pos)]
+            if parts[2] == "labels" and method == "GET":
+                labels = [l for l in self.labels.values() if l["idBoard"] == board_id]
+                return 200, [project(l, query.get("fields")) for l in labels]
+            if parts[2] == "labels" and method == "POST":
+                label_id = self.add_label(board_id, query["name"], query["color"])
+                return 200, self.labels[label_id]
+        if parts[:1] == ["lists"] and len(parts) == 2 and method == "PUT":
+            if parts[1] not in self.lists:
+                return 404, {"message": "list not found"}
+            changes = {key: query[key] for key in ("name", "pos", "closed") if key in query}
+            if "pos" in changes:
+                changes["pos"] = float(changes["pos"])
+            if "closed" in changes:
+                changes["closed"] = changes["closed"] == "true"
+            return 200, self.update_list(parts[1], **changes)
+        if parts[:1] == ["labels"] and len(parts) == 2 and method == "PUT":
+            if parts[1] not in self.labels:
+                return 404, {"message": "label not found"}
+            changes = {key: query[key] for key in ("name", "color") if key in query}
+            return 200, self.update_label(parts[1], **changes)
+        if parts[:1] == ["lists"] and parts[2:] == ["cards"] and method == "GET":
+            cards = [c for c in self.cards.values() if c["idList"] == parts[1]]
+            return 200, [project(c, query.get("fields")) for c in cards]
+        if parts[:1] == ["cards"] and parts[2:] == ["attachments"] and method == "POST":
+            if parts[1] not in self.cards:
+                return 404, {"message": "card not found"}
+            file_name, mime_type, data = query["file"]
+            attachment_id = self.new_id("a")
+            self.attachments[attachment_id] = {
+                "id": attachment_id,
+                "idCard": parts[1],
+                "name": query.get("name") or file_name,
+                "fileName": file_name,
+                "mimeType": mime_type,
+                "bytes": len(data),
+                "sha256": hashlib.sha256(data).hexdigest(),
+            }
+            return 200, self.attachments[attachment_id]
+        if parts == ["cards"] and method == "POST":
+            if query.get("idList") not in self.lists:
+                return 400, {"message": "invalid value for idList"}
+            card_id = self.new_id("c")
+            labels = [l for l in query.get("idLabels", "").split(",") if l]
+            card = self.padded(
+                {
+                    "id": card_id,
+                    "name": query.get("name", ""),
+                    "desc": query.get("desc", ""),
+                    "idList": query["idList"],
+                    "idBoard": self.lists[query["idList"]]["idBoard"],
+                    "idLabels": labels,
+                    "shortUrl": f"https://trello.com/c/{card_id[-8:]}",
+                }
+            )
+            self.cards[card_id] = card
+            # Like Trello, the action carries the card's name but not its description
+            self.record_action(
+                "createCard",
+                card["idBoard"],
+                card={"id": card_id, "name": card["name"]},
+                list={"id": card["idList"]},
+            )
+            return 200, card
+        return 404, {"message": "not found"}
+
+
+def _make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Send headers and body in one write; separate small writes stall on delayed ACKs
+        wbufsize = 64 * 1024
+
+        def setup(self):
+            super().setup()
+            with mock._lock:
+                mock.connections += 1
+
+        def log_message(self, format, *args):
+            pass
+
+        def _dispatch(self, method):
+            url = urlparse(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                body = self.rfile.read(length)
+                query.update(parse_body(self.headers.get("Content-Type") or "", body))
+            mock.urls.append(self.path)
+            mock.requests.append((method, url.path, query))
+            if mock.latency:
+                time.sleep(mock.latency)
+            headers = {}
+            with mock._lock:
+                mock.served += 1
+                throttled = mock.throttle > 0 or (
+                    mock.throttle_every > 0 and mock.served % mock.throttle_every == 0
+                )
+                mock.throttle -= 1 if mock.throttle > 0 else 0
+                failed = mock.fail > 0 and not throttled
+                mock.fail -= 1 if failed else 0
+                unavailable = mock.unavailable > 0 and not throttled
+                mock.unavailable -= 1 if unavailable else 0
+            if throttled:
+                status, payload = 429, {"message": "API_TOKEN_LIMIT_EXCEEDED"}
+                headers["Retry-After"] = mock.retry_after
+            elif unavailable:
+                status, payload = 503, {"message": "Service Unavailable"}
+            else:
+                status, payload = mock.handle(method, url.path, query)
+            if failed:
+                status, payload = 502, {"message": "Bad Gateway"}
+            body = json.dumps(payload).encode()
+            if method == "GET" and status == 200:
+                etag = f'"{hashlib.md5(body).hexdigest()}"'
+                headers["ETag"] = etag
+                if self.headers.get("If-None-Match") == etag:
+                    status, body = 304, b""
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def do_PUT(self):
+            self._dispatch("PUT")
+
+    return Handler
@@ -0,0 +1,423 @@
+import json
+import math
+import os
+import socket
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+
+# Path segments that are followed by an object ID in Trello API paths
+ID_COLLECTIONS = {"actions", "boards", "cards", "checklists", "labels", "lists", "members"}
+
+# Sub-buckets per power of two in a latency histogram; 128 keeps every recorded value
+# within 1% of its true value
+HISTOGRAM_SUB_BUCKETS = 128
+
+# Width in characters of the waterfall bars
+WATERFALL_WIDTH = 40
+
+# Characters used for each phase of a request in the waterfall
+WATERFALL_PHASES = (
+    ("queued", "."),
+    ("dns", "d"),
+    ("connect", "c"),
+    ("tls", "t"),
+    ("server", "="),
+    ("transfer", "#"),
+)
+
+# OpenTelemetry span kind for an outgoing request
+OTEL_SPAN_KIND_CLIENT = 3
+
+# Connection timings of the request being sent on each thread
+_connection_timings = threading.local()
+
+
+"""
+Function to turn an API path into the endpoint it calls, with object IDs replaced so
+requests to the same endpoint for different boards or lists are grouped together
+
+Parameters:
+    - path: API path, e.g. boards/5f1c.../lists
+
+Returns:
+    - Endpoint template, e.g. boards/{id}/lists
+"""
+
+
+def endpoint_template(path):
+    parts = [part for part in path.split("?")[0].split("/") if part]
+    for index in range(1, len(parts)):
+        if parts[index - 1] in ID_COLLECTIONS and parts[index] not in ("me", "batch"):
+            parts[index] = "{id}"
+    return "/".join(parts)
+
+
+"""
+One request sent to the Trello API. Phase durations are in seconds; connection phases are
+zero when a kept-alive connection was reused.
+
+Attributes:
+    - method: HTTP method
+    - endpoint: Endpoint template the request was sent to
+    - status_code: Status of the final response (None if no response arrived)
+    - start: Wall clock time the request started, in seconds since the epoch
+    - duration: Total time spent in the request, including rate limiter waits
+    - queued: Time spent waiting for the rate limiter
+    - dns, connect, tls: Time spent resolving, connecting and in the TLS handshake
+    - server: Time between sending the request and receiving the response headers
+    - transfer: Time spent reading the response body
+    - bytes_sent: Size of the request body
+    - bytes_received: Size of the response body
+    - retries: Number of times the request was sent again after a connection or server error
+    - throttled: Number of 429 responses received before the final response
+    - span_id, trace_id: IDs used when the span is exported
+"""
+
+
+@dataclass
+class Span:
+    method: str
+    endpoint: str
+    status_code: int = None
+    start: float = 0.0
+    duration: float = 0.0
+    queued: float = 0.0
+    dns: float = 0.0
+    connect: float = 0.0
+    tls: float = 0.0
+    server: float = 0.0
+    transfer: float = 0.0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    retries: int = 0
+    throttled: int = 0
+    span_id: str = field(default_factory=lambda: os.urandom(8).hex())
+    trace_id: str = ""
+
+
+"""
+Latency histogram with logarithmic buckets in the style of HdrHistogram. Every power of two
+is split into HISTOGRAM_SUB_BUCKETS linear buckets, so recording is constant time, memory
+grows with the range of values rather than their number, and percentiles keep a fixed
+relative precision.
+"""
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _bucket(self, micros):
+        if micros < HISTOGRAM_SUB_BUCKETS:
+            return micros
+        exponent = micros.bit_length() - HISTOGRAM_SUB_BUCKETS.bit_length()
+        return exponent * HISTOGRAM_SUB_BUCKETS + (micros >> exponent)
+
+    def _bucket_value(self, bucket):
+        # Upper bound in microseconds of the values in a bucket
+        if bucket < HISTOGRAM_SUB_BUCKETS:
+            return bucket
+        exponent = bucket // HISTOGRAM_SUB_BUCKETS - 1
+        return ((bucket % HISTOGRAM_SUB_BUCKETS + HISTOGRAM_SUB_BUCKETS + 1) << exponent) - 1
+
+    def record(self, seconds):
+        micros = max(0, int(seconds * 1_000_000))
+        bucket = self._bucket(micros)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        # Return the latency in seconds at or below which percent of the values fall
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self._bucket_value(bucket) / 1_000_000, self.max)
+        return self.max
+
+
+"""
+Collects a Span for every request sent by a client and keeps a latency histogram per
+endpoint. It is safe to share between threads.
+"""
+
+
+class Tracer:
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans = []
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, span):
+        span.trace_id = self.trace_id
+        with self.lock:
+            self.spans.append(span)
+            key = f"{span.method} {span.endpoint}"
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(span.duration)
+
+    def waterfall(self, width=WATERFALL_WIDTH):
+        # Return the requests as text lines, one bar per request on a shared time axis
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        if not spans:
+            return ["No requests were sent"]
+        started = spans[0].start
+        total = max(span.start + span.duration for span in spans) - started or 1e-9
+        scale = width / total
+        lines = []
+        for span in spans:
+            offset = int((span.start - started) * scale)
+            bar = "".join(
+                character * round(getattr(span, phase) * scale)
+                for phase, character in WATERFALL_PHASES
+            )
+            bar = (" " * offset + (bar or "=")).ljust(width)[: max(width, offset + 1)]
+            extra = f" retries={span.retries}" if span.retries else ""
+            extra += f" throttled={span.throttled}" if span.throttled else ""
+            lines.append(
+                f"{(span.start - started) * 1000:8.1f}ms |{bar}| {span.duration * 1000:7.1f}ms "
+                f"{span.status_code or '---'} {span.method} {span.endpoint} "
+                f"{span.bytes_received}B{extra}"
+            )
+        legend = " ".join(f"{character}={phase}" for phase, character in WATERFALL_PHASES)
+        lines.append(f"{'':10} {legend}")
+        return lines
+
+    def summary(self):
+        # Return one line per endpoint with its request count and latency percentiles
+        lines = [f"{'endpoint':40} {'count':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"]
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+        for key, histogram in histograms:
+            lines.append(
+                f"{key:40} {histogram.count:6d} "
+                + " ".join(
+                    f"{value * 1000:7.1f}ms"
+                    for value in (
+                        histogram.percentile(50),
+                        histogram.percentile(90),
+                        histogram.percentile(99),
+                        histogram.max,
+                    )
+                )
+            )
+        return lines
+
+    def to_json(self):
+        with self.lock:
+            return {
+                "trace_id": self.trace_id,
+                "spans": [asdict(span) for span in self.spans],
+                "endpoints": {
+                    key: {
+                        "count": histogram.count,
+                        "mean": histogram.mean,
+                        "p50": histogram.percentile(50),
+                        "p90": histogram.percentile(90),
+                        "p99": histogram.percentile(99),
+                        "max": histogram.max,
+                    }
+                    for key, histogram in self.histograms.items()
+                },
+            }
+
+    def to_otlp(self, service_name="addcardtool"):
+        # Return the spans in the OpenTelemetry OTLP/JSON trace format
+        with self.lock:
+            spans = [_otlp_span(span) for span in self.spans]
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+                    "scopeSpans": [{"scope": {"name": "addcardtool.tracing"}, "spans": spans}],
+                }
+            ]
+        }
+
+    def export(self, path, file_format="json"):
+        # Write the trace to a file as plain JSON or OTLP/JSON
+        data = self.to_otlp() if file_format == "otlp" else self.to_json()
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2)
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return {"key": key, "value": {"stringValue": str(value)}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    return {"key": key, "value": {"doubleValue": value}}
+
+
+def _otlp_span(span):
+    start = int(span.start * 1_000_000_000)
+    attributes = {
+        "http.request.method": span.method,
+        "url.template": span.endpoint,
+        "http.request.body.size": span.bytes_sent,
+        "http.response.body.size": span.bytes_received,
+        "http.request.resend_count": span.retries + span.throttled,
+    }
+    if span.status_code is not None:
+        attributes["http.response.status_code"] = span.status_code
+    for phase, _ in WATERFALL_PHASES:
+        attributes[f"addcardtool.{phase}_ms"] = getattr(span, phase) * 1000
+    return {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": f"{span.method} {span.endpoint}",
+        "kind": OTEL_SPAN_KIND_CLIENT,
+        "startTimeUnixNano": str(start),
+        "endTimeUnixNano": str(start + int(span.duration * 1_000_000_000)),
+        "attributes": [_otlp_attribute(key, value) for key, value in attributes.items()],
+        # OTLP status codes: 1 is ok, 2 is error
+        "status": {"code": 1 if span.status_code and span.status_code < 400 else 2},
+    }
+
+
+"""
+Function to fill in a span from the response of the request it describes
+
+Parameters:
+    - span: Span of the request
+    - response: requests Response of the final attempt (None if the request failed)
+    - started: perf_counter value when the request started
+    - sent: perf_counter value when the final attempt was sent
+    - stream: True if the response body has not been read yet
+
+Returns:
+    - The completed span
+"""
+
+
+def complete_span(span, response, started, sent, stream=False):
+    now = time.perf_counter()
+    span.duration = now - started
+    span.dns, span.connect, span.tls = connection_timings()
+    if response is None:
+        return span
+    span.status_code = response.status_code
+    elapsed = response.elapsed.total_seconds()
+    span.server = max(0.0, elapsed - span.dns - span.connect - span.tls)
+    span.transfer = max(0.0, now - sent - elapsed)
+    # requests sets Content-Length for streamed bodies of known length too, such as a
+    # MultipartStream upload
+    span.bytes_sent = int(response.request.headers.get("Content-Length") or 0)
+    if stream:
+        span.bytes_received = int(response.headers.get("Content-Length") or 0)
+    else:
+        span.bytes_received = len(response.content)
+    retries = getattr(response.raw, "retries", None)
+    span.retries = len(retries.history) if retries is not None else 0
+    return span
+
+
+def reset_connection_timings():
+    _connection_timings.dns = 0.0
+    _connection_timings.connect = 0.0
+    _connection_timings.tls = 0.0
+
+
+def connection_timings():
+    # Return the DNS, connect and TLS times of connections opened by this thread since the
+    # last reset
+    return (
+        getattr(_connection_timings, "dns", 0.0),
+        getattr(_connection_timings, "connect", 0.0),
+        getattr(_connection_timings, "tls", 0.0),
+    )
+
+
+def _add_timing(name, seconds):
+    setattr(_connection_timings, name, getattr(_connection_timings, name, 0.0) + seconds)
+
+
+"""
+Function to build connection pool classes whose connections record how long name
+resolution, the TCP connect and the TLS handshake took. urllib3 is imported here so the
+classes are only built when tracing is turned on.
+
+Returns:
+    - Dictionary of URL scheme to connection pool class, as used by urllib3's PoolManager
+"""
+
+
+def traced_pool_classes():
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class TracedConnectionMixin:
+        def _new_conn(self):
+            # Resolve the host first so name resolution is timed apart from the connect
+            host = self._dns_host
+            started = time.perf_counter()
+            try:
+                address = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)[0][4][0]
+            except OSError:
+                address = host
+            resolved = time.perf_counter()
+            _add_timing("dns", resolved - started)
+            self._dns_host = address
+            try:
+                sock = super()._new_conn()
+            except Exception:
+                if address == host:
+                    raise
+                # Fall back to letting urllib3 try every address of the host
+                self._dns_host = host
+                sock = super()._new_conn()
+            finally:
+                self._dns_host = host
+            _add_timing("connect", time.perf_counter() - resolved)
+            return sock
+
+        def connect(self):
+            before = connection_timings()
+            started = time.perf_counter()
+            super().connect()
+            after = connection_timings()
+            # Whatever connect spent outside of _new_conn was the TLS handshake
+            opened = (after[0] - before[0]) + (after[1] - before[1])
+            if isinstance(self, HTTPSConnection):
+                _add_timing("tls", max(0.0, time.perf_counter() - started - opened))
+
+    class TracedHTTPConnection(TracedConnectionMixin, HTTPConnection):
+        pass
+
+    class TracedHTTPSConnection(TracedConnectionMixin, HTTPSConnection):
+        pass
+
+    class TracedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TracedHTTPConnection
+
+    class TracedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TracedHTTPSConnection
+
+    return {"http": TracedHTTPConnectionPool, "https": TracedHTTPSConnectionPool}
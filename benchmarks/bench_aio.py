@@ -0,0 +1,73 @@
+"""
+Compares card creation throughput of the synchronous client (driven by a thread pool) with
+the asyncio client against the local mock Trello server.
+
+Run from the repository root:
+    python -m benchmarks.bench_aio --cards 1000 --concurrency 50 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from addcardtool import program
+from addcardtool.aio import AsyncTrelloClient
+from addcardtool.client import TrelloClient, set_client
+from addcardtool.testing import MockTrello
+from benchmarks.scenarios import unlimited
+
+
+def bench_sync(mock, list_id, cards, concurrency):
+    client = TrelloClient(
+        "key", "token", base_url=mock.base_url, pool_size=concurrency, rate_limiter=unlimited()
+    )
+    previous = set_client(client)
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(
+                executor.map(
+                    lambda i: program.create_new_card(list_id, f"Card {i}", "", []),
+                    range(cards),
+                )
+            )
+        return time.perf_counter() - started
+    finally:
+        set_client(previous)
+        client.close()
+
+
+def bench_async(mock, list_id, cards, concurrency):
+    async def run():
+        async with AsyncTrelloClient(
+            "key",
+            "token",
+            base_url=mock.base_url,
+            pool_size=concurrency,
+            max_in_flight=concurrency,
+            rate_limiter=unlimited(),
+        ) as client:
+            started = time.perf_counter()
+            await client.create_cards((list_id, f"Card {i}", "", []) for i in range(cards))
+            return time.perf_counter() - started
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cards", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with MockTrello(latency=args.latency) as mock:
+        list_id = mock.add_list(mock.add_board("Bench"), "Inbox")
+        for name, bench in (("sync", bench_sync), ("async", bench_async)):
+            elapsed = bench(mock, list_id, args.cards, args.concurrency)
+            print(f"{name:>5}: {args.cards} cards in {elapsed:.2f}s ({args.cards / elapsed:.0f} cards/s)")
+
+
+if __name__ == "__main__":
+    main()
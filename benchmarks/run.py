@@ -0,0 +1,170 @@
+"""
+Runs the benchmark scenarios against the local mock Trello server and reports throughput,
+p50/p99 latency and peak RSS for each. Every scenario runs in its own process so peak RSS
+is its own. Results can be stored as a baseline and later runs compared against it; the
+run fails when a scenario is slower or larger than the baseline by more than the tolerance.
+
+Run from the repository root:
+    python -m benchmarks.run
+    python -m benchmarks.run --scenario bulk-import --latency 0.02 --throttle-every 50
+    python -m benchmarks.run --save-baseline
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+
+from benchmarks.scenarios import SCENARIOS
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Relative change from the baseline allowed before a metric counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+# Metrics compared with the baseline, whether a higher value is better and how many times
+# the tolerance they are allowed to move (tail latency is noisier than the rest)
+COMPARED_METRICS = (
+    ("throughput", True, 1),
+    ("p50_ms", False, 1),
+    ("p99_ms", False, 2),
+    ("peak_rss_mb", False, 1),
+)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(name, options):
+    # Run one scenario in this process and return its metrics
+    operations, elapsed, histogram, requests = SCENARIOS[name](options)
+    return {
+        "operations": operations,
+        "requests": requests,
+        "elapsed_s": round(elapsed, 4),
+        "throughput": round(operations / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(histogram.percentile(50) * 1000, 3),
+        "p99_ms": round(histogram.percentile(99) * 1000, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_isolated(name, options):
+    # Run one scenario in a child process so its peak RSS is not shared with the others
+    command = [
+        sys.executable, "-m", "benchmarks.run", "--child", name, "--options", json.dumps(options)
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    # Return a line for every metric that regressed beyond the tolerance
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better, slack in COMPARED_METRICS:
+            current, previous = metrics[metric], base.get(metric)
+            if not previous:
+                continue
+            change = (current - previous) / previous
+            if (-change if higher_is_better else change) > tolerance * slack:
+                regressions.append(
+                    f"{name}: {metric} {previous} -> {current} ({change * 100:+.0f}%)"
+                )
+    return regressions
+
+
+def print_table(results, baseline):
+    base_results = baseline.get("results", {}) if baseline else {}
+    print(
+        f"{'scenario':18} {'ops':>6} {'requests':>8} {'ops/s':>9} {'p50':>9} {'p99':>9} {'rss':>8}"
+    )
+    for name, metrics in results.items():
+        print(
+            f"{name:18} {metrics['operations']:6d} {metrics['requests']:8d} "
+            f"{metrics['throughput']:9.1f} {metrics['p50_ms']:7.2f}ms {metrics['p99_ms']:7.2f}ms "
+            f"{metrics['peak_rss_mb']:6.1f}MB"
+        )
+        base = base_results.get(name)
+        if base:
+            print(
+                f"{'  baseline':18} {base['operations']:6d} {base['requests']:8d} "
+                f"{base['throughput']:9.1f} {base['p50_ms']:7.2f}ms {base['p99_ms']:7.2f}ms "
+                f"{base['peak_rss_mb']:6.1f}MB"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="Scenario to run (repeatable, all by default)",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.005, help="Seconds the mock holds each request"
+    )
+    parser.add_argument(
+        "--payload-size", type=int, default=2048, help="Filler bytes per mock object"
+    )
+    parser.add_argument(
+        "--throttle-every", type=int, default=0, help="Answer every Nth request with a 429"
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file to compare with")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Store the results in the baseline file"
+    )
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--options", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, json.loads(args.options))))
+        return
+
+    options = {
+        "latency": args.latency,
+        "payload_size": args.payload_size,
+        "throttle_every": args.throttle_every,
+    }
+    results = {name: run_isolated(name, options) for name in args.scenario or SCENARIOS}
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline.get("options") != options:
+            print(f"Baseline was recorded with {baseline.get('options')}; not comparing")
+            baseline = None
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        # Scenarios that were not run keep their stored results
+        stored = dict(baseline["results"]) if baseline else {}
+        stored.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump({"options": options, "results": stored}, file, indent=2)
+            file.write("\n")
+        print(f"Baseline written to {args.baseline}")
+    elif baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Repeatable scenarios run by benchmarks.run against the local mock Trello server. Each
+scenario seeds the mock, runs one workload through the same program functions the CLI uses
+and returns how many operations it completed, how long they took and a latency histogram.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from addcardtool import cache, program
+from addcardtool.bulk import CardRow, create_cards
+from addcardtool.client import TrelloClient, set_client
+from addcardtool.ratelimit import RateLimiter, TokenBucket
+from addcardtool.testing import MockTrello
+from addcardtool.tracing import LatencyHistogram, Tracer
+
+# Iterations of the interactive flow per run
+INTERACTIVE_RUNS = 30
+
+# Cards created by the bulk import scenario and the boards they are spread over
+BULK_CARDS = 1000
+BULK_BOARDS = 10
+BULK_WORKERS = 8
+
+# Boards cached by the metadata warmup scenario
+WARMUP_BOARDS = 500
+
+
+def unlimited():
+    # The mock server has no quota, so benchmarks run without the Trello rate limit
+    return RateLimiter(TokenBucket(10**9), TokenBucket(10**9))
+
+
+@contextmanager
+def empty_cache():
+    # Point the metadata cache at a new directory for the duration of a block
+    directory = tempfile.mkdtemp(prefix="addcardtool-bench-")
+    previous = os.environ.get("ADDCARDTOOL_CACHE_DIR")
+    os.environ["ADDCARDTOOL_CACHE_DIR"] = directory
+    cache._caches.clear()
+    try:
+        yield directory
+    finally:
+        if previous is None:
+            os.environ.pop("ADDCARDTOOL_CACHE_DIR", None)
+        else:
+            os.environ["ADDCARDTOOL_CACHE_DIR"] = previous
+        cache._caches.clear()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def mock_client(mock, pool_size=10):
+    # Install a traced client for the mock server as the shared client
+    tracer = Tracer()
+    client = TrelloClient(
+        "key",
+        "token",
+        base_url=mock.base_url,
+        pool_size=pool_size,
+        rate_limiter=unlimited(),
+        tracer=tracer,
+    )
+    previous = set_client(client)
+    try:
+        yield tracer
+    finally:
+        set_client(previous)
+        client.close()
+
+
+def seed_boards(mock, count, lists=5, labels=6):
+    board_ids = []
+    for i in range(count):
+        board_id = mock.add_board(f"Board {i}", f"Description of board {i}")
+        for j in range(lists):
+            mock.add_list(board_id, f"List {j}")
+        for j in range(labels):
+            mock.add_label(board_id, f"Label {j}", "green")
+        board_ids.append(board_id)
+    return board_ids
+
+
+def request_histogram(tracer):
+    histogram = LatencyHistogram()
+    for request_histogram in tracer.histograms.values():
+        histogram.merge(request_histogram)
+    return histogram
+
+
+def interactive_flow(board_name, list_name):
+    # The reads and write add-card makes once the user has answered the prompts
+    boards = program.get_all_user_boards_name()
+    board_id = next(board.id for board in boards if board.name == board_name)
+    board = program.get_board(board_id)
+    list_id = next(board_list.id for board_list in board.lists if board_list.name == list_name)
+    return program.create_new_card(list_id, "Benchmark card", "", [board.labels[0].id])
+
+
+"""
+Interactive add-card flow with an empty metadata cache every time: list boards, fetch the
+chosen board, create the card. Latency is the whole flow.
+"""
+
+
+def interactive_cold(options):
+    with MockTrello(**options) as mock, mock_client(mock) as tracer:
+        seed_boards(mock, 20)
+        histogram = LatencyHistogram()
+        started = time.perf_counter()
+        for _ in range(INTERACTIVE_RUNS):
+            with empty_cache():
+                flow_started = time.perf_counter()
+                interactive_flow("Board 7", "List 2")
+                histogram.record(time.perf_counter() - flow_started)
+        return INTERACTIVE_RUNS, time.perf_counter() - started, histogram, len(tracer.spans)
+
+
+"""
+Interactive add-card flow with boards, lists and labels already cached, so only the card is
+sent. Latency is the whole flow.
+"""
+
+
+def interactive_warm(options):
+    with MockTrello(**options) as mock, mock_client(mock) as tracer, empty_cache():
+        seed_boards(mock, 20)
+        interactive_flow("Board 7", "List 2")
+        requests_before = len(tracer.spans)
+        histogram = LatencyHistogram()
+        started = time.perf_counter()
+        for _ in range(INTERACTIVE_RUNS):
+            flow_started = time.perf_counter()
+            interactive_flow("Board 7", "List 2")
+            histogram.record(time.perf_counter() - flow_started)
+        elapsed = time.perf_counter() - started
+        return INTERACTIVE_RUNS, elapsed, histogram, len(tracer.spans) - requests_before
+
+
+"""
+Bulk import of BULK_CARDS cards spread over BULK_BOARDS boards with a cold cache. Latency is
+per request.
+"""
+
+
+def bulk_import(options):
+    with MockTrello(**options) as mock, mock_client(mock, BULK_WORKERS) as tracer, empty_cache():
+        seed_boards(mock, BULK_BOARDS)
+        rows = (
+            CardRow(i + 1, f"Board {i % BULK_BOARDS}", f"List {i % 5}", f"Card {i}")
+            for i in range(BULK_CARDS)
+        )
+        started = time.perf_counter()
+        created = sum(result.ok for result in create_cards(rows, workers=BULK_WORKERS))
+        elapsed = time.perf_counter() - started
+        return created, elapsed, request_histogram(tracer), len(tracer.spans)
+
+
+"""
+warm-cache for WARMUP_BOARDS boards: stream the board list and fetch every board's lists
+and labels through /batch. Latency is per request.
+"""
+
+
+def metadata_warmup(options):
+    with MockTrello(**options) as mock, mock_client(mock) as tracer, empty_cache():
+        seed_boards(mock, WARMUP_BOARDS)
+        started = time.perf_counter()
+        board_ids = [board.id for board in program.iter_user_boards()]
+        cached = program.get_boards(board_ids)
+        elapsed = time.perf_counter() - started
+        return len(cached), elapsed, request_histogram(tracer), len(tracer.spans)
+
+
+SCENARIOS = {
+    "interactive-cold": interactive_cold,
+    "interactive-warm": interactive_warm,
+    "bulk-import": bulk_import,
+    "metadata-warmup": metadata_warmup,
+}
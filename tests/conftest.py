@@ -0,0 +1,49 @@
+import pytest
+
+from addcardtool import cache, client as client_module, config, outbox
+from addcardtool.client import TrelloClient, set_client
+from addcardtool.testing import MockTrello
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("ADDCARDTOOL_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(cache, "_caches", {})
+    monkeypatch.setattr(cache, "_refresh", False)
+    return tmp_path / "cache"
+
+
+@pytest.fixture(autouse=True)
+def outbox_path(tmp_path, monkeypatch):
+    # Keep queued cards in the test's directory and record background flushes instead of
+    # starting processes
+    monkeypatch.setenv("ADDCARDTOOL_OUTBOX", str(tmp_path / "outbox.sqlite3"))
+    flushes = []
+    monkeypatch.setattr(outbox, "start_background_flush", lambda: flushes.append(True))
+    return flushes
+
+
+@pytest.fixture(autouse=True)
+def profiles_path(tmp_path, monkeypatch):
+    # Read profiles from the test's directory and start without any profile selected
+    path = tmp_path / "profiles.ini"
+    monkeypatch.setenv("ADDCARDTOOL_PROFILES", str(path))
+    monkeypatch.delenv("ADDCARDTOOL_PROFILE", raising=False)
+    monkeypatch.setattr(config, "_config", config.Config())
+    monkeypatch.setattr(client_module, "_default_profile", None)
+    clients = {}
+    monkeypatch.setattr(client_module, "_clients", clients)
+    yield path
+    for name, profile_client in list(clients.items()):
+        if name != config.DEFAULT_PROFILE:
+            profile_client.close()
+
+
+@pytest.fixture
+def trello():
+    with MockTrello() as mock:
+        client = TrelloClient("key", "token", base_url=mock.base_url)
+        previous = set_client(client)
+        yield mock
+        set_client(previous)
+        client.close()
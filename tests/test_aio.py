@@ -0,0 +1,102 @@
+import asyncio
+
+import aiohttp
+
+from addcardtool.aio import AsyncTrelloClient
+from addcardtool.models import Board, Label
+from addcardtool.ratelimit import RateLimiter, TokenBucket
+
+
+def test_async_client_mirrors_program_functions(trello):
+    board_id = trello.add_board("Ops", "Operations")
+    list_id = trello.add_list(board_id, "Inbox")
+    label_id = trello.add_label(board_id, "bug", "red")
+
+    async def run():
+        async with AsyncTrelloClient("key", "token", base_url=trello.base_url) as client:
+            boards = await client.get_all_user_boards_name()
+            board = await client.get_board(board_id)
+            labels = await client.get_board_labels(board_id)
+            new_list_id = await client.create_new_list(board_id, "Todo")
+            return boards, board, labels, new_list_id
+
+    boards, board, labels, new_list_id = asyncio.run(run())
+
+    assert boards == [Board(board_id, "Ops", "Operations")]
+    assert [item.id for item in board.lists] == [list_id]
+    queries = {path: query for _, path, query in trello.requests}
+    assert queries[f"/1/boards/{board_id}"]["list_fields"] == "name,pos"
+    assert labels == [Label(label_id, "bug", "red")]
+    assert trello.lists[new_list_id]["name"] == "Todo"
+
+
+def test_create_cards_bounds_in_flight_requests(trello):
+    board_id = trello.add_board("Ops")
+    list_id = trello.add_list(board_id, "Inbox")
+    trello.latency = 0.01
+    limiter = RateLimiter(TokenBucket(10000), TokenBucket(10000))
+
+    async def run():
+        async with AsyncTrelloClient(
+            "key", "token", base_url=trello.base_url, max_in_flight=5, rate_limiter=limiter
+        ) as client:
+            return await client.create_cards((list_id, f"Card {i}", "", []) for i in range(50))
+
+    results = asyncio.run(run())
+
+    assert len(trello.cards) == 50
+    assert sorted(card.id for card in results) == sorted(trello.cards)
+    assert trello.connections <= 5
+
+
+def test_async_reads_request_only_the_fields_they_use(trello, capsys):
+    board_id = trello.add_board("Ops")
+    trello.add_list(board_id, "Inbox")
+
+    async def run():
+        async with AsyncTrelloClient("key", "token", base_url=trello.base_url) as client:
+            await client.get_all_user_boards_name()
+            lists = await client.get_board_lists(board_id)
+            missing = await client.get_board_lists("missing")
+            return lists, missing
+
+    lists, missing = asyncio.run(run())
+
+    assert [item.name for item in lists] == ["Inbox"]
+    queries = {path: query for _, path, query in trello.requests}
+    assert queries["/1/members/me/boards"]["fields"] == "name,desc,closed"
+    assert queries["/1/members/me/boards"]["filter"] == "open"
+    assert queries[f"/1/boards/{board_id}/lists"]["fields"] == "name"
+    assert missing is None
+    assert "Error: Unable to get board lists" in capsys.readouterr().out
+
+
+def test_dropped_connections_are_only_retried_for_idempotent_methods():
+    connections = []
+
+    async def drop(reader, writer):
+        # Read the request, then hang up before answering
+        connections.append(await reader.readuntil(b"\r\n\r\n"))
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(drop, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server, AsyncTrelloClient(
+            "key", "token", base_url=f"http://127.0.0.1:{port}/1/", retries=2, backoff_factor=0
+        ) as client:
+            results = await client.create_cards([("list", "Card", "", [])])
+            get_attempts = len(connections)
+            try:
+                await client.get_board("board")
+            except aiohttp.ClientConnectionError:
+                pass
+            return results, get_attempts
+
+    results, post_attempts = asyncio.run(run())
+
+    [error] = results
+    assert isinstance(error, aiohttp.ClientConnectionError)
+    assert post_attempts == 1
+    # aiohttp itself may resend a GET once more on each attempt
+    assert len(connections) >= 1 + 3
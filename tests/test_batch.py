@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from addcardtool import program
+from addcardtool.batch import Batcher, batch_route
+
+
+def test_batch_route_escapes_commas():
+    assert batch_route("boards/1", {"fields": "name,desc"}) == "/boards/1?fields=name%2Cdesc"
+
+
+def test_get_boards_uses_one_round_trip_per_ten_boards(trello):
+    board_ids = [trello.add_board(f"Board {i}") for i in range(25)]
+    for board_id in board_ids:
+        trello.add_list(board_id, "Inbox")
+        trello.add_label(board_id, "bug", "red")
+
+    boards = program.get_boards(board_ids + ["missing"])
+
+    assert sorted(boards) == sorted(board_ids)
+    assert all(board.lists[0].name == "Inbox" for board in boards.values())
+    assert [path for _, path, _ in trello.requests] == ["/1/batch"] * 3
+    # Every board is now cached
+    program.get_boards(board_ids)
+    assert len(trello.requests) == 3
+
+
+def test_concurrent_reads_are_coalesced(trello):
+    board_ids = [trello.add_board(f"Board {i}") for i in range(20)]
+    batcher = Batcher(window=0.05)
+
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        labels = list(executor.map(lambda board_id: program.get_board_labels(board_id, batcher), board_ids))
+
+    assert labels == [[]] * 20
+    assert batcher.round_trips <= 3
+    assert {path for _, path, _ in trello.requests} == {"/1/batch"}
+
+
+class BrokenClient:
+    def get(self, path, params=None):
+        raise ConnectionError("connection reset")
+
+
+def test_a_failed_batch_does_not_leave_readers_waiting():
+    batcher = Batcher(client=BrokenClient(), window=0.01)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future = executor.submit(batcher.get, "boards/1")
+        error = future.exception(timeout=5)
+
+    assert isinstance(error, ConnectionError)
+    assert batcher.get_many([("boards/1", None), ("boards/2", None)]) == [(None, None)] * 2
@@ -0,0 +1,102 @@
+import io
+
+import pytest
+from typer.testing import CliRunner
+
+from addcardtool.bulk import BulkRowError, create_cards, fan_out_card, iter_rows, parse_targets
+from addcardtool.cli import app
+
+
+def test_iter_rows_reads_csv_and_jsonl():
+    csv_rows = list(
+        iter_rows(io.StringIO('board,list,name,desc,labels\nOps,Inbox,Card,Desc,"bug, p1"\n'), "csv")
+    )
+    jsonl_rows = list(
+        iter_rows(io.StringIO('{"board": "Ops", "list": "Inbox", "name": "Card", "labels": ["bug"]}\n\n'), "jsonl")
+    )
+    assert csv_rows[0].labels == ["bug", "p1"]
+    assert csv_rows[0].desc == "Desc"
+    assert jsonl_rows[0].number == 1
+    assert jsonl_rows[0].labels == ["bug"]
+
+
+def test_create_cards_resolves_each_board_once(trello):
+    board_id = trello.add_board("Ops")
+    list_id = trello.add_list(board_id, "Inbox")
+    label_id = trello.add_label(board_id, "bug", "red")
+    lines = "".join(
+        f'{{"board": "Ops", "list": "Inbox", "name": "Card {i}", "labels": ["bug"]}}\n'
+        for i in range(20)
+    )
+    lines += '{"board": "Ops", "list": "Missing", "name": "Lost"}\n'
+
+    results = list(create_cards(iter_rows(io.StringIO(lines), "jsonl"), workers=4))
+
+    assert sum(result.ok for result in results) == 20
+    assert [result.row.name for result in results if not result.ok] == ["Lost"]
+    assert len(trello.cards) == 20
+    assert all(card["idList"] == list_id and card["idLabels"] == [label_id] for card in trello.cards.values())
+    gets = [path for method, path, _ in trello.requests if method == "GET"]
+    assert len(gets) == 2
+
+
+def test_parse_targets_splits_board_list_and_labels():
+    rows = parse_targets(["Ops/Inbox/bug, p1", "Infra / Triage", "Ops/Inbox/bug,p1"], "Card")
+
+    assert [(row.number, row.board, row.list, row.labels) for row in rows] == [
+        (1, "Ops", "Inbox", ["bug", "p1"]),
+        (2, "Infra", "Triage", []),
+    ]
+    with pytest.raises(BulkRowError, match="BOARD/LIST"):
+        parse_targets(["Ops"], "Card")
+
+
+def test_fan_out_resolves_boards_together(trello):
+    board_ids = [trello.add_board(f"Team {i}") for i in range(5)]
+    for board_id in board_ids:
+        trello.add_list(board_id, "Incidents")
+        trello.add_label(board_id, "sev1", "red")
+    targets = [f"Team {i}/Incidents/sev1" for i in range(5)]
+
+    results = list(fan_out_card(parse_targets(targets, "Outage", "Details")))
+
+    assert all(result.ok for result in results)
+    assert sorted(card["idBoard"] for card in trello.cards.values()) == sorted(board_ids)
+    gets = [path for method, path, _ in trello.requests if method == "GET"]
+    assert gets == ["/1/members/me/boards", "/1/batch"]
+
+
+def test_add_card_to_several_boards(trello, outbox_path):
+    for name in ("Ops", "Infra"):
+        trello.add_list(trello.add_board(name), "Inbox")
+
+    result = CliRunner().invoke(
+        app,
+        ["add-card", "--name", "Outage", "--to", "Ops/Inbox", "--to", "Infra/Inbox", "--to", "Dev/Inbox"],
+    )
+
+    assert result.exit_code == 1
+    assert "Target 3: failed Outage: Board not found: Dev" in result.output
+    assert "Created 2 of 3 cards (1 failed)" in result.output
+    assert len(trello.cards) == 2
+    assert outbox_path == []
+
+
+def test_add_cards_reports_the_line_that_cannot_be_read(trello, tmp_path):
+    board_id = trello.add_board("Ops")
+    trello.add_list(board_id, "Inbox")
+    lines = '{"board": "Ops", "list": "Inbox", "name": "Card"}\n\n{"board": "Ops", "list": \n'
+
+    result = CliRunner().invoke(app, ["add-cards", "--from", "-"], input=lines)
+
+    assert result.exit_code == 2
+    assert "Line 3: not valid JSON" in result.output
+    assert "Traceback" not in result.output
+
+    path = tmp_path / "cards.csv"
+    path.write_text("board,title\nOps,Card\n")
+    result = CliRunner().invoke(app, ["add-cards", "--from", str(path)])
+    assert result.exit_code == 2
+    assert "missing columns: list, name" in result.output
+    with pytest.raises(BulkRowError, match="Line 1: expected a JSON object"):
+        list(iter_rows(io.StringIO("[1, 2]\n"), "jsonl"))
@@ -0,0 +1,47 @@
+import time
+
+from addcardtool import program
+from addcardtool.cache import get_cache
+from addcardtool.models import Board, List
+
+
+def test_warm_reads_are_served_from_disk(trello):
+    board_id = trello.add_board("Ops")
+    trello.add_list(board_id, "Inbox")
+    program.get_all_user_boards_name()
+    program.get_board_lists(board_id)
+    requests_before = len(trello.requests)
+
+    assert program.get_all_user_boards_name() == [Board(board_id, "Ops")]
+    assert [item.name for item in program.get_board_lists(board_id)] == ["Inbox"]
+    assert len(trello.requests) == requests_before
+
+
+def test_stale_entry_is_revalidated_with_etag(trello):
+    board_id = trello.add_board("Ops")
+    trello.add_label(board_id, "bug", "red")
+    cache = get_cache("token")
+    cache.ttl = 0
+    first = program.get_board_labels(board_id)
+    second = program.get_board_labels(board_id)
+
+    assert first == second
+    assert len(trello.requests) == 2
+    assert cache.get(program.board_labels_cache_key(board_id)).fetched <= time.time()
+
+
+def test_create_invalidates_board_entries(trello):
+    board_id = trello.add_board("Ops")
+    assert program.get_board_lists(board_id) == []
+    list_id = program.create_new_list(board_id, "Todo")
+    assert program.get_board_lists(board_id) == [List(list_id, "Todo")]
+    program.create_new_board("Other", "")
+    assert len(program.get_all_user_boards_name()) == 2
+
+
+def test_refresh_ignores_cached_entries(trello):
+    board_id = trello.add_board("Ops")
+    program.get_board_lists(board_id)
+    trello.add_list(board_id, "Added elsewhere")
+    get_cache("token").refresh = True
+    assert [item.name for item in program.get_board_lists(board_id)] == ["Added elsewhere"]
@@ -0,0 +1,156 @@
+import json
+
+from typer.testing import CliRunner
+
+from addcardtool import bulk
+from addcardtool.bulk import CardRow
+from addcardtool.cardindex import (
+    CardIndex,
+    DuplicateChecker,
+    build_board_indexes,
+    normalize,
+    refresh_board_indexes,
+)
+from addcardtool.cli import app
+from addcardtool.models import Card
+
+
+def seed(trello):
+    board_id = trello.add_board("Ops")
+    inbox = trello.add_list(board_id, "Inbox")
+    done = trello.add_list(board_id, "Done")
+    return board_id, inbox, done
+
+
+def add_card(trello, list_id, name, desc=""):
+    _, card = trello.handle("POST", "/1/cards", {"idList": list_id, "name": name, "desc": desc})
+    return card["id"]
+
+
+def posted_cards(trello):
+    return [query["name"] for method, path, query in trello.requests if path == "/1/cards"]
+
+
+def test_normalize_ignores_case_punctuation_and_spacing():
+    assert normalize("  Fix: Login  page crash!! ") == "fix login page crash"
+
+
+def test_find_exact_and_near_duplicates(tmp_path):
+    index = CardIndex(str(tmp_path / "cards.sqlite3"))
+    index.replace_board(
+        "b1",
+        [
+            Card("c1", "Fix login page crash", "", "l1"),
+            Card("c2", "Update the docs", "", "l2"),
+        ],
+        None,
+    )
+
+    [exact] = index.find_duplicates("b1", "fix login page crash!")
+    assert (exact.card_id, exact.exact) == ("c1", True)
+    [near] = index.find_duplicates("b1", "Fix the login page crash")
+    assert near.card_id == "c1" and 0.85 <= near.ratio < 1.0
+    assert index.find_duplicates("b1", "Fix login page crash", list_id="l2") == []
+    assert index.find_duplicates("b1", "Write release notes") == []
+    assert index.find_duplicates("b2", "Update the docs") == []
+
+
+def test_renamed_cards_leave_no_stale_search_rows(tmp_path):
+    index = CardIndex(str(tmp_path / "cards.sqlite3"))
+    index.replace_board("b1", [Card("c1", "First", "", "l1"), Card("c2", "Second", "", "l1")], None)
+    index.add("b1", Card("c1", "First renamed", "", "l1"))
+    index.add("b1", Card("c2", "Second renamed", "", "l1"))
+    index.add("b1", Card("c2", "Second", "", "l1"))
+
+    rowids = sorted(row[0] for row in index._query("SELECT rowid FROM cards"))
+    if index.fts:
+        # The full-text index keeps one row per card, not one per version of it
+        assert index._query("SELECT COUNT(*) FROM cards_fts_docsize")[0][0] == len(rowids)
+        matched = index._query("SELECT rowid FROM cards_fts WHERE cards_fts MATCH 'first OR second'")
+        assert sorted(row[0] for row in matched) == rowids
+    assert [match.card_id for match in index.find_duplicates("b1", "First")] == []
+    assert [match.card_id for match in index.find_duplicates("b1", "Second")] == ["c2"]
+
+
+def test_index_follows_card_actions(trello, tmp_path):
+    board_id, inbox, done = seed(trello)
+    kept = add_card(trello, inbox, "Rotate keys")
+    renamed = add_card(trello, inbox, "Old name")
+    archived = add_card(trello, inbox, "Archive me")
+    index = CardIndex(str(tmp_path / "cards.sqlite3"))
+    assert build_board_indexes(index, [board_id]) == 1
+    assert index.card_count(board_id) == 3
+
+    created = add_card(trello, done, "Ship it")
+    trello.update_card(renamed, name="New name")
+    trello.update_card(archived, closed=True)
+    trello.update_card(kept, idList=done)
+    trello.requests.clear()
+
+    assert refresh_board_indexes(index, [board_id]) == (1, 0)
+    assert [path for _, path, _ in trello.requests] == ["/1/batch"]
+    assert index.find_duplicates(board_id, "Ship it")[0].card_id == created
+    assert index.find_duplicates(board_id, "New name")[0].card_id == renamed
+    assert index.find_duplicates(board_id, "Old name") == []
+    assert index.find_duplicates(board_id, "Archive me") == []
+    assert index.find_duplicates(board_id, "Rotate keys")[0].list_id == done
+
+
+def test_add_cards_skips_duplicates(trello, tmp_path):
+    board_id, inbox, _ = seed(trello)
+    existing = add_card(trello, inbox, "Rotate keys")
+    source = tmp_path / "cards.jsonl"
+    rows = [
+        {"board": "Ops", "list": "Inbox", "name": "rotate KEYS"},
+        {"board": "Ops", "list": "Inbox", "name": "Renew certificate"},
+        {"board": "Ops", "list": "Inbox", "name": "Renew certificate"},
+    ]
+    source.write_text("\n".join(json.dumps(row) for row in rows))
+    trello.requests.clear()
+
+    result = CliRunner().invoke(
+        app, ["add-cards", "--from", str(source), "--workers", "1", "--skip-duplicates"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert posted_cards(trello) == ["Renew certificate"]
+    assert f"({existing})" in result.output
+    assert "Created 1 of 3 cards (0 failed, 2 skipped as duplicates)" in result.output
+
+    # The card created by the first run is in the index for the next one
+    trello.requests.clear()
+    result = CliRunner().invoke(
+        app,
+        ["add-card", "--board", "Ops", "--list", "Inbox", "--name", "Renew certificate.", "--skip-duplicates"],
+    )
+    assert result.exit_code == 0, result.output
+    assert "is already on the board, skipped" in result.output
+    assert posted_cards(trello) == []
+
+
+def test_checker_claims_names_within_a_run(trello, tmp_path):
+    board_id, inbox, _ = seed(trello)
+    checker = DuplicateChecker(CardIndex(str(tmp_path / "cards.sqlite3")))
+
+    assert checker.check(board_id, inbox, "Deploy") is None
+    match = checker.check(board_id, inbox, "deploy")
+    assert match.card_id is None and match.exact
+
+
+def test_failed_card_gives_up_its_claimed_name(trello, tmp_path, monkeypatch):
+    board_id, inbox, _ = seed(trello)
+    checker = DuplicateChecker(CardIndex(str(tmp_path / "cards.sqlite3")))
+    rows = [CardRow(number, "Ops", "Inbox", "Deploy") for number in (1, 2)]
+    create_new_card = bulk.create_new_card
+    attempts = []
+
+    def fail_first(*args):
+        attempts.append(args)
+        return None if len(attempts) == 1 else create_new_card(*args)
+
+    monkeypatch.setattr(bulk, "create_new_card", fail_first)
+
+    results = list(bulk.create_cards(rows, workers=1, duplicates=checker))
+
+    assert [(result.ok, result.duplicate) for result in results] == [(False, None), (True, None)]
+    assert [card["name"] for card in trello.cards.values()] == ["Deploy"]
@@ -0,0 +1,61 @@
+from addcardtool import program
+from addcardtool.models import Board, Label, List
+
+
+def test_program_functions_share_one_connection(trello):
+    board_id = trello.add_board("Ops", "Operations")
+    list_id = trello.add_list(board_id, "Inbox")
+    label_id = trello.add_label(board_id, "bug", "red")
+
+    assert program.get_all_user_boards_name() == [Board(board_id, "Ops", "Operations")]
+    assert program.get_board_lists(board_id) == [List(list_id, "Inbox")]
+    assert program.get_board_labels(board_id) == [Label(label_id, "bug", "red")]
+    card = program.create_new_card(list_id, "Card", "Desc", [label_id])
+    assert trello.cards[card.id]["idLabels"] == [label_id]
+    assert (card.list_id, card.board_id, card.label_ids) == (list_id, board_id, (label_id,))
+    assert card.short_url == trello.cards[card.id]["shortUrl"]
+
+    assert trello.connections == 1
+    assert all(query["key"] == "key" for _, _, query in trello.requests)
+    assert all(query["token"] == "token" for _, _, query in trello.requests)
+
+
+def test_create_functions_return_ids(trello):
+    board_id = program.create_new_board("New", "")
+    assert board_id in trello.boards
+    list_id = program.create_new_list(board_id, "Todo")
+    assert trello.lists[list_id]["idBoard"] == board_id
+    label_id = program.create_new_label(board_id, "p1", "orange")
+    assert trello.labels[label_id]["color"] == "orange"
+
+
+def test_failed_card_returns_none(trello):
+    assert program.create_new_card("missing", "Card", "Desc", []) is None
+
+
+def test_get_board_nests_lists_and_labels(trello):
+    board_id = trello.add_board("Ops", "Operations")
+    list_id = trello.add_list(board_id, "Inbox")
+    label_id = trello.add_label(board_id, "bug", "red")
+
+    board = program.get_board(board_id)
+
+    assert board.name == "Ops"
+    assert [(item.id, item.name) for item in board.lists] == [(list_id, "Inbox")]
+    assert [(item.id, item.color) for item in board.labels] == [(label_id, "red")]
+    assert len(trello.requests) == 1
+    assert trello.requests[0][2]["lists"] == "open"
+
+
+def test_server_errors_are_retried_only_for_idempotent_requests(trello):
+    board_id = trello.add_board("Ops")
+    list_id = trello.add_list(board_id, "Inbox")
+
+    trello.fail = 1
+    assert program.get_board_lists(board_id) == [List(list_id, "Inbox")]
+
+    trello.fail = 1
+    assert program.create_new_card(list_id, "Card", "", []) is None
+    posts = [path for method, path, _ in trello.requests if method == "POST"]
+    assert posts == ["/1/cards"]
+    assert len(trello.cards) == 1
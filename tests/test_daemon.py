@@ -0,0 +1,149 @@
+import http.client
+import os
+import threading
+
+import pytest
+from typer.testing import CliRunner
+
+from addcardtool.cli import app
+from addcardtool.daemon import CardService, close_server, start_server
+from addcardtool.outbox import PENDING, UNKNOWN, Outbox
+from addcardtool.remote import DaemonClient, DaemonError, token_path
+
+
+@pytest.fixture
+def daemon(trello, tmp_path):
+    socket_path = str(tmp_path / "daemon.sock")
+    service = CardService()
+    server = start_server(service, socket_path=socket_path)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield DaemonClient(socket_path=socket_path), service
+    server.shutdown()
+    close_server(server)
+
+
+def test_warm_daemon_adds_cards_with_one_post_each(trello, daemon):
+    client, service = daemon
+    board_id = trello.add_board("Ops")
+    list_id = trello.add_list(board_id, "Inbox")
+    trello.add_label(board_id, "bug", "red")
+    assert service.warm() == 1
+    trello.requests.clear()
+
+    card_ids = [
+        client.add_card("Ops", "Inbox", f"Card {i}", label_names=["bug"]).id for i in range(3)
+    ]
+
+    assert [(method, path) for method, path, _ in trello.requests] == [("POST", "/1/cards")] * 3
+    assert [trello.cards[card_id]["idList"] for card_id in card_ids] == [list_id] * 3
+    assert client.health()["cards_created"] == 3
+
+
+def test_daemon_reports_resolution_errors(trello, daemon):
+    client, _ = daemon
+    trello.add_board("Ops")
+    with pytest.raises(DaemonError, match="List not found on board Ops: Inbox") as error:
+        client.add_card("Ops", "Inbox", "Card")
+    assert error.value.status_code == 400
+    with pytest.raises(DaemonError, match="Missing fields: name"):
+        client.add_card("Ops", "Inbox", "")
+
+
+def test_refresh_picks_up_new_boards(trello, daemon):
+    client, service = daemon
+    service.warm()
+    board_id = trello.add_board("Added later")
+    trello.add_list(board_id, "Inbox")
+
+    client.refresh()
+
+    assert client.add_card("Added later", "Inbox", "Card").board_id == board_id
+
+
+def test_add_card_forwards_to_running_daemon(trello, daemon, monkeypatch):
+    client, _ = daemon
+    board_id = trello.add_board("Ops")
+    trello.add_list(board_id, "Inbox")
+    monkeypatch.setenv("ADDCARDTOOL_SOCKET", client.socket_path)
+
+    result = CliRunner().invoke(
+        app, ["add-card", "--board", "Ops", "--list", "Inbox", "--name", "Fix"]
+    )
+
+    assert result.exit_code == 0
+    assert client.health()["cards_created"] == 1
+
+
+def test_card_is_queued_when_the_daemon_cannot_reach_trello(trello, daemon, monkeypatch, outbox_path):
+    client, service = daemon
+    board_id = trello.add_board("Ops")
+    trello.add_list(board_id, "Inbox")
+    service.warm()
+    monkeypatch.setenv("ADDCARDTOOL_SOCKET", client.socket_path)
+    # Both the daemon's request and the direct one are refused
+    trello.unavailable = 2
+
+    result = CliRunner().invoke(
+        app, ["add-card", "--board", "Ops", "--list", "Inbox", "--name", "Fix"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "saved in the outbox" in result.output
+    assert [(entry["name"], entry["state"]) for entry in Outbox().entries()] == [("Fix", PENDING)]
+    assert trello.cards == {}
+    assert outbox_path == [True]
+
+
+@pytest.mark.parametrize("status_code", [None, 500])
+def test_card_with_a_lost_daemon_answer_is_checked_for_before_it_is_resent(
+    trello, monkeypatch, status_code
+):
+    board_id = trello.add_board("Ops")
+    trello.add_list(board_id, "Inbox")
+
+    def timed_out(*args, **kwargs):
+        raise DaemonError("Unable to reach the daemon: timed out", status_code)
+
+    monkeypatch.setattr(DaemonClient, "add_card", timed_out)
+    arguments = ["add-card", "--board", "Ops", "--list", "Inbox", "--name", "Fix"]
+
+    result = CliRunner().invoke(app, arguments)
+
+    assert result.exit_code == 0, result.output
+    [entry] = Outbox().entries()
+    assert entry["state"] == UNKNOWN
+    assert not [path for method, path, _ in trello.requests if method == "POST"]
+    assert CliRunner().invoke(app, arguments + ["--no-queue"]).exit_code == 1
+
+
+def test_socket_in_use_is_not_replaced(trello, daemon):
+    client, _ = daemon
+    with pytest.raises(OSError, match="already listening"):
+        start_server(CardService(), socket_path=client.socket_path)
+
+
+def test_port_daemon_only_answers_its_own_user(trello, tmp_path, monkeypatch):
+    monkeypatch.setenv("ADDCARDTOOL_SOCKET", str(tmp_path / "daemon.sock"))
+    server = start_server(CardService(), port=0)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    port = server.server_address[1]
+    try:
+        assert os.stat(token_path(port)).st_mode & 0o777 == 0o600
+        assert DaemonClient(port=port).health()["cards_created"] == 0
+
+        def post(headers, body=b"{}"):
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("POST", "/refresh", body=body, headers=headers)
+            return connection.getresponse().status
+
+        token = open(token_path(port)).read()
+        json_headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+        assert post(json_headers) == 200
+        assert post({"Content-Type": "application/json"}) == 401
+        assert post(dict(json_headers, Origin="https://example.com")) == 403
+        assert post(dict(json_headers, **{"Content-Type": "text/plain"})) == 415
+    finally:
+        server.shutdown()
+        close_server(server)
+    assert not os.path.exists(token_path(port))
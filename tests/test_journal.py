@@ -0,0 +1,64 @@
+import io
+
+import requests
+
+from addcardtool import bulk
+from addcardtool.bulk import CardRow, create_cards, iter_rows, resume_cards
+from addcardtool.journal import CardJournal
+
+
+def test_journal_records_intent_and_created_card(trello, tmp_path):
+    board_id = trello.add_board("Ops")
+    trello.add_list(board_id, "Inbox")
+    journal = CardJournal(str(tmp_path / "cards.jsonl"))
+    rows = iter_rows(io.StringIO('{"board": "Ops", "list": "Inbox", "name": "Card"}\n'), "jsonl")
+
+    [result] = list(create_cards(rows, workers=1, journal=journal))
+
+    [entry] = journal.entries()
+    assert entry["card_id"] == result.card_id
+    assert result.card_id in trello.cards
+    assert journal.unfinished() == []
+
+
+def test_resume_recovers_sent_cards_and_retries_the_rest(trello, tmp_path):
+    board_id = trello.add_board("Ops")
+    list_id = trello.add_list(board_id, "Inbox")
+    journal = CardJournal(str(tmp_path / "cards.jsonl"))
+    # Two identical rows where only one reached Trello before the batch died, plus one
+    # that never got sent
+    for number, name in enumerate(["Dup", "Dup", "Lost"], start=1):
+        journal.record_intent(CardRow(number, "Ops", "Inbox", name), list_id, [])
+    trello.handle("POST", "/1/cards", {"idList": list_id, "name": "Dup", "desc": ""})
+    trello.requests.clear()
+
+    results = list(resume_cards(journal, workers=2))
+
+    assert [result.recovered for result in results] == [True, False, False]
+    assert sorted(card["name"] for card in trello.cards.values()) == ["Dup", "Dup", "Lost"]
+    assert journal.unfinished() == []
+    list_fetches = [path for method, path, _ in trello.requests if method == "GET"]
+    assert list_fetches == [f"/1/lists/{list_id}/cards"]
+
+
+def test_a_dropped_connection_fails_only_its_row(trello, tmp_path, monkeypatch):
+    board_id = trello.add_board("Ops")
+    trello.add_list(board_id, "Inbox")
+    journal = CardJournal(str(tmp_path / "cards.jsonl"))
+    create_new_card = bulk.create_new_card
+
+    def flaky_create(list_id, name, desc, label_ids):
+        if name == "Card 1":
+            raise requests.ConnectionError("connection reset")
+        return create_new_card(list_id, name, desc, label_ids)
+
+    monkeypatch.setattr(bulk, "create_new_card", flaky_create)
+    lines = "".join(f'{{"board": "Ops", "list": "Inbox", "name": "Card {i}"}}\n' for i in range(3))
+
+    results = list(create_cards(iter_rows(io.StringIO(lines), "jsonl"), workers=2, journal=journal))
+
+    assert sorted(result.row.name for result in results if result.ok) == ["Card 0", "Card 2"]
+    [failed] = [result for result in results if not result.ok]
+    assert "connection reset" in failed.error
+    [entry] = journal.unfinished()
+    assert entry["name"] == "Card 1" and "connection reset" in entry["error"]
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from addcardtool import jsonstream, program
+from addcardtool.jsonstream import iter_array
+
+
+def _chunks(data, size):
+    return (data[i : i + size] for i in range(0, len(data), size))
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 4096])
+def test_elements_survive_any_chunk_boundary(size):
+    items = [{"id": "1", "name": "Ünïcode ✓", "n": 12345.5}, [1, [2, 3]], "x,]", 10, None, True]
+    body = json.dumps(items).encode()
+    assert list(iter_array(_chunks(body, size))) == items
+
+
+def test_elements_are_yielded_before_the_body_ends():
+    def chunks():
+        yield b'[{"id": "1"}, '
+        raise AssertionError("read past the first element")
+
+    assert next(iter_array(chunks())) == {"id": "1"}
+
+
+def test_truncated_array_raises():
+    with pytest.raises(ValueError):
+        list(iter_array([b'[{"id": "1"}, {"id"']))
+
+
+def test_boards_are_paged_and_projected(trello):
+    board_ids = [trello.add_board(f"Board {i}", "desc") for i in range(7)]
+    trello.boards[board_ids[0]]["closed"] = True
+
+    boards = list(program.iter_user_boards(page_size=3))
+
+    assert sorted(board.id for board in boards) == sorted(board_ids[1:])
+    queries = [query for _, path, query in trello.requests if path == "/1/members/me/boards"]
+    assert len(queries) == 3
+    assert all(query["fields"] == program.BOARD_LIST_FIELDS for query in queries)
+    assert "before" not in queries[0] and queries[1]["before"] == boards[2].id
+    # The finished listing is cached
+    assert program.get_all_user_boards_name() == boards
+    assert len(trello.requests) == 3
+
+
+def test_large_element_is_decoded_once(monkeypatch):
+    calls = []
+    decoder = json.JSONDecoder()
+
+    class CountingDecoder:
+        def raw_decode(self, text, index):
+            calls.append(index)
+            return decoder.raw_decode(text, index)
+
+    monkeypatch.setattr(jsonstream, "_decoder", CountingDecoder())
+    items = [{"name": 'a "quoted" [name] \\ {}', "lists": [{"id": str(i)} for i in range(200)]}] * 2
+    body = json.dumps(items).encode()
+
+    assert list(iter_array(_chunks(body, 16))) == items
+    # One attempt on the first chunk, then one once the element's last bracket arrives
+    assert len(calls) == 2 * len(items)
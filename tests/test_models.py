@@ -0,0 +1,45 @@
+from addcardtool import program
+from addcardtool.models import Board, Card
+
+
+def test_models_have_no_instance_dict():
+    board = Board.from_json(
+        {
+            "id": "b1",
+            "name": "Ops",
+            "lists": [{"id": "l1", "name": "Inbox", "pos": 16384}],
+            "labels": [{"id": "a1", "name": "bug", "color": "red"}],
+        }
+    )
+
+    for item in (board, board.lists[0], board.labels[0], Card("c1", "Card")):
+        assert not hasattr(item, "__dict__")
+    assert board.lists[0].pos == 16384.0
+
+
+def test_repeated_strings_are_shared(trello):
+    board_ids = [trello.add_board(f"Board {i}") for i in range(3)]
+    for board_id in board_ids:
+        trello.add_list(board_id, "To Do")
+        trello.add_label(board_id, "bug", "red")
+
+    boards = program.get_boards(board_ids)
+
+    labels = [boards[board_id].labels[0] for board_id in board_ids]
+    lists = [boards[board_id].lists[0] for board_id in board_ids]
+    assert all(label.color is labels[0].color for label in labels)
+    assert all(label.name is labels[0].name for label in labels)
+    assert all(item.name is lists[0].name for item in lists)
+
+
+def test_list_cards_are_decoded_into_cards(trello):
+    list_id = trello.add_list(trello.add_board("Ops"), "Inbox")
+    trello.payload_size = 4096
+    for i in range(3):
+        trello.handle("POST", "/1/cards", {"idList": list_id, "name": f"Card {i}", "desc": "d"})
+
+    cards = program.get_list_cards(list_id)
+
+    assert [(card.name, card.desc) for card in cards] == [(f"Card {i}", "d") for i in range(3)]
+    assert all(card.id in trello.cards for card in cards)
+    assert trello.requests[-1][2]["fields"] == "name,desc"
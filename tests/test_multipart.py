@@ -0,0 +1,105 @@
+import hashlib
+import tracemalloc
+
+from typer.testing import CliRunner
+
+from addcardtool.cli import app
+from addcardtool.multipart import MultipartStream
+from addcardtool.program import add_card_attachment, create_new_card
+from addcardtool.testing import parse_body
+
+
+def seed(trello):
+    board_id = trello.add_board("Ops")
+    return board_id, trello.add_list(board_id, "Inbox")
+
+
+def test_stream_encodes_fields_and_files(tmp_path):
+    path = tmp_path / "build.log"
+    path.write_bytes(b"line\n" * 1000)
+    body = MultipartStream({"name": "Build log"}, [("file", str(path), None, None)])
+
+    chunks = iter(lambda: body.read(777), b"")
+    encoded = b"".join(chunks)
+
+    assert len(encoded) == len(body)
+    fields = parse_body(body.content_type, encoded)
+    assert fields["name"] == "Build log"
+    file_name, _, data = fields["file"]
+    assert (file_name, data) == ("build.log", b"line\n" * 1000)
+
+    # Rewinding sends the same bytes again, as needed when a request is retried
+    body.seek(100)
+    assert body.read() == encoded[100:]
+    body.seek(0)
+    assert body.read() == encoded
+
+
+def test_stream_reads_large_files_in_constant_memory(tmp_path):
+    path = tmp_path / "big.log"
+    with open(path, "wb") as stream:
+        for _ in range(32):
+            stream.write(b"x" * (1024 * 1024))
+    body = MultipartStream({"name": "big.log"}, [("file", str(path), None, None)])
+
+    tracemalloc.start()
+    try:
+        while body.read(16 * 1024):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert body.tell() == len(body) > 32 * 1024 * 1024
+    assert peak < 1024 * 1024
+
+
+def test_card_fields_are_sent_in_the_body(trello):
+    _, list_id = seed(trello)
+    desc = "Stack trace:\n" + "frame\n" * 5000
+
+    card_id = create_new_card(list_id, "Crash & burn", desc, []).id
+
+    assert trello.cards[card_id]["desc"] == desc
+    assert trello.cards[card_id]["name"] == "Crash & burn"
+    url = next(url for url in trello.urls if url.startswith("/1/cards"))
+    assert "desc" not in url and "name" not in url
+
+
+def test_throttled_upload_is_sent_again_in_full(trello, tmp_path):
+    _, list_id = seed(trello)
+    card_id = create_new_card(list_id, "Card", "", []).id
+    path = tmp_path / "trace.json"
+    path.write_bytes(b"{}" * 100000)
+    trello.throttle = 1
+
+    attachment_id = add_card_attachment(card_id, str(path))
+
+    attachment = trello.attachments[attachment_id]
+    assert attachment["name"] == "trace.json"
+    assert attachment["sha256"] == hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_add_card_uploads_attachments_together(trello, tmp_path):
+    seed(trello)
+    paths = []
+    for number in range(3):
+        path = tmp_path / f"part{number}.txt"
+        path.write_bytes(str(number).encode() * 50000)
+        paths.append(path)
+    arguments = ["add-card", "--board", "Ops", "--list", "Inbox", "--name", "Logs"]
+    for path in paths:
+        arguments += ["--attach", str(path)]
+
+    result = CliRunner().invoke(app, arguments)
+
+    assert result.exit_code == 0, result.output
+    [card_id] = trello.cards
+    uploaded = {a["fileName"]: a for a in trello.attachments.values() if a["idCard"] == card_id}
+    assert sorted(uploaded) == ["part0.txt", "part1.txt", "part2.txt"]
+    for path in paths:
+        assert uploaded[path.name]["bytes"] == path.stat().st_size
+
+    result = CliRunner().invoke(app, arguments[:-1] + [str(tmp_path / "missing.txt")])
+    assert result.exit_code == 2
+    assert "No such file" in result.output
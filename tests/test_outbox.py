@@ -0,0 +1,120 @@
+import time
+
+from typer.testing import CliRunner
+
+from addcardtool import outbox as outbox_module
+from addcardtool.cli import app
+from addcardtool.outbox import (
+    FAILED,
+    MAX_ATTEMPTS,
+    PENDING,
+    SENT,
+    UNKNOWN,
+    Outbox,
+    flush_outbox,
+    send_or_queue,
+)
+
+
+def card_posts(trello):
+    return [path for method, path, _ in trello.requests if method == "POST"]
+
+
+def test_flush_sends_queued_cards(trello):
+    list_id = trello.add_list(trello.add_board("Ops"), "Inbox")
+    outbox = Outbox()
+    outbox.add(list_id, "First", "", [], "Ops", "Inbox")
+    outbox.add(list_id, "Second", "details", [], "Ops", "Inbox")
+
+    assert flush_outbox(outbox) == (2, 0)
+
+    entries = outbox.entries()
+    assert [entry["state"] for entry in entries] == [SENT, SENT]
+    assert [trello.cards[entry["card_id"]]["name"] for entry in entries] == ["First", "Second"]
+
+
+def test_entry_is_claimed_once():
+    outbox = Outbox()
+    outbox.add("list", "Card", "", [])
+    entry = outbox.due()[0]
+
+    assert outbox.claim(entry)
+    assert not outbox.claim(entry)
+    assert outbox.due() == []
+
+
+def test_unknown_entry_is_matched_instead_of_sent_again(trello):
+    list_id = trello.add_list(trello.add_board("Ops"), "Inbox")
+    outbox = Outbox()
+    entry_id = outbox.add(list_id, "Card", "desc", [], claimed=True)
+    # The request reached Trello but the answer was lost
+    trello.handle("POST", "/1/cards", {"idList": list_id, "name": "Card", "desc": "desc"})
+    outbox.mark_unknown(entry_id, "Read timed out", 1)
+    outbox.retry()
+    trello.requests.clear()
+
+    assert flush_outbox(outbox) == (1, 0)
+
+    assert card_posts(trello) == []
+    assert len(trello.cards) == 1
+    assert outbox.entries()[0]["card_id"] == next(iter(trello.cards))
+
+
+def test_failed_send_backs_off_then_gives_up(trello, monkeypatch):
+    list_id = trello.add_list(trello.add_board("Ops"), "Inbox")
+    outbox = Outbox()
+    outbox.add(list_id, "Card", "", [])
+    monkeypatch.setattr(outbox_module, "create_new_card", lambda *args, **kwargs: None)
+
+    assert flush_outbox(outbox) == (0, 1)
+    entry = outbox.entries()[0]
+    assert (entry["state"], entry["attempts"]) == (PENDING, 1)
+    assert entry["next_attempt"] > time.time()
+    assert flush_outbox(outbox) == (0, 1)
+    assert outbox.entries()[0]["attempts"] == 1
+
+    for _ in range(MAX_ATTEMPTS - 1):
+        flush_outbox(outbox, include_waiting=True)
+    assert outbox.entries()[0]["state"] == FAILED
+    assert flush_outbox(outbox, include_waiting=True) == (0, 0)
+
+
+def test_send_or_queue_keeps_card_when_trello_is_unreachable(trello, monkeypatch, outbox_path):
+    list_id = trello.add_list(trello.add_board("Ops"), "Inbox")
+    outbox = Outbox()
+
+    def unreachable(*args, **kwargs):
+        raise ConnectionError("Connection refused")
+
+    monkeypatch.setattr(outbox_module, "create_new_card", unreachable)
+
+    assert send_or_queue(outbox, list_id, "Card", "", [], "Ops", "Inbox") is None
+    assert outbox.entries()[0]["state"] == UNKNOWN
+    assert outbox_path == [True]
+
+
+def test_add_card_queues_and_outbox_flush_sends(trello, monkeypatch, outbox_path):
+    trello.add_list(trello.add_board("Ops"), "Inbox")
+    runner = CliRunner()
+    create_new_card = outbox_module.create_new_card
+
+    def unreachable(*args, **kwargs):
+        raise ConnectionError("Connection refused")
+
+    monkeypatch.setattr(outbox_module, "create_new_card", unreachable)
+    result = runner.invoke(
+        app, ["add-card", "--board", "Ops", "--list", "Inbox", "--name", "Card", "--queue"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "saved in the outbox" in result.output
+    assert outbox_path == [True]
+    assert "unknown" in runner.invoke(app, ["outbox", "list"]).output
+
+    monkeypatch.setattr(outbox_module, "create_new_card", create_new_card)
+    result = runner.invoke(app, ["outbox", "flush", "--all"])
+    assert result.exit_code == 0, result.output
+    assert "Sent 1 cards, 0 still waiting" in result.output
+    assert [card["name"] for card in trello.cards.values()] == ["Card"]
+
+    assert "Dropped 1 cards" in runner.invoke(app, ["outbox", "drop", "--sent"]).output
+    assert "The outbox is empty" in runner.invoke(app, ["outbox", "list", "--sent"]).output
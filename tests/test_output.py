@@ -0,0 +1,71 @@
+import json
+
+from typer.testing import CliRunner
+
+from addcardtool.cli import app
+
+
+def seed(trello):
+    board_id = trello.add_board("Ops")
+    list_id = trello.add_list(board_id, "Inbox")
+    return board_id, list_id, trello.add_label(board_id, "bug", "red")
+
+
+def invoke(*arguments, **kwargs):
+    # Keep stdout to the machine-readable output; prose goes to stderr
+    return CliRunner(mix_stderr=False).invoke(app, list(arguments), **kwargs)
+
+
+def test_add_card_prints_the_created_card_as_json(trello):
+    board_id, list_id, label_id = seed(trello)
+
+    result = invoke(
+        "--output", "json", "add-card", "--board", "Ops", "--list", "Inbox",
+        "--label", "bug", "--name", "Fix login", "--no-daemon",
+    )
+
+    assert result.exit_code == 0, result.stderr
+    record = json.loads(result.stdout)
+    [card] = trello.cards.values()
+    assert record["status"] == "created"
+    assert record["card_id"] == card["id"]
+    assert record["url"] == card["shortUrl"]
+    assert (record["list_id"], record["board_id"], record["label_ids"]) == (
+        list_id, board_id, [label_id],
+    )
+    assert record["elapsed"] >= 0
+    assert "Card Added Successfully" in result.stderr
+
+
+def test_add_cards_streams_one_ndjson_line_per_row(trello):
+    seed(trello)
+    lines = "".join(f'{{"board": "Ops", "list": "Inbox", "name": "Card {i}"}}\n' for i in range(5))
+    lines += '{"board": "Ops", "list": "Missing", "name": "Lost"}\n'
+
+    result = invoke("--output", "ndjson", "add-cards", "--from", "-", input=lines)
+
+    assert result.exit_code == 1
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    *rows, summary = records
+    assert sorted(record["row"] for record in rows) == [1, 2, 3, 4, 5, 6]
+    created = [record for record in rows if record["status"] == "created"]
+    assert sorted(record["card_id"] for record in created) == sorted(trello.cards)
+    [lost] = [record for record in rows if record["status"] == "failed"]
+    assert lost["name"] == "Lost" and "Missing" in lost["error"]
+    assert summary["summary"]["created"] == 5
+    assert summary["summary"]["failed"] == 1
+
+
+def test_json_collects_results_into_one_document(trello):
+    seed(trello)
+
+    result = invoke(
+        "--output", "json", "add-card", "--name", "Outage", "--to", "Ops/Inbox", "--to", "Ops/Inbox/bug",
+    )
+
+    assert result.exit_code == 0, result.stderr
+    document = json.loads(result.stdout)
+    assert sorted(record["target"] for record in document["results"]) == [1, 2]
+    assert document["summary"]["created"] == 2
+
+    assert invoke("--output", "xml", "profiles").exit_code == 2
@@ -0,0 +1,22 @@
+import threading
+
+from addcardtool.prefetch import Prefetcher
+
+
+def test_prefetched_value_is_fetched_once():
+    calls = []
+    release = threading.Event()
+
+    def fetch(value):
+        calls.append(value)
+        release.wait(1)
+        return value * 2
+
+    with Prefetcher() as prefetcher:
+        prefetcher.submit("key", fetch, 2)
+        prefetcher.submit("key", fetch, 2)
+        release.set()
+        assert prefetcher.result("key", fetch, 2) == 4
+        assert prefetcher.result("other", fetch, 3) == 6
+
+    assert calls == [2, 3]
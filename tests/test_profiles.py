@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+from typer.testing import CliRunner
+
+from addcardtool.bulk import CardRow, create_cards
+from addcardtool.cache import get_cache
+from addcardtool.cli import app
+from addcardtool.client import current_profile, get_client, use_profile
+from addcardtool.config import ProfileError, get_config
+from addcardtool.outbox import Outbox, flush_outbox
+from addcardtool.program import create_new_card
+from addcardtool.testing import MockTrello
+
+
+@pytest.fixture
+def teams(trello, profiles_path):
+    # Two more accounts, each on its own server, next to the default one
+    with MockTrello() as alpha, MockTrello() as beta:
+        profiles_path.write_text(
+            f"[alpha]\napi_key = key\napi_token = alpha-token\nbase_url = {alpha.base_url}\n\n"
+            f"[beta]\napi_key = key\napi_token = beta-token\nbase_url = {beta.base_url}\n"
+        )
+        yield {"alpha": alpha, "beta": beta}
+
+
+def seed(trello):
+    board_id = trello.add_board("Ops")
+    return trello.add_list(board_id, "Inbox")
+
+
+def tokens(trello):
+    return {query["token"] for _, _, query in trello.requests}
+
+
+def test_profiles_get_their_own_client_limiter_and_cache(teams):
+    alpha, beta = get_client("alpha"), get_client("beta")
+
+    assert get_client("alpha") is alpha
+    assert alpha.session is not beta.session
+    assert alpha.rate_limiter is not beta.rate_limiter
+    assert get_cache(alpha.api_token).directory != get_cache(beta.api_token).directory
+    assert get_config().profile_names() == ["default", "alpha", "beta"]
+    with pytest.raises(ProfileError, match="No profile named gamma"):
+        get_client("gamma")
+
+
+def test_profiles_are_used_concurrently(teams):
+    lists = {name: seed(mock) for name, mock in teams.items()}
+    created = {}
+
+    def post(name):
+        with use_profile(name):
+            assert current_profile() == name
+            # Worker pools started inside the block act as the same profile
+            rows = [CardRow(number, "Ops", "Inbox", f"{name} {number}") for number in range(4)]
+            created[name] = [result.card_id for result in create_cards(rows, workers=4)]
+            created[name].append(create_new_card(lists[name], "direct", "", []).id)
+
+    threads = [threading.Thread(target=post, args=(name,)) for name in teams]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name, mock in teams.items():
+        assert sorted(created[name]) == sorted(mock.cards)
+        assert tokens(mock) == {f"{name}-token"}
+    assert current_profile() == "default"
+
+
+def test_queued_cards_are_sent_as_their_profile(teams, tmp_path):
+    list_id = seed(teams["beta"])
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    outbox.add(list_id, "Later", "", [], "Ops", "Inbox", profile="beta")
+
+    assert flush_outbox(outbox) == (1, 0)
+    assert [card["name"] for card in teams["beta"].cards.values()] == ["Later"]
+
+
+def test_profile_option(teams, trello):
+    seed(teams["alpha"])
+    runner = CliRunner()
+    arguments = ["add-card", "--board", "Ops", "--list", "Inbox", "--name", "Card", "--no-daemon"]
+
+    result = runner.invoke(app, ["--profile", "alpha"] + arguments)
+
+    assert result.exit_code == 0, result.output
+    assert [card["name"] for card in teams["alpha"].cards.values()] == ["Card"]
+    assert trello.requests == []
+
+    result = runner.invoke(app, ["--profile", "gamma"] + arguments)
+    assert result.exit_code == 2
+    assert "No profile named gamma" in result.output
@@ -0,0 +1,46 @@
+import time
+
+from addcardtool import program
+from addcardtool.client import TrelloClient
+from addcardtool.ratelimit import RateLimiter, TokenBucket, retry_after_seconds
+
+
+def test_token_bucket_spaces_requests_after_burst():
+    bucket = TokenBucket(5, interval=1.0)
+    waits = [bucket.reserve() for _ in range(7)]
+    assert waits[:5] == [0.0] * 5
+    assert 0.15 < waits[5] < 0.25
+    assert 0.35 < waits[6] < 0.45
+
+
+def test_limiter_counts_queued_requests():
+    limiter = RateLimiter(TokenBucket(300), TokenBucket(2, interval=0.1))
+    for _ in range(3):
+        limiter.acquire()
+    stats = limiter.stats()
+    assert stats["requests"] == 3
+    assert stats["queued"] == 1
+    assert stats["delayed_ms"] > 0
+
+
+def test_retry_after_header_is_preferred():
+    assert retry_after_seconds({"Retry-After": "2"}) == 2.0
+    assert retry_after_seconds({"x-rate-limit-api-token-interval-ms": "500"}) == 0.5
+    assert retry_after_seconds({}) == 1.0
+
+
+def test_throttled_request_is_queued_and_sent_again(trello):
+    trello.add_board("Ops")
+    trello.throttle = 2
+    trello.retry_after = "0.1"
+    limiter = RateLimiter(TokenBucket(300), TokenBucket(100))
+    client = TrelloClient("key", "token", base_url=trello.base_url, rate_limiter=limiter)
+
+    started = time.monotonic()
+    response = client.get("members/me/boards")
+
+    assert response.status_code == 200
+    assert time.monotonic() - started >= 0.2
+    assert limiter.stats()["throttled"] == 2
+    assert len(trello.requests) == 3
+    client.close()
@@ -0,0 +1,69 @@
+import pytest
+from typer.testing import CliRunner
+
+from addcardtool.cli import app
+from addcardtool.models import List
+from addcardtool.resolver import NameIndex, NameResolver, ResolveError
+
+
+def test_index_prefers_id_then_exact_then_casefolded_name():
+    index = NameIndex("List", [List("l1", "Inbox"), List("l2", "inbox"), List("l3", "Done")])
+
+    assert index.resolve("l2").id == "l2"
+    assert index.resolve("Inbox").id == "l1"
+    assert index.resolve("DONE").id == "l3"
+    with pytest.raises(ResolveError, match="ambiguous.*l1, l2"):
+        index.resolve("INBOX")
+    with pytest.raises(ResolveError, match="not found"):
+        index.resolve("Later")
+
+
+def test_resolver_creates_missing_lists_and_labels(trello):
+    board_id = trello.add_board("Ops")
+    trello.add_label(board_id, "bug", "red")
+    resolver = NameResolver(create_missing=True)
+
+    _, list_id, label_ids = resolver.resolve("ops", "Inbox", ["Bug", "p1", "p1"])
+
+    assert trello.lists[list_id]["name"] == "Inbox"
+    assert [trello.labels[label_id]["name"] for label_id in label_ids] == ["bug", "p1"]
+    assert resolver.resolve("Ops", "inbox", ["P1"])[1:] == (list_id, label_ids[1:])
+
+
+def test_add_card_by_name_is_one_post_on_a_warm_cache(trello):
+    board_id = trello.add_board("Ops")
+    list_id = trello.add_list(board_id, "Inbox")
+    label_id = trello.add_label(board_id, "bug", "red")
+    runner = CliRunner()
+    arguments = ["add-card", "--board", "Ops", "--list", "Inbox", "--label", "bug", "--name", "Fix"]
+
+    assert runner.invoke(app, arguments).exit_code == 0
+    trello.requests.clear()
+    result = runner.invoke(app, arguments + ["--desc", "again"])
+
+    assert result.exit_code == 0
+    assert [(method, path) for method, path, _ in trello.requests] == [("POST", "/1/cards")]
+    cards = list(trello.cards.values())
+    assert [card["idList"] for card in cards] == [list_id, list_id]
+    assert cards[1]["idLabels"] == [label_id]
+
+
+def test_add_card_by_name_reports_missing_list(trello):
+    trello.add_board("Ops")
+    result = CliRunner().invoke(app, ["add-card", "--board", "Ops", "--list", "Inbox", "--name", "x"])
+
+    assert result.exit_code == 1
+    assert "List not found on board Ops: Inbox" in result.output
+    assert trello.cards == {}
+
+
+def test_color_only_labels_resolve_by_id(trello):
+    board_id = trello.add_board("Ops")
+    list_id = trello.add_list(board_id, "Inbox")
+    label_id = trello.add_label(board_id, "", "green")
+
+    resolver = NameResolver()
+
+    assert resolver.resolve("Ops", "Inbox", [label_id]) == (board_id, list_id, [label_id])
+    with pytest.raises(ResolveError, match="Label not found"):
+        resolver.resolve("Ops", "Inbox", [""])
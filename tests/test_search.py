@@ -0,0 +1,77 @@
+import random
+import sys
+import time
+
+from addcardtool.search import SearchIndex
+
+
+def test_search_ranks_exact_and_prefix_matches_first():
+    index = SearchIndex(
+        [
+            ("Platform roadmap", "", "roadmap"),
+            ("Ops", "Operations board", "ops"),
+            ("Ops incidents", "", "incidents"),
+            ("Shops", "", "shops"),
+        ]
+    )
+    assert index.search("ops")[:3] == ["ops", "incidents", "shops"]
+    assert index.search("op")[:2] == ["ops", "incidents"]
+    assert index.search("operations") == ["ops"]
+    assert index.search("platfrom roadmap") == ["roadmap"]
+    assert index.search("zzz") == []
+
+
+def test_exact_name_is_not_crowded_out_by_description_matches():
+    entries = [(f"Old deploy {i}", "deploy", i) for i in range(10)] + [("Deploy", "", "deploy")]
+    index = SearchIndex(entries)
+
+    assert index.search("deploy", limit=1) == ["deploy"]
+    assert index.search("depl", limit=1) == ["deploy"]
+
+
+def test_search_stays_fast_at_ten_thousand_entries():
+    rng = random.Random(7)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))) for _ in range(3000)]
+    entries = [
+        (" ".join(rng.sample(vocabulary, 3)), " ".join(rng.sample(vocabulary, 8)), i)
+        for i in range(10000)
+    ]
+    index = SearchIndex(entries)
+    queries = []
+    for name, _, _ in rng.sample(entries, 50):
+        queries += [name[:length] for length in range(1, len(name) + 1)]
+
+    started = time.perf_counter()
+    for query in queries:
+        index.search(query)
+    per_keystroke = (time.perf_counter() - started) / len(queries)
+
+    assert per_keystroke < 0.005
+
+
+def test_board_search_picks_the_exact_name_over_a_longer_one(monkeypatch):
+    from types import ModuleType
+
+    from addcardtool import cli
+    from addcardtool.models import Board
+
+    # Answer the search prompt with "Ops" without a terminal
+    shortcuts = ModuleType("prompt_toolkit.shortcuts")
+    shortcuts.prompt = lambda *args, **kwargs: "Ops"
+    completion = ModuleType("prompt_toolkit.completion")
+    completion.Completer = object
+    completion.Completion = None
+    monkeypatch.setitem(sys.modules, "prompt_toolkit", ModuleType("prompt_toolkit"))
+    monkeypatch.setitem(sys.modules, "prompt_toolkit.shortcuts", shortcuts)
+    monkeypatch.setitem(sys.modules, "prompt_toolkit.completion", completion)
+    boards = [Board(f"b{i}", f"Team {i}", "") for i in range(25)]
+    boards += [Board("incidents", "Ops incidents", "Pages"), Board("ops", "Ops", "Operations")]
+
+    class Prefetcher:
+        def result(self, key, function):
+            return boards
+
+        def submit(self, *args):
+            pass
+
+    assert cli.get_board_selection(Prefetcher()) == ("ops", False, "Ops")
@@ -0,0 +1,71 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+# Modules that only the commands talking to Trello or prompting the user should load
+DEFERRED_MODULES = ("requests", "urllib3", "dotenv", "PyInquirer", "prompt_toolkit", "aiohttp")
+
+# Our own modules, and the standard library modules behind them, that only the commands using
+# them should load
+DEFERRED_OWN_MODULES = tuple(
+    f"addcardtool.{name}"
+    for name in (
+        "aio",
+        "batch",
+        "bulk",
+        "cache",
+        "cardindex",
+        "client",
+        "daemon",
+        "journal",
+        "multipart",
+        "outbox",
+        "picker",
+        "prefetch",
+        "program",
+        "remote",
+        "resolver",
+        "search",
+        "sync",
+        "template",
+        "tracing",
+    )
+) + ("sqlite3", "http.client", "concurrent.futures")
+
+# Import time our own modules may add on top of typer, in microseconds
+IMPORT_BUDGET_US = 100_000
+
+# Wall-clock budget for a whole cold start, generous enough for slow CI machines
+STARTUP_BUDGET_S = 3.0
+
+
+def import_times(*args):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "addcardtool", *args],
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    assert result.returncode == 0, result.stderr
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        cumulative[name] = int(cumulative_us)
+    return cumulative, elapsed
+
+
+@pytest.mark.parametrize("args", [["--version"], ["--help"], ["add-cards", "--help"]])
+def test_cold_start_stays_within_budget(args):
+    cumulative, elapsed = import_times(*args)
+
+    loaded = [name for name in cumulative if name.split(".")[0] in DEFERRED_MODULES]
+    assert loaded == []
+    assert [name for name in DEFERRED_OWN_MODULES if name in cumulative] == []
+    own = cumulative["addcardtool.cli"] - cumulative.get("typer", 0)
+    assert own < IMPORT_BUDGET_US
+    assert elapsed < STARTUP_BUDGET_S
@@ -0,0 +1,76 @@
+from typer.testing import CliRunner
+
+from addcardtool import program
+from addcardtool.cli import app
+from addcardtool.sync import FULL, INCREMENTAL, SyncResult, sync_boards
+
+
+def seed(trello):
+    board_id = trello.add_board("Ops")
+    inbox = trello.add_list(board_id, "Inbox")
+    done = trello.add_list(board_id, "Done")
+    bug = trello.add_label(board_id, "bug", "red")
+    return board_id, inbox, done, bug
+
+
+def test_first_sync_reads_boards_in_full(trello):
+    board_id, inbox, done, _ = seed(trello)
+
+    assert sync_boards([board_id]) == [SyncResult(board_id, FULL)]
+
+    trello.requests.clear()
+    board = program.get_board(board_id)
+    assert [item.id for item in board.lists] == [inbox, done]
+    assert trello.requests == []
+
+
+def test_later_syncs_apply_only_new_actions(trello):
+    board_id, inbox, done, bug = seed(trello)
+    sync_boards([board_id])
+    doing = trello.add_list(board_id, "Doing", pos=100000)
+    trello.update_list(inbox, name="Triage")
+    trello.update_list(done, closed=True)
+    trello.update_label(bug, color="orange")
+    feature = trello.add_label(board_id, "feature", "green")
+    trello.delete_label(bug)
+    trello.handle("POST", "/1/cards", {"idList": doing, "name": "Card"})
+    trello.requests.clear()
+    card_actions = []
+
+    results = sync_boards([board_id], card_handler=lambda _, action: card_actions.append(action))
+
+    assert results == [SyncResult(board_id, INCREMENTAL, 6)]
+    assert [path for _, path, _ in trello.requests] == ["/1/batch"]
+    assert [action["type"] for action in card_actions] == ["createCard"]
+    board = program.get_board(board_id)
+    assert [(item.id, item.name) for item in board.lists] == [(inbox, "Triage"), (doing, "Doing")]
+    assert [(label.id, label.color) for label in board.labels] == [(feature, "green")]
+    assert len(trello.requests) == 1
+
+    # Nothing new: one small read, nothing applied
+    assert sync_boards([board_id]) == [SyncResult(board_id, INCREMENTAL, 0)]
+
+
+def test_large_gap_falls_back_to_full_read(trello):
+    board_id, _, _, _ = seed(trello)
+    sync_boards([board_id])
+    for i in range(5):
+        trello.add_list(board_id, f"List {i}")
+
+    assert sync_boards([board_id], limit=3) == [SyncResult(board_id, FULL)]
+    assert len(program.get_board(board_id).lists) == 7
+
+
+def test_sync_command_batches_many_boards(trello):
+    board_ids = [seed(trello)[0] for _ in range(12)]
+    runner = CliRunner()
+    result = runner.invoke(app, ["sync"])
+    assert result.exit_code == 0, result.output
+    assert "0 from recent changes (0 applied), 12 read in full" in result.output
+
+    trello.add_list(board_ids[3], "New")
+    trello.requests.clear()
+    result = runner.invoke(app, ["sync"])
+    assert "12 from recent changes (1 applied), 0 read in full" in result.output
+    # The cached board listing plus two batches of action reads, ten boards each
+    assert [path for _, path, _ in trello.requests] == ["/1/batch", "/1/batch"]
@@ -0,0 +1,125 @@
+import pytest
+from typer.testing import CliRunner
+
+from addcardtool.cli import app
+from addcardtool.template import (
+    CREATE_BOARD,
+    CREATE_LABEL,
+    CREATE_LIST,
+    MOVE_LIST,
+    RECOLOR_LABEL,
+    TemplateError,
+    apply_template,
+    parse_template,
+    plan_list_positions,
+)
+
+TEMPLATE = """
+boards:
+  - name: Project
+    desc: Scaffolded from a template
+    lists: [Backlog, Doing, Review, Done]
+    labels:
+      - {name: bug, color: red}
+      - {name: feature, color: green}
+      - chore
+"""
+
+
+def board_state(trello, board_id):
+    lists = [item["name"] for item in trello.board_lists(board_id)]
+    labels = {
+        label["name"]: label["color"]
+        for label in trello.labels.values()
+        if label["idBoard"] == board_id
+    }
+    return lists, labels
+
+
+def mutations(trello):
+    return [(method, path) for method, path, _ in trello.requests if method != "GET"]
+
+
+def test_plan_keeps_lists_already_in_order():
+    existing = {"A": ("la", 100.0), "C": ("lc", 200.0), "B": ("lb", 300.0)}
+
+    placed = plan_list_positions(["A", "B", "C", "D"], existing)
+
+    # A and B stay put; one move and one creation put the rest in order
+    assert [(name, list_id) for name, list_id, _ in placed] == [("C", "lc"), ("D", None)]
+    positions = dict((name, pos) for name, _, pos in placed)
+    assert 300.0 < positions["C"] < positions["D"]
+
+
+def test_parse_template_rejects_duplicates():
+    with pytest.raises(TemplateError, match="names the list Done twice"):
+        parse_template({"name": "Project", "lists": ["Done", "Done"]})
+    with pytest.raises(TemplateError, match="does not describe any boards"):
+        parse_template({"boards": []})
+
+
+def test_apply_template_creates_missing_board(trello):
+    specs = parse_template(
+        {"boards": [{"name": "Project", "lists": ["To Do", "Done"], "labels": ["bug"]}]}
+    )
+
+    results = list(apply_template(specs, workers=4))
+
+    assert all(result.ok for result in results)
+    assert [result.change.action for result in results][0] == CREATE_BOARD
+    board_id = next(iter(trello.boards))
+    assert trello.requests[1][2]["defaultLists"] == "false"
+    assert board_state(trello, board_id) == (["To Do", "Done"], {"bug": "blue"})
+
+
+def test_apply_template_only_sends_missing_changes(trello):
+    board_id = trello.add_board("Project")
+    trello.add_list(board_id, "Done")
+    trello.add_list(board_id, "Backlog")
+    trello.add_list(board_id, "Archive")
+    trello.add_label(board_id, "bug", "orange")
+    trello.add_label(board_id, "feature", "green")
+    specs = parse_template(
+        {
+            "name": "Project",
+            "lists": ["Backlog", "Doing", "Done"],
+            "labels": [{"name": "bug", "color": "red"}, {"name": "feature", "color": "green"}, "chore"],
+        }
+    )
+
+    changes = {(r.change.action, r.change.name) for r in apply_template(specs, workers=4)}
+
+    assert changes == {
+        (CREATE_LIST, "Doing"),
+        (MOVE_LIST, "Done"),
+        (RECOLOR_LABEL, "bug"),
+        (CREATE_LABEL, "chore"),
+    }
+    lists, labels = board_state(trello, board_id)
+    assert [name for name in lists if name != "Archive"] == ["Backlog", "Doing", "Done"]
+    assert labels == {"bug": "red", "feature": "green", "chore": "blue"}
+
+    # Applying the same template again reads the boards and changes nothing
+    trello.requests.clear()
+    assert list(apply_template(specs)) == []
+    assert mutations(trello) == []
+
+
+def test_apply_template_command(trello, tmp_path):
+    path = tmp_path / "board.yaml"
+    path.write_text(TEMPLATE)
+    runner = CliRunner()
+
+    result = runner.invoke(app, ["apply-template", str(path), "--dry-run"])
+    assert result.exit_code == 0, result.output
+    assert "Would make 8 changes" in result.output
+    assert trello.boards == {}
+
+    result = runner.invoke(app, ["apply-template", str(path)])
+    assert result.exit_code == 0, result.output
+    assert "Made 8 changes (0 failed)" in result.output
+    board_id = next(iter(trello.boards))
+    assert board_state(trello, board_id)[0] == ["Backlog", "Doing", "Review", "Done"]
+
+    result = runner.invoke(app, ["apply-template", str(path)])
+    assert "1 boards already match the template" in result.output
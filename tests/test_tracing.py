@@ -0,0 +1,85 @@
+import json
+
+from typer.testing import CliRunner
+
+from addcardtool import program
+from addcardtool.cli import app
+from addcardtool.client import get_client
+from addcardtool.tracing import LatencyHistogram, Tracer, endpoint_template
+
+
+def test_endpoint_template_replaces_ids():
+    assert endpoint_template("boards/5f1c0a/lists") == "boards/{id}/lists"
+    assert endpoint_template("members/me/boards") == "members/me/boards"
+    assert endpoint_template("cards") == "cards"
+
+
+def test_histogram_percentiles_are_within_one_percent():
+    histogram = LatencyHistogram()
+    for millis in range(1, 1001):
+        histogram.record(millis / 1000)
+
+    assert histogram.count == 1000
+    for percent, expected in ((50, 0.5), (90, 0.9), (99, 0.99)):
+        assert abs(histogram.percentile(percent) - expected) <= expected * 0.01
+    assert histogram.percentile(100) == histogram.max == 1.0
+
+
+def test_traced_requests_record_phases_and_throttling(trello):
+    board_id = trello.add_board("Ops")
+    tracer = Tracer()
+    get_client().enable_tracing(tracer)
+    trello.throttle = 1
+
+    program.get_board(board_id)
+    program.create_new_card(trello.add_list(board_id, "Inbox"), "Fix", "", [])
+
+    board_span, card_span = tracer.spans
+    assert (board_span.method, board_span.endpoint, board_span.status_code) == (
+        "GET",
+        "boards/{id}",
+        200,
+    )
+    assert board_span.throttled == 1
+    assert board_span.bytes_received > 0
+    assert board_span.connect > 0 and board_span.server > 0
+    assert board_span.duration >= board_span.connect + board_span.server
+    assert card_span.endpoint == "cards"
+    assert card_span.bytes_sent > 0
+    assert set(tracer.histograms) == {"GET boards/{id}", "POST cards"}
+
+
+def test_streamed_upload_records_its_size(trello, tmp_path):
+    board_id = trello.add_board("Ops")
+    card = program.create_new_card(trello.add_list(board_id, "Inbox"), "Fix", "", [])
+    log = tmp_path / "build.log"
+    log.write_bytes(b"x" * 100_000)
+    tracer = Tracer()
+    get_client().enable_tracing(tracer)
+
+    program.add_card_attachment(card.id, str(log))
+
+    [span] = tracer.spans
+    assert span.bytes_sent > 100_000
+
+
+def test_trace_file_is_exported_as_otlp(trello, tmp_path):
+    board_id = trello.add_board("Ops")
+    trello.add_list(board_id, "Inbox")
+    trace_file = tmp_path / "trace.json"
+
+    result = CliRunner().invoke(
+        app,
+        ["--trace", "--trace-file", str(trace_file), "--trace-format", "otlp", "add-card",
+         "--board", "Ops", "--list", "Inbox", "--name", "Fix"],
+    )
+
+    assert result.exit_code == 0
+    assert "POST cards" in result.output
+    spans = json.loads(trace_file.read_text())["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [span["name"] for span in spans] == [
+        "GET members/me/boards",
+        "GET boards/{id}",
+        "POST cards",
+    ]
+    assert len({span["traceId"] for span in spans}) == 1